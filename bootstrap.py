@@ -0,0 +1,60 @@
+"""
+Подготовка базы данных при запуске бота.
+
+Все, что раньше делалось при импорте модулей или разными функциями
+в main, собрано в один явный шаг: миграции, справочник процедур,
+недельное расписание, занятое время старых записей и загрузка справочника в
+память — для каждой активной студии. Каждый шаг идемпотентен и работает массовыми вставками, поэтому
+повторный запуск и одновременный старт нескольких процессов безопасны.
+Импорт модулей бота к базе данных не обращается.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from models.database import SessionLocal, run_migrations, seed_procedures
+from services.booking import backfill_slot_claims
+from services.schedule import seed_working_hours
+from services.catalog import procedure_catalog
+from services.tenants import tenant_registry
+from tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(timings: dict, step: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Шаги студий суммируются
+        timings[step] = timings.get(step, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def bootstrap(url: str = None, session_factory=SessionLocal) -> dict:
+    """
+    Приведение базы к рабочему состоянию
+
+    Возвращает время каждого шага в миллисекундах.
+    """
+    timings = {}
+    with _timed(timings, 'total'):
+        with _timed(timings, 'migrations'):
+            run_migrations(url)
+        with session_factory() as db:
+            with _timed(timings, 'tenants'):
+                tenant_registry.load(db)
+            for tenant in tenant_registry.all():
+                with tenant_scope(tenant.id):
+                    with _timed(timings, 'procedures'):
+                        seed_procedures(db)
+                    with _timed(timings, 'working_hours'):
+                        seed_working_hours(db)
+                    with _timed(timings, 'slot_claims'):
+                        backfill_slot_claims(db)
+                    with _timed(timings, 'catalog'):
+                        procedure_catalog.load(db)
+    logger.info(
+        "Подготовка базы данных: " + ", ".join(f"{step} {ms:.0f} мс" for step, ms in timings.items())
+    )
+    return timings
@@ -19,8 +19,61 @@ TIMEZONE = os.getenv('TIMEZONE', 'Europe/Moscow')
 # Reminder settings
 REMINDER_BEFORE_DAY = os.getenv('REMINDER_BEFORE_DAY', '10:00')
 REMINDER_DAY_OF = os.getenv('REMINDER_DAY_OF', '08:00')
+# Сколько секунд после назначенного времени напоминание еще можно отправить (например, после простоя бота)
+REMINDER_MISFIRE_GRACE = int(os.getenv('REMINDER_MISFIRE_GRACE', '10800'))
 
 # Working hours
 WORK_START = os.getenv('WORK_START', '09:00')
 WORK_END = os.getenv('WORK_END', '20:00')
-SLOT_DURATION = int(os.getenv('SLOT_DURATION', '60')) 
\ No newline at end of file
+SLOT_DURATION = int(os.getenv('SLOT_DURATION', '60'))
+# Рабочие дни недели при первом запуске (0 - понедельник); дальше расписание меняется командами администратора
+WORK_DAYS = [int(day) for day in os.getenv('WORK_DAYS', '0,1,2,3,4').split(',') if day.strip()]
+
+# Availability cache
+AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', '1024'))
+
+# Procedure catalog
+PROCEDURE_CATALOG_TTL = int(os.getenv('PROCEDURE_CATALOG_TTL', '300'))
+
+# Reminder dispatch (Telegram limits: ~30 messages/s in total, ~1 message/s per chat)
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', '8'))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+
+# Outbox delivery
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '4'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '1'))
+OUTBOX_LEASE = float(os.getenv('OUTBOX_LEASE', '120'))  # секунды на доставку захваченного сообщения
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_BACKOFF = float(os.getenv('OUTBOX_BACKOFF', '5'))
+
+# Update delivery: polling or webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # публичный адрес сервера, например https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv('WEBHOOK_MAX_IN_FLIGHT', '40'))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+# FSM storage: sql (shared between bot processes) or memory
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sql')
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '86400'))  # брошенный сценарий удаляется через сутки
+FSM_CLEANUP_INTERVAL = int(os.getenv('FSM_CLEANUP_INTERVAL', '3600'))
+
+# Throttling: events per second per user and repeated button taps
+THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', '2'))
+THROTTLE_BURST = float(os.getenv('THROTTLE_BURST', '5'))
+DUPLICATE_CALLBACK_WINDOW = float(os.getenv('DUPLICATE_CALLBACK_WINDOW', '2'))  # секунды
+
+# Prometheus metrics: port of the local /metrics endpoint, 0 disables metrics
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# SQL profiler: per-handler statement stats, slow and repeated (N+1) statement warnings
+SQL_PROFILE = os.getenv('SQL_PROFILE', '').lower() in ('1', 'true', 'yes')
+SQL_PROFILE_SLOW_MS = float(os.getenv('SQL_PROFILE_SLOW_MS', '100'))
+SQL_PROFILE_REPEAT = int(os.getenv('SQL_PROFILE_REPEAT', '5'))  # одинаковых запросов за обновление
+SQL_PROFILE_TOP = int(os.getenv('SQL_PROFILE_TOP', '10'))
+SQL_PROFILE_REPORT_INTERVAL = float(os.getenv('SQL_PROFILE_REPORT_INTERVAL', '300'))
@@ -1,25 +1,59 @@
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from datetime import datetime
-from models.database import get_db, Client, Appointment, InactiveSlot
-from config import ADMIN_IDS
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import pool_stats
+from scheduler.outbox import outbox_stats
 from scheduler.notifier import send_reminder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from services.booking import (
-    create_appointment, get_available_slots,
-    get_procedures, get_procedure_by_id,
-    delete_appointment,
-    notify_admins_about_new_appointment,
+from services.async_booking import (
+    create_appointment, get_available_slots, get_available_dates,
+    get_procedures, get_procedure_by_id, reload_procedures,
+    delete_appointment, get_appointment, get_upcoming_appointments,
+    get_appointments_page,
+    get_client_by_username, get_client_by_id,
     set_inactive_slot, remove_inactive_slot,
-    get_inactive_slots
+    get_inactive_slots, get_upcoming_inactive_slots, get_outbox_backlog,
+    get_weekly_hours, set_working_hours,
+    get_schedule_exceptions, set_schedule_exception, remove_schedule_exception,
+    block_period, unblock_period,
+    get_resources, add_resource, set_resource_procedures, set_resource_active,
+    get_template, set_template, reset_template
 )
+from services.booking import expand_times, format_resource_line
+from services.resources import RESOURCE_KINDS
+from services.schedule import WEEKDAY_NAMES, parse_hours, format_hours
+from services.templates import TEMPLATE_NAMES, TEMPLATE_FIELDS
+from services.tenants import is_admin
+from config import SLOT_DURATION
 
 router = Router()
 
+# Записей на одной странице списка: текст страницы гарантированно
+# укладывается в лимит Telegram в 4096 символов
+PAGE_SIZE = 10
+
+# Самый длинный период, который можно закрыть или открыть за раз
+MAX_PERIOD_DAYS = 366
+
+# Сколько дат с неактивными слотами показывать в управлении датами
+MAX_LISTED_DATES = 30
+
+PERIOD_FORMAT_HELP = (
+    "Введите период в формате:\n"
+    "ДД.ММ.ГГГГ — один день\n"
+    "ДД.ММ.ГГГГ-ДД.ММ.ГГГГ — несколько дней\n"
+    "Чтобы затронуть только часть дня, добавьте время: ДД.ММ.ГГГГ-ДД.ММ.ГГГГ 10:00-14:00\n"
+    f"Время указывается целыми слотами по {SLOT_DURATION} мин"
+)
+
+class PeriodError(ValueError):
+    """Ошибка в периоде, которую можно объяснить администратору"""
+
 class AdminStates(StatesGroup):
     waiting_for_name = State()
     waiting_for_date = State()
@@ -31,9 +65,11 @@ class AdminStates(StatesGroup):
     waiting_for_inactive_date_removal = State()
     waiting_for_inactive_time = State()
     waiting_for_inactive_time_removal = State()
+    waiting_for_block_period = State()
+    waiting_for_unblock_period = State()
 
 def admin_filter(message: Message):
-    return message.from_user.id in ADMIN_IDS
+    return is_admin(message.from_user.id)
 
 @router.message(Command("admin"), admin_filter)
 async def cmd_admin(message: Message):
@@ -43,32 +79,245 @@ async def cmd_admin(message: Message):
         reply_markup=create_admin_keyboard()
     )
 
-@router.message(F.text == "📊 Список записей", admin_filter)
-async def show_appointments(message: Message):
-    db = next(get_db())
-    today = datetime.now().date()
-    appointments = db.query(Appointment).filter(
-        Appointment.date >= today,
-        Appointment.status == 'scheduled'
-    ).order_by(Appointment.date).all()
-    
-    if not appointments:
-        await message.answer("На ближайшие дни записей нет.")
+@router.message(Command("dbstats"), admin_filter)
+async def show_db_stats(message: Message):
+    stats = pool_stats.snapshot()
+    await message.answer(
+        "🗄 Пул соединений с базой данных:\n\n"
+        f"Выдано соединений: {stats['checkouts']}\n"
+        f"Используется сейчас: {stats['checked_out']}\n"
+        f"Максимум одновременно: {stats['peak_checked_out']}\n"
+        f"Среднее ожидание: {stats['avg_wait_ms']:.2f} мс\n"
+        f"Максимальное ожидание: {stats['max_wait_ms']:.2f} мс"
+    )
+
+@router.message(Command("outbox"), admin_filter)
+async def show_outbox_stats(message: Message, db: AsyncSession):
+    backlog = await get_outbox_backlog(db)
+    stats = outbox_stats.snapshot()
+    await message.answer(
+        "📤 Очередь исходящих сообщений:\n\n"
+        f"Ожидают отправки: {backlog['pending']}\n"
+        f"Не доставлены: {backlog['failed']}\n"
+        f"Самое старое ждет: {backlog['oldest_age_s']:.1f} с\n\n"
+        f"Отправлено с запуска: {stats['sent']}\n"
+        f"Повторов: {stats['retried']}\n"
+        f"Средняя задержка доставки: {stats['avg_lag_ms']:.0f} мс\n"
+        f"Максимальная задержка доставки: {stats['max_lag_ms']:.0f} мс"
+    )
+
+@router.message(Command("reload_procedures"), admin_filter)
+async def cmd_reload_procedures(message: Message, db: AsyncSession):
+    procedures = await reload_procedures(db)
+    await message.answer(f"Справочник процедур обновлен, процедур: {len(procedures)}")
+
+@router.message(Command("hours"), admin_filter)
+async def show_schedule(message: Message, db: AsyncSession):
+    weekly = await get_weekly_hours(db)
+    exceptions = await get_schedule_exceptions(db, datetime.now().date())
+    text = "🗓 Расписание работы:\n\n"
+    for weekday, name in enumerate(WEEKDAY_NAMES):
+        text += f"{name}: {format_hours(weekly[weekday])}\n"
+    if exceptions:
+        text += "\nИсключения:\n"
+        for day, hours in exceptions.items():
+            text += f"{day.strftime('%d.%m.%Y')}: {format_hours(hours)}\n"
+    text += (
+        "\nИзменить день недели: /set_hours Пн 09:00-13:00, 14:00-20:00\n"
+        "Особые часы на дату: /exception ДД.ММ.ГГГГ 10:00-16:00 (или «выходной»)\n"
+        "Отменить исключение: /exception ДД.ММ.ГГГГ сброс"
+    )
+    await message.answer(text)
+
+@router.message(Command("set_hours"), admin_filter)
+async def cmd_set_hours(message: Message, command: CommandObject, db: AsyncSession):
+    day, _, hours = (command.args or "").strip().partition(" ")
+    weekday = next((i for i, name in enumerate(WEEKDAY_NAMES) if name.lower() == day.lower()), None)
+    try:
+        intervals = parse_hours(hours) if weekday is not None else None
+    except ValueError:
+        intervals = None
+    if intervals is None:
+        await message.answer(
+            "Укажите день недели и часы в формате:\n"
+            "/set_hours Пн 09:00-13:00, 14:00-20:00\n"
+            "/set_hours Сб выходной"
+        )
         return
-    
-    text = "📊 Список записей:\n\n"
-    for app in appointments:
-        client = app.client
+
+    await set_working_hours(db, weekday, intervals)
+    await message.answer(f"✅ {WEEKDAY_NAMES[weekday]}: {format_hours(intervals)}")
+
+@router.message(Command("exception"), admin_filter)
+async def cmd_exception(message: Message, command: CommandObject, db: AsyncSession):
+    day, _, hours = (command.args or "").strip().partition(" ")
+    try:
+        date = datetime.strptime(day, "%d.%m.%Y").date()
+        intervals = None if hours.strip().lower() == "сброс" else parse_hours(hours)
+    except ValueError:
+        await message.answer(
+            "Укажите дату и часы в формате:\n"
+            "/exception ДД.ММ.ГГГГ 10:00-16:00\n"
+            "/exception ДД.ММ.ГГГГ выходной\n"
+            "/exception ДД.ММ.ГГГГ сброс"
+        )
+        return
+
+    if intervals is None:
+        if await remove_schedule_exception(db, date):
+            await message.answer(f"✅ {date.strftime('%d.%m.%Y')} работаем по обычному расписанию")
+        else:
+            await message.answer(f"На {date.strftime('%d.%m.%Y')} исключений нет")
+        return
+    await set_schedule_exception(db, date, intervals)
+    await message.answer(f"✅ {date.strftime('%d.%m.%Y')}: {format_hours(intervals)}")
+
+@router.message(Command("resources"), admin_filter)
+async def show_resources(message: Message, db: AsyncSession):
+    resources = await get_resources(db)
+    text = "👥 Специалисты и кабинеты:\n\n"
+    if not resources:
+        text += "Ресурсы не заведены, все записи ведутся в одном календаре.\n"
+    for resource, procedure_ids in resources:
+        procedures = ", ".join(map(str, procedure_ids)) if procedure_ids else "все"
+        status = "" if resource.is_active else " (выключен)"
         text += (
-            f"ID: {app.id}\n"
-            f"Процедура: {app.procedure.name}\n"
-            f"Длительность: {app.procedure.duration}ч\n"
-            f"📅 {app.date.strftime('%d.%m.%Y %H:%M')}\n"
-            f"👤 {client.name} (@{client.username})\n"
-            f"📱 {client.phone or 'Телефон не указан'}\n\n"
+            f"{resource.id}. {resource.name} — {RESOURCE_KINDS.get(resource.kind, resource.kind)}"
+            f"{status}, процедуры: {procedures}\n"
+        )
+    text += (
+        "\nДобавить: /add_resource Имя (или /add_resource кабинет Название)\n"
+        "Процедуры ресурса: /resource_procedures ID 1, 2, 3 (или «все»)\n"
+        "Выключить или включить: /resource_off ID, /resource_on ID"
+    )
+    await message.answer(text)
+
+@router.message(Command("add_resource"), admin_filter)
+async def cmd_add_resource(message: Message, command: CommandObject, db: AsyncSession):
+    first, _, rest = (command.args or "").strip().partition(" ")
+    kind = next((key for key, name in RESOURCE_KINDS.items() if name == first.lower()), None)
+    name = rest.strip() if kind else f"{first} {rest}".strip()
+    if not name:
+        await message.answer(
+            "Укажите имя специалиста или название кабинета:\n"
+            "/add_resource Анна\n"
+            "/add_resource кабинет Кабинет 2"
+        )
+        return
+    try:
+        resource = await add_resource(db, name, kind or 'specialist')
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    await message.answer(f"✅ Добавлен ресурс {resource.id}: {resource.name}")
+
+@router.message(Command("resource_procedures"), admin_filter)
+async def cmd_resource_procedures(message: Message, command: CommandObject, db: AsyncSession):
+    resource_id, _, procedures = (command.args or "").strip().partition(" ")
+    try:
+        resource_id = int(resource_id)
+        procedure_ids = [] if procedures.strip().lower() == "все" else [
+            int(value) for value in procedures.replace(",", " ").split()
+        ]
+    except ValueError:
+        resource_id = None
+    if resource_id is None or not procedures.strip():
+        await message.answer(
+            "Укажите ID ресурса и ID процедур в формате:\n"
+            "/resource_procedures 2 1, 3\n"
+            "/resource_procedures 2 все"
         )
+        return
+
+    try:
+        found = await set_resource_procedures(db, resource_id, procedure_ids)
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    if not found:
+        await message.answer(f"❌ Ресурс {resource_id} не найден")
+        return
+    await message.answer(
+        f"✅ Ресурс {resource_id} выполняет процедуры: "
+        f"{', '.join(map(str, procedure_ids)) if procedure_ids else 'все'}"
+    )
+
+@router.message(Command("resource_on", "resource_off"), admin_filter)
+async def cmd_resource_active(message: Message, command: CommandObject, db: AsyncSession):
+    is_active = command.command == "resource_on"
+    try:
+        resource_id = int((command.args or "").strip())
+    except ValueError:
+        await message.answer(f"Укажите ID ресурса: /{command.command} 2")
+        return
+    if not await set_resource_active(db, resource_id, is_active):
+        await message.answer(f"❌ Ресурс {resource_id} не найден")
+        return
+    await message.answer(f"✅ Ресурс {resource_id} {'включен' if is_active else 'выключен'}")
+
+@router.message(Command("template"), admin_filter)
+async def cmd_template(message: Message, command: CommandObject, db: AsyncSession):
+    name, _, text = (command.args or "").strip().partition(" ")
+    text = text.strip()
+    if name not in TEMPLATE_NAMES:
+        await message.answer(
+            "✉️ Шаблоны сообщений: " + ", ".join(TEMPLATE_NAMES) + "\n\n"
+            "Показать: /template reminder\n"
+            "Изменить: /template reminder Текст с подстановками {procedure}, {date}, {time}\n"
+            "Вернуть текст по умолчанию: /template reminder сброс"
+        )
+        return
+
+    if not text:
+        fields = ", ".join(f"{{{field}}}" for field in sorted(TEMPLATE_FIELDS[name]))
+        await message.answer(
+            f"✉️ Шаблон «{TEMPLATE_NAMES[name]}» (подстановки: {fields}):\n\n"
+            f"{await get_template(db, name)}"
+        )
+        return
+    if text.lower() == "сброс":
+        await reset_template(db, name)
+        await message.answer(f"✅ Шаблон «{TEMPLATE_NAMES[name]}» возвращен к тексту по умолчанию")
+        return
+    try:
+        await set_template(db, name, text)
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    await message.answer(f"✅ Шаблон «{TEMPLATE_NAMES[name]}» изменен")
+
+@router.message(F.text == "📊 Список записей", admin_filter)
+async def show_appointments(message: Message, db: AsyncSession):
+    text, keyboard = await render_appointments_page(db, 'next', None, datetime.now().date(), None)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.message(Command("appointments"), admin_filter)
+async def show_appointments_for_period(message: Message, command: CommandObject, db: AsyncSession):
+    try:
+        dates = [datetime.strptime(arg, "%d.%m.%Y").date() for arg in (command.args or "").split()]
+    except ValueError:
+        dates = None
+    if not dates or len(dates) > 2:
+        await message.answer(
+            "Укажите период в формате:\n"
+            "/appointments ДД.ММ.ГГГГ [ДД.ММ.ГГГГ]"
+        )
+        return
     
-    await message.answer(text, reply_markup=create_appointments_list_keyboard(appointments))
+    start_date = dates[0]
+    end_date = dates[1] if len(dates) == 2 else None
+    text, keyboard = await render_appointments_page(db, 'next', None, start_date, end_date)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("apl_"))
+async def process_appointments_page(callback: CallbackQuery, db: AsyncSession):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав для выполнения этого действия", show_alert=True)
+        return
+
+    text, keyboard = await render_appointments_page(db, *decode_page(callback.data[len("apl_"):]))
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
 
 @router.message(F.text == "➕ Добавить запись", admin_filter)
 async def add_appointment_start(message: Message, state: FSMContext):
@@ -78,10 +327,10 @@ async def add_appointment_start(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_name)
 
 @router.message(AdminStates.waiting_for_name, admin_filter)
-async def process_client_name(message: Message, state: FSMContext):
+async def process_client_name(message: Message, state: FSMContext, db: AsyncSession):
     await state.update_data(client_name=message.text)
     
-    procedures = get_procedures()
+    procedures = await get_procedures(db)
     keyboard = []
     for procedure in procedures:
         keyboard.append([
@@ -100,7 +349,6 @@ async def process_client_name(message: Message, state: FSMContext):
 @router.callback_query(AdminStates.waiting_for_procedure, F.data.startswith("proc_"))
 async def process_admin_procedure_selection(callback: CallbackQuery, state: FSMContext):
     procedure_id = int(callback.data.split("_")[1])
-    procedure = get_procedure_by_id(procedure_id)
     
     await state.update_data(procedure_id=procedure_id)
     
@@ -110,12 +358,11 @@ async def process_admin_procedure_selection(callback: CallbackQuery, state: FSMC
     await state.set_state(AdminStates.waiting_for_username)
 
 @router.message(AdminStates.waiting_for_username, admin_filter)
-async def process_client_username(message: Message, state: FSMContext):
+async def process_client_username(message: Message, state: FSMContext, db: AsyncSession):
     username = message.text.strip()
-    db = next(get_db())
     
     # Ищем клиента по username
-    client = db.query(Client).filter(Client.username == username).first()
+    client = await get_client_by_username(db, username)
     
     if not client:
         await message.answer(
@@ -126,8 +373,10 @@ async def process_client_username(message: Message, state: FSMContext):
         return
     
     await state.update_data(client_id=client.id)
+    data = await state.get_data()
+    procedure = await get_procedure_by_id(db, data['procedure_id'])
     
-    available_dates = get_available_slots()
+    available_dates = await get_available_dates(db, procedure.duration, procedure_id=procedure.id)
     if not available_dates:
         await message.answer(
             "К сожалению, на ближайшие дни все слоты заняты. "
@@ -143,15 +392,15 @@ async def process_client_username(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_date)
 
 @router.callback_query(AdminStates.waiting_for_date, admin_filter)
-async def process_admin_date_selection(callback: CallbackQuery, state: FSMContext):
+async def process_admin_date_selection(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     selected_date = datetime.strptime(callback.data.split("_")[1], "%Y-%m-%d")
     data = await state.get_data()
     procedure_id = data['procedure_id']
-    procedure = get_procedure_by_id(procedure_id)
     
     await state.update_data(selected_date=selected_date)
     
-    available_times = get_available_slots(selected_date)
+    procedure = await get_procedure_by_id(db, procedure_id)
+    available_times = await get_available_slots(db, selected_date, procedure.duration, procedure.id)
     if not available_times:
         await callback.message.edit_text(
             "К сожалению, на этот день все слоты заняты. "
@@ -169,12 +418,12 @@ async def process_admin_date_selection(callback: CallbackQuery, state: FSMContex
     await state.set_state(AdminStates.waiting_for_time)
 
 @router.callback_query(AdminStates.waiting_for_time, admin_filter)
-async def process_admin_time_selection(callback: CallbackQuery, state: FSMContext):
+async def process_admin_time_selection(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     selected_time = callback.data.split("_")[1]
     data = await state.get_data()
     selected_date = data['selected_date']
     procedure_id = data['procedure_id']
-    procedure = get_procedure_by_id(procedure_id)
+    procedure = await get_procedure_by_id(db, procedure_id)
     
     # Создаем полную дату и время
     appointment_datetime = datetime.combine(
@@ -195,45 +444,45 @@ async def process_admin_time_selection(callback: CallbackQuery, state: FSMContex
     await state.set_state(AdminStates.waiting_for_phone)
 
 @router.callback_query(AdminStates.waiting_for_phone, F.data == "confirm", admin_filter)
-async def process_admin_confirmation(callback: CallbackQuery, state: FSMContext):
+async def process_admin_confirmation(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
     appointment_datetime = data['appointment_datetime']
     client_id = data['client_id']
     procedure_id = data['procedure_id']
     
     # Создаем запись в базе данных
-    db = next(get_db())
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await get_client_by_id(db, client_id)
     
     if not client:
         await callback.answer("Ошибка: клиент не найден", show_alert=True)
         await state.clear()
         return
     
-    appointment = create_appointment(db, client.id, procedure_id, appointment_datetime)
+    try:
+        appointment = await create_appointment(db, client.id, procedure_id, appointment_datetime)
+    except ValueError as e:
+        await callback.message.edit_text(
+            f"❌ Ошибка при создании записи: {str(e)}\n"
+            "Пожалуйста, выберите другое время."
+        )
+        await state.clear()
+        return
     
     await callback.message.edit_text(
         f"✅ Запись успешно создана!\n\n"
         f"👤 Клиент: {client.name} (@{client.username})\n"
         f"Процедура: {appointment.procedure.name}\n"
         f"Длительность: {appointment.procedure.duration}ч\n"
+        f"{format_resource_line(appointment)}"
         f"📅 Дата: {appointment_datetime.strftime('%d.%m.%Y')}\n"
         f"🕒 Время: {appointment_datetime.strftime('%H:%M')}"
     )
     
-    # Отправляем уведомление администраторам
-    await notify_admins_about_new_appointment(callback.bot, appointment)
-    
     await state.clear()
 
 @router.message(F.text == "📨 Отправить напоминание", admin_filter)
-async def send_reminder_start(message: Message):
-    db = next(get_db())
-    today = datetime.now().date()
-    appointments = db.query(Appointment).filter(
-        Appointment.date >= today,
-        Appointment.status == 'scheduled'
-    ).all()
+async def send_reminder_start(message: Message, db: AsyncSession):
+    appointments = await get_upcoming_appointments(db)
     
     if not appointments:
         await message.answer("Нет активных записей для отправки напоминания.")
@@ -251,14 +500,13 @@ async def send_reminder_start(message: Message):
     await message.answer(text, reply_markup=create_appointments_keyboard(appointments))
 
 @router.callback_query(F.data.startswith("remind_"))
-async def process_reminder_selection(callback: CallbackQuery):
-    if callback.from_user.id not in ADMIN_IDS:
+async def process_reminder_selection(callback: CallbackQuery, db: AsyncSession):
+    if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет прав для выполнения этого действия", show_alert=True)
         return
 
     appointment_id = int(callback.data.split("_")[1])
-    db = next(get_db())
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await get_appointment(db, appointment_id)
     
     if not appointment:
         await callback.answer("Запись не найдена", show_alert=True)
@@ -272,7 +520,8 @@ async def process_reminder_selection(callback: CallbackQuery):
         return
     
     try:
-        await send_reminder(callback.bot, appointment.client.telegram_id, appointment)
+        template = await get_template(db, 'reminder')
+        await send_reminder(callback.bot, appointment.client.telegram_id, appointment, template)
         await callback.answer("Напоминание успешно отправлено!")
         await callback.message.edit_text(
             f"✅ Напоминание отправлено клиенту {appointment.client.name}\n"
@@ -282,53 +531,32 @@ async def process_reminder_selection(callback: CallbackQuery):
         await callback.answer(f"Ошибка при отправке напоминания: {str(e)}", show_alert=True)
 
 @router.callback_query(F.data.startswith("delete_"))
-async def process_appointment_deletion(callback: CallbackQuery):
-    if callback.from_user.id not in ADMIN_IDS:
+async def process_appointment_deletion(callback: CallbackQuery, db: AsyncSession):
+    if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет прав для выполнения этого действия", show_alert=True)
         return
 
-    appointment_id = int(callback.data.split("_")[1])
-    db = next(get_db())
+    _, appointment_id, *page = callback.data.split("_", 2)
+    if page:
+        page = decode_page(page[0])
+    else:
+        page = ('next', None, datetime.now().date(), None)
     
     try:
-        if delete_appointment(db, appointment_id):
+        if await delete_appointment(db, int(appointment_id)):
             await callback.answer("Запись успешно удалена!")
-            # Обновляем сообщение с обновленным списком записей
-            today = datetime.now().date()
-            appointments = db.query(Appointment).filter(
-                Appointment.date >= today,
-                Appointment.status == 'scheduled'
-            ).order_by(Appointment.date).all()
-            
-            if not appointments:
-                await callback.message.edit_text("На ближайшие дни записей нет.")
-            else:
-                text = "📊 Список записей:\n\n"
-                for app in appointments:
-                    client = app.client
-                    text += (
-                        f"ID: {app.id}\n"
-                        f"Процедура: {app.procedure.name}\n"
-                        f"Длительность: {app.procedure.duration}ч\n"
-                        f"📅 {app.date.strftime('%d.%m.%Y %H:%M')}\n"
-                        f"👤 {client.name} (@{client.username})\n"
-                        f"📱 {client.phone or 'Телефон не указан'}\n\n"
-                    )
-                await callback.message.edit_text(text, reply_markup=create_appointments_list_keyboard(appointments))
+            # Перерисовываем только ту страницу списка, на которой была запись
+            text, keyboard = await render_appointments_page(db, *page)
+            await callback.message.edit_text(text, reply_markup=keyboard)
         else:
             await callback.answer("Запись не найдена", show_alert=True)
     except Exception as e:
         await callback.answer(f"Ошибка при удалении записи: {str(e)}", show_alert=True)
 
 @router.message(F.text == "📅 Управление датами", admin_filter)
-async def manage_dates(message: Message):
-    db = next(get_db())
-    today = datetime.now().date()
-    
-    # Получаем неактивные слоты на ближайшие 14 дней
-    inactive_slots = db.query(InactiveSlot).filter(
-        InactiveSlot.date >= today
-    ).order_by(InactiveSlot.date, InactiveSlot.time).all()
+async def manage_dates(message: Message, db: AsyncSession):
+    # Получаем неактивные слоты начиная с сегодняшнего дня
+    inactive_slots = await get_upcoming_inactive_slots(db)
     
     if not inactive_slots:
         await message.answer(
@@ -346,13 +574,16 @@ async def manage_dates(message: Message):
             slots_by_date[date_str] = []
         slots_by_date[date_str].append(slot.time)
     
-    # Формируем текст сообщения
+    # Формируем текст сообщения; длинные периоды показываем не целиком,
+    # чтобы уложиться в лимит длины сообщения Telegram
     text = "📅 Неактивные слоты:\n\n"
-    for date_str, times in slots_by_date.items():
-        text += f"📅 {date_str}:\n"
-        for time in sorted(times):
-            text += f"• {time}\n"
-        text += "\n"
+    for date_str, times in list(slots_by_date.items())[:MAX_LISTED_DATES]:
+        if None in times:
+            text += f"📅 {date_str}: весь день\n\n"
+            continue
+        text += f"📅 {date_str}: {', '.join(sorted(times))}\n\n"
+    if len(slots_by_date) > MAX_LISTED_DATES:
+        text += f"…и еще дат: {len(slots_by_date) - MAX_LISTED_DATES}\n\n"
     
     await message.answer(
         text + "Выберите действие:",
@@ -374,13 +605,13 @@ async def remove_inactive_slot_start(callback: CallbackQuery, state: FSMContext)
     await state.set_state(AdminStates.waiting_for_inactive_date_removal)
 
 @router.message(AdminStates.waiting_for_inactive_date, admin_filter)
-async def process_inactive_date(message: Message, state: FSMContext):
+async def process_inactive_date(message: Message, state: FSMContext, db: AsyncSession):
     try:
         date = datetime.strptime(message.text, "%d.%m.%Y").date()
         await state.update_data(inactive_date=date)
         
         # Показываем доступные временные слоты
-        available_slots = get_available_slots(date)
+        available_slots = await get_available_slots(db, date)
         if not available_slots:
             await message.answer(
                 f"На дату {date.strftime('%d.%m.%Y')} нет доступных слотов."
@@ -408,32 +639,24 @@ async def process_inactive_date(message: Message, state: FSMContext):
         )
 
 @router.callback_query(AdminStates.waiting_for_inactive_time, F.data.startswith("inactive_time_"))
-async def process_inactive_time(callback: CallbackQuery, state: FSMContext):
+async def process_inactive_time(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
     date = data['inactive_date']
     time = callback.data.split("_")[2]
-    db = next(get_db())
-    
-    print(f"Попытка добавить неактивный слот: дата={date}, время={time}")
     
-    if set_inactive_slot(db, date, time):
-        # Проверяем, что слот действительно добавлен
-        inactive_slots = get_inactive_slots(db, date)
-        print(f"Неактивные слоты после добавления: {[slot.time for slot in inactive_slots]}")
-        
+    if await set_inactive_slot(db, date, time):
         await callback.answer(f"✅ Слот {time} на {date.strftime('%d.%m.%Y')} добавлен в неактивные.")
     else:
         await callback.answer(f"❌ Ошибка при добавлении слота {time} на {date.strftime('%d.%m.%Y')}.")
     
     await state.clear()
-    await manage_dates(callback.message)
+    await manage_dates(callback.message, db)
 
 @router.message(AdminStates.waiting_for_inactive_date_removal, admin_filter)
-async def process_inactive_date_removal(message: Message, state: FSMContext):
+async def process_inactive_date_removal(message: Message, state: FSMContext, db: AsyncSession):
     try:
         date = datetime.strptime(message.text, "%d.%m.%Y").date()
-        db = next(get_db())
-        inactive_slots = get_inactive_slots(db, date)
+        inactive_slots = await get_inactive_slots(db, date)
         
         if not inactive_slots:
             await message.answer(
@@ -470,18 +693,165 @@ async def process_inactive_date_removal(message: Message, state: FSMContext):
         )
 
 @router.callback_query(AdminStates.waiting_for_inactive_time_removal, F.data.startswith("remove_inactive_"))
-async def process_inactive_time_removal(callback: CallbackQuery, state: FSMContext):
-    _, date_str, time = callback.data.split("_")
+async def process_inactive_time_removal(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
+    date_str, time = callback.data[len("remove_inactive_"):].split("_")
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    db = next(get_db())
     
-    if remove_inactive_slot(db, date, time):
+    if await remove_inactive_slot(db, date, time):
         await callback.answer(f"✅ Слот {time} на {date.strftime('%d.%m.%Y')} удален из неактивных.")
     else:
         await callback.answer(f"❌ Ошибка при удалении слота {time} на {date.strftime('%d.%m.%Y')}.")
     
     await state.clear()
-    await manage_dates(callback.message)
+    await manage_dates(callback.message, db)
+
+def parse_period(text: str) -> tuple:
+    """
+    Разбор периода "ДД.ММ.ГГГГ[-ДД.ММ.ГГГГ] [ЧЧ:ММ-ЧЧ:ММ]"
+
+    Возвращает (первая дата, последняя дата, начала слотов или None для
+    дней целиком). При неверном формате выбрасывается ValueError, при
+    периоде, который нельзя закрыть как указано, — PeriodError.
+    """
+    dates, _, hours = text.strip().partition(" ")
+    first, _, last = dates.partition("-")
+    start_date = datetime.strptime(first, "%d.%m.%Y").date()
+    end_date = datetime.strptime(last, "%d.%m.%Y").date() if last else start_date
+    if not 0 <= (end_date - start_date).days < MAX_PERIOD_DAYS:
+        raise PeriodError(f"Период должен быть не длиннее {MAX_PERIOD_DAYS} дней и не заканчиваться раньше начала")
+    times = None
+    if hours.strip():
+        intervals = parse_hours(hours)
+        if not intervals:
+            raise ValueError("не указано время")
+        try:
+            times = sorted({time for start, end in intervals for time in expand_times(start, end)})
+        except ValueError as e:
+            raise PeriodError(f"Неровный интервал: {e}") from e
+    return start_date, end_date, times
+
+def format_period(start_date, end_date, times) -> str:
+    period = start_date.strftime('%d.%m.%Y')
+    if end_date != start_date:
+        period += f" — {end_date.strftime('%d.%m.%Y')}"
+    if times:
+        period += f", слоты {', '.join(times)}"
+    else:
+        period += ", весь день"
+    return period
+
+@router.callback_query(F.data == "block_period", admin_filter)
+async def block_period_start(callback: CallbackQuery, state: FSMContext):
+    await callback.message.edit_text("🚫 Закрыть запись\n\n" + PERIOD_FORMAT_HELP)
+    await state.set_state(AdminStates.waiting_for_block_period)
+
+@router.callback_query(F.data == "unblock_period", admin_filter)
+async def unblock_period_start(callback: CallbackQuery, state: FSMContext):
+    await callback.message.edit_text("✅ Открыть запись\n\n" + PERIOD_FORMAT_HELP)
+    await state.set_state(AdminStates.waiting_for_unblock_period)
+
+@router.message(AdminStates.waiting_for_block_period, admin_filter)
+async def process_block_period(message: Message, state: FSMContext, db: AsyncSession):
+    try:
+        start_date, end_date, times = parse_period(message.text or "")
+    except PeriodError as e:
+        await message.answer(f"❌ {e}.\n\n" + PERIOD_FORMAT_HELP)
+        return
+    except ValueError:
+        await message.answer("❌ Неверный формат.\n\n" + PERIOD_FORMAT_HELP)
+        return
+    
+    await block_period(db, start_date, end_date, times)
+    await state.clear()
+    await message.answer(f"✅ Запись закрыта: {format_period(start_date, end_date, times)}")
+    await manage_dates(message, db)
+
+@router.message(AdminStates.waiting_for_unblock_period, admin_filter)
+async def process_unblock_period(message: Message, state: FSMContext, db: AsyncSession):
+    try:
+        start_date, end_date, times = parse_period(message.text or "")
+    except PeriodError as e:
+        await message.answer(f"❌ {e}.\n\n" + PERIOD_FORMAT_HELP)
+        return
+    except ValueError:
+        await message.answer("❌ Неверный формат.\n\n" + PERIOD_FORMAT_HELP)
+        return
+    
+    try:
+        removed = await unblock_period(db, start_date, end_date, times)
+    except ValueError as e:
+        await message.answer(f"❌ Не открыто: {e}.")
+        return
+    await state.clear()
+    if removed:
+        await message.answer(f"✅ Запись открыта: {format_period(start_date, end_date, times)}")
+    else:
+        await message.answer("В этом периоде не было закрытого времени.")
+    await manage_dates(message, db)
+
+async def render_appointments_page(db: AsyncSession, direction: str, cursor, start_date, end_date):
+    """Текст и клавиатура одной страницы списка записей"""
+    appointments, has_prev, has_next = await get_appointments_page(
+        db, start_date, end_date, cursor, direction, PAGE_SIZE
+    )
+    if not appointments and direction == 'at' and cursor is not None:
+        # Удалена последняя запись последней страницы — показываем предыдущую
+        appointments, has_prev, has_next = await get_appointments_page(
+            db, start_date, end_date, cursor, 'prev', PAGE_SIZE
+        )
+    
+    if not appointments:
+        if end_date is None and start_date == datetime.now().date():
+            return "На ближайшие дни записей нет.", None
+        return "В выбранном периоде записей нет.", None
+    
+    title = "📊 Список записей"
+    if end_date is not None:
+        title += f" с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}"
+    elif start_date != datetime.now().date():
+        title += f" с {start_date.strftime('%d.%m.%Y')}"
+    
+    return (
+        format_appointments_list(appointments, title),
+        create_appointments_list_keyboard(appointments, has_prev, has_next, start_date, end_date)
+    )
+
+def encode_page(direction: str, cursor, start_date, end_date) -> str:
+    """
+    Упаковка страницы списка в callback_data (лимит Telegram — 64 байта)
+
+    Формат: направление_курсор_начало_конец, где курсор — "ГГГГММДДччммсс-id"
+    граничной записи, а отсутствующие курсор и конец периода записываются как 0.
+    """
+    cursor_part = f"{cursor[0].strftime('%Y%m%d%H%M%S')}-{cursor[1]}" if cursor else "0"
+    end_part = end_date.strftime('%Y%m%d') if end_date else "0"
+    return f"{direction[0]}_{cursor_part}_{start_date.strftime('%Y%m%d')}_{end_part}"
+
+def decode_page(token: str) -> tuple:
+    """Разбор страницы списка из callback_data: (направление, курсор, начало, конец)"""
+    direction, cursor_part, start_part, end_part = token.split("_")
+    direction = {'n': 'next', 'p': 'prev', 'a': 'at'}[direction]
+    cursor = None
+    if cursor_part != "0":
+        date_part, appointment_id = cursor_part.split("-")
+        cursor = (datetime.strptime(date_part, '%Y%m%d%H%M%S'), int(appointment_id))
+    start_date = datetime.strptime(start_part, '%Y%m%d').date()
+    end_date = datetime.strptime(end_part, '%Y%m%d').date() if end_part != "0" else None
+    return direction, cursor, start_date, end_date
+
+def format_appointments_list(appointments, title: str = "📊 Список записей") -> str:
+    text = f"{title}:\n\n"
+    for app in appointments:
+        client = app.client
+        text += (
+            f"ID: {app.id}\n"
+            f"Процедура: {app.procedure.name}\n"
+            f"Длительность: {app.procedure.duration}ч\n"
+            f"📅 {app.date.strftime('%d.%m.%Y %H:%M')}\n"
+            f"👤 {client.name} (@{client.username})\n"
+            f"📱 {client.phone or 'Телефон не указан'}\n\n"
+        )
+    return text
 
 def create_admin_keyboard():
     from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
@@ -498,10 +868,10 @@ def create_admin_keyboard():
 def create_dates_keyboard(dates):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     keyboard = []
-    for date in dates:
+    for date, free_count in dates:
         keyboard.append([
             InlineKeyboardButton(
-                text=date.strftime("%d.%m.%Y"),
+                text=f"{date.strftime('%d.%m.%Y')} (свободно: {free_count})",
                 callback_data=f"date_{date.strftime('%Y-%m-%d')}"
             )
         ])
@@ -542,16 +912,35 @@ def create_appointments_keyboard(appointments):
         ])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def create_appointments_list_keyboard(appointments):
+def create_appointments_list_keyboard(appointments, has_prev: bool = False, has_next: bool = False,
+                                      start_date=None, end_date=None):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    start_date = start_date or datetime.now().date()
+    first, last = appointments[0], appointments[-1]
+    # Удаление перерисовывает страницу, начиная с ее первой записи
+    current_page = encode_page('at', (first.date, first.id), start_date, end_date)
     keyboard = []
     for app in appointments:
         keyboard.append([
             InlineKeyboardButton(
                 text=f"❌ Удалить запись {app.id}",
-                callback_data=f"delete_{app.id}"
+                callback_data=f"delete_{app.id}_{current_page}"
             )
         ])
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data="apl_" + encode_page('prev', (first.date, first.id), start_date, end_date)
+        ))
+    if has_next:
+        navigation.append(InlineKeyboardButton(
+            text="Вперед ▶️",
+            callback_data="apl_" + encode_page('next', (last.date, last.id), start_date, end_date)
+        ))
+    if navigation:
+        keyboard.append(navigation)
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 def create_dates_management_keyboard():
@@ -561,6 +950,10 @@ def create_dates_management_keyboard():
             [
                 InlineKeyboardButton(text="➕ Добавить неактивный слот", callback_data="add_inactive_slot"),
                 InlineKeyboardButton(text="➖ Удалить неактивный слот", callback_data="remove_inactive_slot")
+            ],
+            [
+                InlineKeyboardButton(text="🚫 Закрыть период", callback_data="block_period"),
+                InlineKeyboardButton(text="✅ Открыть период", callback_data="unblock_period")
             ]
         ]
     ) 
\ No newline at end of file
@@ -4,13 +4,15 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from models.database import get_db, Client, Appointment
-from services.booking import (
-    get_available_slots, create_appointment, cancel_appointment,
-    get_procedures, get_procedure_by_id,
-    notify_admins_about_new_appointment
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.async_booking import (
+    get_available_slots, get_available_dates, create_appointment, cancel_appointment,
+    get_procedures, get_procedure_by_id, get_or_create_client,
+    get_client_by_telegram_id, get_client_appointments, get_appointment, get_template
 )
+from services.booking import format_resource_line
+from services.templates import render
+from services.tenants import studio_name
 
 router = Router()
 
@@ -21,16 +23,16 @@ class BookingStates(StatesGroup):
     confirming = State()
 
 @router.message(Command("start"))
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, db: AsyncSession):
+    template = await get_template(db, 'welcome')
     await message.answer(
-        "👋 Добро пожаловать в бот для записи на процедуры!\n\n"
-        "Выберите действие:",
+        render(template, client=message.from_user.full_name, studio=studio_name()),
         reply_markup=create_client_keyboard()
     )
 
 @router.message(F.text == "📝 Записаться")
-async def start_booking(message: Message, state: FSMContext):
-    procedures = get_procedures()
+async def start_booking(message: Message, state: FSMContext, db: AsyncSession):
+    procedures = await get_procedures(db)
     keyboard = []
     for procedure in procedures:
         keyboard.append([
@@ -47,13 +49,17 @@ async def start_booking(message: Message, state: FSMContext):
     await state.set_state(BookingStates.selecting_procedure)
 
 @router.callback_query(BookingStates.selecting_procedure, F.data.startswith("proc_"))
-async def process_procedure_selection(callback: CallbackQuery, state: FSMContext):
+async def process_procedure_selection(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     procedure_id = int(callback.data.split("_")[1])
-    procedure = get_procedure_by_id(procedure_id)
     
-    await state.update_data(procedure_id=procedure_id)
+    procedure = await get_procedure_by_id(db, procedure_id)
+    if procedure is None:
+        await callback.message.edit_text("Эта процедура больше недоступна. Начните запись заново.")
+        await state.clear()
+        return
     
-    available_dates = get_available_slots()
+    await state.update_data(procedure_id=procedure_id)
+    available_dates = await get_available_dates(db, procedure.duration, procedure_id=procedure.id)
     if not available_dates:
         await callback.message.edit_text(
             "К сожалению, на ближайшие дни все слоты заняты. "
@@ -71,13 +77,15 @@ async def process_procedure_selection(callback: CallbackQuery, state: FSMContext
     await state.set_state(BookingStates.selecting_date)
 
 @router.callback_query(BookingStates.selecting_date, F.data.startswith("date_"))
-async def process_date_selection(callback: CallbackQuery, state: FSMContext):
+async def process_date_selection(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     date_str = callback.data.split("_")[1]
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
     await state.update_data(appointment_date=date)
+    data = await state.get_data()
     
-    # Получаем доступные слоты
-    available_slots = get_available_slots(date)
+    # Получаем доступные слоты, в которые помещается вся процедура
+    procedure = await get_procedure_by_id(db, data['procedure_id'])
+    available_slots = await get_available_slots(db, date, procedure.duration, procedure.id)
     
     if not available_slots:
         await callback.message.edit_text(
@@ -102,12 +110,12 @@ async def process_date_selection(callback: CallbackQuery, state: FSMContext):
     await state.set_state(BookingStates.selecting_time)
 
 @router.callback_query(BookingStates.selecting_time, F.data.startswith("time_"))
-async def process_time_selection(callback: CallbackQuery, state: FSMContext):
+async def process_time_selection(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     selected_time = callback.data.split("_")[1]
     data = await state.get_data()
     selected_date = data['appointment_date']
     procedure_id = data['procedure_id']
-    procedure = get_procedure_by_id(procedure_id)
+    procedure = await get_procedure_by_id(db, procedure_id)
     
     # Создаем полную дату и время
     appointment_datetime = datetime.combine(
@@ -128,38 +136,30 @@ async def process_time_selection(callback: CallbackQuery, state: FSMContext):
     await state.set_state(BookingStates.confirming)
 
 @router.callback_query(BookingStates.confirming, F.data == "confirm")
-async def process_confirmation(callback: CallbackQuery, state: FSMContext):
+async def process_confirmation(callback: CallbackQuery, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
     appointment_datetime = data['appointment_datetime']
     procedure_id = data['procedure_id']
     
     # Получаем или создаем клиента
-    db = next(get_db())
-    client = db.query(Client).filter(Client.telegram_id == callback.from_user.id).first()
-    
-    if not client:
-        client = Client(
-            telegram_id=callback.from_user.id,
-            username=callback.from_user.username,
-            name=callback.from_user.full_name
-        )
-        db.add(client)
-        db.commit()
+    client = await get_or_create_client(
+        db,
+        callback.from_user.id,
+        callback.from_user.username,
+        callback.from_user.full_name
+    )
     
     try:
-        appointment = create_appointment(db, client.id, procedure_id, appointment_datetime)
+        appointment = await create_appointment(db, client.id, procedure_id, appointment_datetime)
         await callback.message.edit_text(
             f"✅ Запись успешно создана!\n\n"
             f"Процедура: {appointment.procedure.name}\n"
             f"Длительность: {appointment.procedure.duration}ч\n"
+            f"{format_resource_line(appointment)}"
             f"Дата: {appointment.date.strftime('%d.%m.%Y')}\n"
             f"Время: {appointment.date.strftime('%H:%M')}"
         )
         
-        # Отправляем уведомление администраторам
-        bot = callback.bot
-        await notify_admins_about_new_appointment(bot, appointment)
-        
     except ValueError as e:
         await callback.message.edit_text(
             f"❌ Ошибка при создании записи: {str(e)}\n"
@@ -169,18 +169,14 @@ async def process_confirmation(callback: CallbackQuery, state: FSMContext):
     await state.clear()
 
 @router.message(F.text == "📋 Мои записи")
-async def show_my_appointments(message: Message):
-    db = next(get_db())
-    client = db.query(Client).filter(Client.telegram_id == message.from_user.id).first()
+async def show_my_appointments(message: Message, db: AsyncSession):
+    client = await get_client_by_telegram_id(db, message.from_user.id)
     
     if not client:
         await message.answer("У вас пока нет записей.")
         return
     
-    appointments = db.query(Appointment).filter(
-        Appointment.client_id == client.id,
-        Appointment.status == 'scheduled'
-    ).order_by(Appointment.date).all()
+    appointments = await get_client_appointments(db, client.id)
     
     if not appointments:
         await message.answer("У вас пока нет записей.")
@@ -198,28 +194,24 @@ async def show_my_appointments(message: Message):
     await message.answer(text, reply_markup=create_appointments_keyboard(appointments))
 
 @router.callback_query(F.data.startswith("cancel_"))
-async def process_cancel_selection(callback: CallbackQuery):
+async def process_cancel_selection(callback: CallbackQuery, db: AsyncSession):
     appointment_id = int(callback.data.split("_")[1])
-    db = next(get_db())
     
     # Сначала получаем клиента
-    client = db.query(Client).filter(Client.telegram_id == callback.from_user.id).first()
+    client = await get_client_by_telegram_id(db, callback.from_user.id)
     if not client:
         await callback.answer("Клиент не найден", show_alert=True)
         return
     
     # Затем проверяем, принадлежит ли запись этому клиенту
-    appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.client_id == client.id
-    ).first()
+    appointment = await get_appointment(db, appointment_id, client.id)
     
     if not appointment:
         await callback.answer("Запись не найдена", show_alert=True)
         return
     
     try:
-        if cancel_appointment(db, appointment_id):
+        if await cancel_appointment(db, appointment_id):
             await callback.answer("Запись успешно отменена!")
             await callback.message.edit_text(
                 f"✅ Запись на {appointment.date.strftime('%d.%m.%Y %H:%M')} отменена."
@@ -242,10 +234,10 @@ def create_client_keyboard():
 def create_dates_keyboard(dates):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     keyboard = []
-    for date in dates:
+    for date, free_count in dates:
         keyboard.append([
             InlineKeyboardButton(
-                text=date.strftime("%d.%m.%Y"),
+                text=f"{date.strftime('%d.%m.%Y')} (свободно: {free_count})",
                 callback_data=f"date_{date.strftime('%Y-%m-%d')}"
             )
         ])
@@ -1,15 +1,29 @@
 import asyncio
 import logging
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE, FSM_STORAGE, METRICS_PORT, SQL_PROFILE, SQL_PROFILE_REPORT_INTERVAL
 from handlers import client, admin
-from models.database import Base, engine
-from services.booking import init_inactive_dates
+from models.database import SessionLocal, session_scope, engine, async_engine, pool_stats
+from bootstrap import bootstrap
+from middlewares.database import DbSessionMiddleware
+from middlewares.tenant import TenantMiddleware
+from middlewares.fsm import FSMBatchMiddleware, move_state_reads
+from middlewares.throttling import ThrottlingMiddleware, throttling_stats
+from middlewares.metrics import UpdateMetricsMiddleware, HandlerMetricsMiddleware, TelegramMetricsMiddleware
+from middlewares.profiler import UpdateProfilerMiddleware, HandlerProfilerMiddleware
+import metrics
+from profiler import sql_profiler
+from services.fsm_storage import SQLStorage
+from services import async_booking
 from scheduler.notifier import setup_scheduler
-from models.database import InactiveSlot
-from datetime import datetime, timedelta
-from models.database import get_db
+from scheduler.outbox import OutboxWorker, outbox_stats
+from webhook import check_webhook_config, run_webhook, tenant_webhook_path
+from services.reminders import restore_reminders
+from services.repository import get_upcoming_appointment_times
+from services.tenants import tenant_registry
+from tenancy import DEFAULT_TENANT, tenant_scope
 
 # Настройка логирования
 logging.basicConfig(
@@ -18,55 +32,148 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def init_inactive_dates():
+async def warm_availability_cache():
     """
-    Инициализация неактивных дат на выходные дни
+    Прогрев кэша свободного времени студий на ближайшие дни
     """
-    db = next(get_db())
-    today = datetime.now().date()
+    for tenant in tenant_registry.all():
+        with tenant_scope(tenant.id):
+            async with session_scope() as db:
+                await async_booking.warm_availability_cache(db)
+
+def create_bots() -> dict:
+    """
+    Боты студий по их id; студия по умолчанию работает через BOT_TOKEN
+    """
+    bots = {tenant_id: Bot(token=token) for tenant_id, token in tenant_registry.bot_tokens(BOT_TOKEN).items()}
+    for tenant_id, bot in bots.items():
+        tenant_registry.register_bot(bot.id, tenant_id)
+    return bots
+
+def create_dispatcher() -> Dispatcher:
+    """
+    Диспетчер с промежуточными слоями и роутерами бота
+    """
+    if FSM_STORAGE == 'sql':
+        # Состояния сценариев в базе: общие для всех процессов бота
+        storage = SQLStorage()
+        dp = Dispatcher(storage=storage)
+    else:
+        storage = None
+        dp = Dispatcher()
+    
+    # Студия обновления выставляется первой: от нее зависят все запросы к базе
+    dp.update.outer_middleware(TenantMiddleware())
     
-    # Добавляем выходные на ближайшие 30 дней
-    for i in range(30):
-        date = today + timedelta(days=i)
-        if date.weekday() >= 5:  # 5 - суббота, 6 - воскресенье
-            # Проверяем, не существует ли уже такая дата
-            existing = db.query(InactiveSlot).filter(InactiveSlot.date == date).first()
-            if not existing:
-                inactive_slot = InactiveSlot(date=date, is_weekend=True)
-                db.add(inactive_slot)
+    if METRICS_PORT:
+        # Без METRICS_PORT метрики не добавляют ни одного слоя обработки
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        dp.message.middleware(HandlerMetricsMiddleware('message'))
+        dp.callback_query.middleware(HandlerMetricsMiddleware('callback_query'))
+    if SQL_PROFILE:
+        # Запросы приписываются обновлению, а внутри обработчика — ему самому
+        dp.update.outer_middleware(UpdateProfilerMiddleware())
+        dp.message.middleware(HandlerProfilerMiddleware())
+        dp.callback_query.middleware(HandlerProfilerMiddleware())
+    if storage is not None:
+        dp.update.outer_middleware(FSMBatchMiddleware(storage))
+    # Чтение состояния FSM-слоем aiogram — внутри слоев выше: оно попадает
+    # в счет запросов обновления и идет в рамках batch хранилища
+    move_state_reads(dp)
     
-    db.commit()
+    # Одна сессия базы данных на каждое обновление
+    dp.update.outer_middleware(DbSessionMiddleware())
+    
+    # Отсекаем повторные нажатия и слишком частые события до обработчиков
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    
+    # Регистрируем роутеры
+    dp.include_router(client.router)
+    dp.include_router(admin.router)
+    return dp
 
 async def main():
+    started = time.perf_counter()
     try:
-        # Создаем таблицы в базе данных
-        Base.metadata.create_all(engine)
+        if SQL_PROFILE:
+            # Профилировщик SQL: запросы обработчиков, медленные запросы и N+1
+            sql_profiler.attach(engine)
+            sql_profiler.attach(async_engine)
+            profiler_reports = asyncio.create_task(sql_profiler.run_reports(SQL_PROFILE_REPORT_INTERVAL))
         
-        # Инициализируем неактивные слоты
-        await init_inactive_dates()
+        if BOT_MODE == 'webhook':
+            # Ошибка в настройках webhook видна сразу, а не после подготовки базы
+            check_webhook_config()
         
-        # Инициализируем бота и диспетчер
-        bot = Bot(token=BOT_TOKEN)
-        dp = Dispatcher()
+        # Миграции, справочники и выходные дни — один идемпотентный шаг
+        bootstrap()
+        
+        # Прогреваем кэш свободного времени в фоне, не задерживая запуск
+        warmup = asyncio.create_task(warm_availability_cache())
         
-        # Регистрируем роутеры
-        dp.include_router(client.router)
-        dp.include_router(admin.router)
+        # Инициализируем ботов студий и общий диспетчер
+        bots = create_bots()
+        bot = bots[DEFAULT_TENANT]
+        dp = create_dispatcher()
+        if METRICS_PORT:
+            for tenant_bot in bots.values():
+                tenant_bot.session.middleware(TelegramMetricsMiddleware())
+            metrics.instrument_engine(async_engine)
 
         # Настройка планировщика для напоминаний
-        scheduler = setup_scheduler(bot)
+        scheduler = setup_scheduler()
         scheduler.start()
+        
+        # Досоздаем задачи напоминаний для записей, у которых их еще нет
+        restored = 0
+        with SessionLocal() as db:
+            for tenant in tenant_registry.all():
+                with tenant_scope(tenant.id):
+                    restored += restore_reminders(get_upcoming_appointment_times(db))
+        logger.info(f"Восстановлено задач напоминаний: {restored}")
+        
+        if METRICS_PORT:
+            metrics_runner = await metrics.start_metrics_server(scheduler)
 
-        # Запуск бота в режиме polling
-        logger.info("Бот запущен в режиме polling")
-        await dp.start_polling(bot)
+        # Доставка исходящих сообщений из очереди outbox
+        outbox_worker = OutboxWorker(bots)
+        outbox_worker.start()
+        logger.info(f"Запуск занял {(time.perf_counter() - started) * 1000:.0f} мс")
+        
+        if BOT_MODE == 'webhook':
+            await run_webhook(dp, bot, {
+                tenant_webhook_path(tenant_registry.get(tenant_id).slug): tenant_bot
+                for tenant_id, tenant_bot in bots.items() if tenant_id != DEFAULT_TENANT
+            })
+        else:
+            # Запуск ботов в режиме polling
+            logger.info(f"Бот запущен в режиме polling, студий: {len(bots)}")
+            await dp.start_polling(*bots.values())
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
         raise
     finally:
+        # Обновления уже обработаны: останавливаем фоновые задачи и закрываем соединения
+        if 'warmup' in locals():
+            warmup.cancel()
+        if 'profiler_reports' in locals():
+            profiler_reports.cancel()
+            logger.info(sql_profiler.report())
         if 'scheduler' in locals():
             scheduler.shutdown()
-        await bot.session.close()
+        if 'metrics_runner' in locals():
+            await metrics_runner.cleanup()
+        if 'outbox_worker' in locals():
+            await outbox_worker.stop()
+            logger.info(f"Статистика доставки сообщений: {outbox_stats.snapshot()}")
+        logger.info(f"Статистика ограничения частоты: {throttling_stats.snapshot()}")
+        if 'bots' in locals():
+            for tenant_bot in bots.values():
+                await tenant_bot.session.close()
+        await async_engine.dispose()
+        logger.info(f"Статистика пула соединений: {pool_stats.snapshot()}")
 
 if __name__ == '__main__':
     asyncio.run(main()) 
\ No newline at end of file
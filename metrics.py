@@ -0,0 +1,246 @@
+"""
+Метрики бота в формате Prometheus.
+
+Гистограммы времени обработчиков (по обработчику и префиксу callback_data),
+числа запросов к базе за одно обновление, запросов к Bot API и задач
+напоминаний, а также показатели пула соединений, очереди outbox, ограничения
+частоты и планировщика, которые считаются в момент запроса /metrics.
+Формат текстовый (text/plain; version=0.0.4), без сторонних библиотек.
+
+Метрики включаются параметром METRICS_PORT. Пока они выключены, ничего
+не регистрируется: промежуточные слои, слушатели событий SQLAlchemy и
+HTTP-сервер не создаются, а задачи напоминаний проверяют один флаг.
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from aiohttp import web
+from sqlalchemy import event
+from models.database import pool_stats, session_scope
+from middlewares.throttling import throttling_stats
+from scheduler.outbox import outbox_stats
+from services.async_booking import get_outbox_backlog
+from tenancy import all_tenants
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Границы корзин числа запросов к базе за обновление
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+enabled = False
+
+
+def _labels(names: tuple, values: tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Гистограмма наблюдений с метками"""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # значения меток -> [счетчики по корзинам..., сумма, количество]
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            bounds = [*self.buckets, "+Inf"]
+            for bound, count in zip(bounds, [*series[:-2], series[-1]]):
+                labels = _labels(self.labels, label_values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Гистограммы и функции, которые считают показатели в момент запроса"""
+
+    def __init__(self):
+        self.histograms = []
+        self.collectors = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        histogram = Histogram(*args, **kwargs)
+        self.histograms.append(histogram)
+        return histogram
+
+    def collector(self, func):
+        """
+        Регистрация функции показателей
+
+        func (обычная или async) возвращает список (имя, тип, описание, значение).
+        """
+        self.collectors.append(func)
+        return func
+
+    async def render(self) -> str:
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for collect in self.collectors:
+            try:
+                values = collect()
+                if asyncio.iscoroutine(values):
+                    values = await values
+            except Exception as e:
+                logger.warning(f"Не удалось собрать метрики {collect.__name__}: {e}")
+                continue
+            for name, kind, help, value in values:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+handler_duration = registry.histogram(
+    'bot_handler_duration_seconds', "Время работы обработчика события",
+    ('handler', 'event', 'prefix')
+)
+update_queries = registry.histogram(
+    'bot_update_db_queries', "Запросов к базе данных за одно обновление", buckets=QUERY_BUCKETS
+)
+telegram_request_duration = registry.histogram(
+    'bot_telegram_request_duration_seconds', "Время запроса к Bot API", ('method', 'result')
+)
+reminder_job_duration = registry.histogram(
+    'bot_reminder_job_duration_seconds', "Время задачи напоминания", ('kind',)
+)
+
+# Счетчик запросов к базе текущего обновления: список из одного числа
+_update_queries = ContextVar('update_queries', default=None)
+
+
+def start_update() -> object:
+    """Начало подсчета запросов к базе для текущего обновления"""
+    return _update_queries.set([0])
+
+
+def finish_update(token):
+    """Запись числа запросов обновления в гистограмму"""
+    counter = _update_queries.get()
+    _update_queries.reset(token)
+    update_queries.observe(counter[0])
+
+
+def _count_query(*args):
+    counter = _update_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine):
+    """Подсчет запросов движка (синхронного или асинхронного) по обновлениям"""
+    event.listen(getattr(engine, 'sync_engine', engine), 'before_cursor_execute', _count_query)
+
+
+def callback_prefix(data: str) -> str:
+    """
+    Префикс callback_data для метки: "proc_12" -> "proc_", "confirm" -> "confirm"
+
+    Обработчики отбирают callback_data по префиксам, поэтому число
+    разных меток ограничено набором кнопок бота.
+    """
+    head, separator, _ = (data or "").partition("_")
+    return head + separator
+
+
+def observe_reminder(kind: str, started: float):
+    reminder_job_duration.observe(time.perf_counter() - started, kind)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=await registry.render(), content_type='text/plain', charset='utf-8',
+                        headers={'X-Content-Type-Options': 'nosniff'})
+
+
+def create_metrics_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    return app
+
+
+def register_collectors(scheduler=None):
+    """Показатели пула, очереди outbox, ограничения частоты и планировщика"""
+    registry.collectors.clear()
+
+    @registry.collector
+    def pool():
+        stats = pool_stats.snapshot()
+        return [
+            ('bot_db_pool_checked_out', 'gauge', "Соединений выдано из пула", stats['checked_out']),
+            ('bot_db_pool_peak_checked_out', 'gauge', "Наибольшее число выданных соединений", stats['peak_checked_out']),
+            ('bot_db_pool_checkouts_total', 'counter', "Выдач соединений из пула", stats['checkouts']),
+            ('bot_db_pool_wait_seconds_max', 'gauge', "Наибольшее ожидание соединения", stats['max_wait_ms'] / 1000),
+        ]
+
+    @registry.collector
+    async def outbox():
+        # Очередь общая для всех студий
+        with all_tenants():
+            async with session_scope() as db:
+                backlog = await get_outbox_backlog(db)
+        stats = outbox_stats.snapshot()
+        return [
+            ('bot_outbox_pending', 'gauge', "Сообщений ждут отправки", backlog['pending']),
+            ('bot_outbox_failed', 'gauge', "Недоставленных сообщений", backlog['failed']),
+            ('bot_outbox_oldest_age_seconds', 'gauge', "Возраст самого старого сообщения в очереди", backlog['oldest_age_s']),
+            ('bot_outbox_sent_total', 'counter', "Отправлено сообщений", stats['sent']),
+            ('bot_outbox_retried_total', 'counter', "Повторных попыток отправки", stats['retried']),
+        ]
+
+    @registry.collector
+    def throttling():
+        stats = throttling_stats.snapshot()
+        return [
+            (f'bot_throttling_{name}_total', 'counter', "События фильтра частоты", value)
+            for name, value in stats.items()
+        ]
+
+    if scheduler is not None:
+        @registry.collector
+        async def reminders():
+            # Хранилище задач в базе: список задач читаем не в цикле событий
+            jobs = await asyncio.to_thread(scheduler.get_jobs)
+            now = datetime.now(timezone.utc)
+            overdue = sum(1 for job in jobs if job.next_run_time is not None and job.next_run_time <= now)
+            return [
+                ('bot_scheduler_jobs', 'gauge', "Задач в планировщике", len(jobs)),
+                ('bot_scheduler_overdue_jobs', 'gauge', "Задач, время которых уже наступило", overdue),
+            ]
+
+
+async def start_metrics_server(scheduler=None, host: str = METRICS_HOST,
+                               port: int = METRICS_PORT) -> web.AppRunner:
+    """Включение метрик и запуск HTTP-сервера /metrics"""
+    global enabled
+    enabled = True
+    register_collectors(scheduler)
+    runner = web.AppRunner(create_metrics_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
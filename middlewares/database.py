@@ -0,0 +1,22 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from models.database import session_scope
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает одну сессию базы данных на каждое обновление и передает ее
+    обработчикам в аргументе db. После обработки сессия коммитится
+    (или откатывается при ошибке) и закрывается.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with session_scope() as db:
+            data['db'] = db
+            return await handler(event, data)
@@ -0,0 +1,38 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+from services.fsm_storage import SQLStorage
+
+
+class FSMBatchMiddleware(BaseMiddleware):
+    """
+    Копит изменения состояния FSM за время обработки обновления и
+    записывает их в базу одним запросом после нее.
+
+    Регистрируется вместе с move_state_reads: иначе состояние, прочитанное
+    FSM-слоем aiogram до начала batch, читается внутри него еще раз.
+    """
+
+    def __init__(self, storage: SQLStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self.storage.batch():
+            return await handler(event, data)
+
+
+def move_state_reads(dp: Dispatcher):
+    """
+    Перенос FSM-слоя aiogram в конец внешних слоев обновления
+
+    Dispatcher регистрирует FSMContextMiddleware, который читает состояние,
+    раньше всех слоев бота. После переноса чтение идет внутри уже
+    открытого batch и остается единственным за обновление.
+    """
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(dp.fsm)
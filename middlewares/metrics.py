@@ -0,0 +1,74 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+import metrics
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Подсчет запросов к базе данных за одно обновление
+
+    Внешний слой dp.update. FSM-слой aiogram, который читает состояние
+    раньше всех слоев бота, create_dispatcher переносит за него
+    (middlewares.fsm.move_state_reads), поэтому в счет попадают чтение и
+    запись состояния и запросы обработчика.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        token = metrics.start_update()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.finish_update(token)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Время работы обработчиков сообщений и нажатий кнопок
+
+    Внутренний слой: вызывается только для события, которое прошло фильтры
+    обработчика, поэтому метка handler — имя функции-обработчика, а для
+    нажатий кнопок добавляется префикс callback_data.
+    """
+
+    def __init__(self, event_name: str):
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            prefix = metrics.callback_prefix(event.data) if isinstance(event, CallbackQuery) else ""
+            metrics.handler_duration.observe(
+                time.perf_counter() - started, data['handler'].callback.__name__, self.event_name, prefix
+            )
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Время запросов к Bot API по методу и результату"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        result = 'ok'
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            result = type(e).__name__
+            raise
+        finally:
+            metrics.telegram_request_duration.observe(
+                time.perf_counter() - started, type(method).__name__, result
+            )
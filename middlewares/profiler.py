@@ -0,0 +1,46 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from profiler import current_scope, profile_scope
+
+
+class UpdateProfilerMiddleware(BaseMiddleware):
+    """
+    Область профилирования SQL на одно обновление
+
+    Внешний слой dp.update: запросы промежуточных слоев (хранилище
+    состояний, сессия базы) приписываются виду обновления. Чтение
+    состояния FSM-слоем aiogram попадает в область, потому что
+    create_dispatcher переносит этот слой за слои бота
+    (middlewares.fsm.move_state_reads).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = f"update:{event.event_type}" if isinstance(event, Update) else "update"
+        with profile_scope(name):
+            return await handler(event, data)
+
+
+class HandlerProfilerMiddleware(BaseMiddleware):
+    """Приписывание запросов обработчику, который их выполняет"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        scope = current_scope()
+        if scope is None:
+            return await handler(event, data)
+        previous = scope.handler
+        scope.handler = data['handler'].callback.__name__
+        try:
+            return await handler(event, data)
+        finally:
+            scope.handler = previous
@@ -0,0 +1,25 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from services.tenants import tenant_registry
+from tenancy import tenant_scope
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Выставляет студию, к которой относится обновление, по боту, который его
+    получил. Все запросы к базе, кэши и проверки прав администратора в
+    обработчике работают в рамках этой студии; id студии передается
+    обработчикам в аргументе tenant_id.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        tenant_id = tenant_registry.for_bot(data['bot'].id)
+        with tenant_scope(tenant_id):
+            data['tenant_id'] = tenant_id
+            return await handler(event, data)
@@ -0,0 +1,112 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+from config import THROTTLE_RATE, THROTTLE_BURST, DUPLICATE_CALLBACK_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей и нажатий помнить, прежде чем выбросить устаревшие
+MAX_TRACKED = 10000
+
+
+class ThrottlingStats:
+    """Сколько событий пропущено к обработчикам и сколько отброшено"""
+
+    def __init__(self):
+        self.passed = 0
+        self.throttled = 0
+        self.duplicates = 0
+
+    def snapshot(self) -> dict:
+        return {
+            'passed': self.passed,
+            'throttled': self.throttled,
+            'duplicates': self.duplicates,
+        }
+
+
+throttling_stats = ThrottlingStats()
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты событий от одного пользователя
+
+    Повторное нажатие той же кнопки за window секунд отбрасывается, а
+    остальные события пропускаются не чаще rate в секунду с запасом burst.
+    На отброшенное нажатие сразу отвечаем, чтобы у пользователя не висели
+    «часики» на кнопке; обработчик, база данных и уведомления не вызываются.
+    """
+
+    def __init__(self, rate: float = THROTTLE_RATE, burst: float = THROTTLE_BURST,
+                 window: float = DUPLICATE_CALLBACK_WINDOW,
+                 stats: ThrottlingStats = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.stats = stats or throttling_stats
+        self.clock = clock
+        self._buckets = {}  # user_id -> (токены, время обновления)
+        self._callbacks = {}  # (user_id, data) -> время нажатия
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+
+        now = self.clock()
+        if isinstance(event, CallbackQuery) and self._is_duplicate(user.id, event.data, now):
+            self.stats.duplicates += 1
+            await self._shed(event)
+            return None
+        if not self._take_token(user.id, now):
+            self.stats.throttled += 1
+            await self._shed(event)
+            return None
+
+        self.stats.passed += 1
+        return await handler(event, data)
+
+    def _is_duplicate(self, user_id: int, payload: str, now: float) -> bool:
+        key = (user_id, payload)
+        last = self._callbacks.get(key)
+        if last is not None and now - last < self.window:
+            return True
+        if len(self._callbacks) >= MAX_TRACKED:
+            self._callbacks = {
+                key: pressed for key, pressed in self._callbacks.items()
+                if now - pressed < self.window
+            }
+        self._callbacks[key] = now
+        return False
+
+    def _take_token(self, user_id: int, now: float) -> bool:
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[user_id] = (tokens, now)
+            return False
+        if user_id not in self._buckets and len(self._buckets) >= MAX_TRACKED:
+            # Ведро, которое успело наполниться, ничего не ограничивает
+            full_after = self.burst / self.rate
+            self._buckets = {
+                user: bucket for user, bucket in self._buckets.items()
+                if now - bucket[1] < full_after
+            }
+        self._buckets[user_id] = (tokens - 1, now)
+        return True
+
+    async def _shed(self, event: TelegramObject):
+        if not isinstance(event, CallbackQuery):
+            return
+        try:
+            await event.answer()
+        except Exception as e:
+            logger.warning(f"Не удалось ответить на нажатие кнопки: {e}")
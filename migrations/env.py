@@ -0,0 +1,59 @@
+"""
+Окружение Alembic для миграций базы данных бота.
+
+URL базы данных берется из config.DATABASE_URL, если он не передан явно
+через параметр sqlalchemy.url (так делают тесты и run_migrations).
+"""
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from config import DATABASE_URL
+from models.database import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
+
+def run_migrations_offline() -> None:
+    """Генерация SQL-скрипта без подключения к базе данных"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Применение миграций к базе данных"""
+    connectable = config.attributes.get("connection")
+    if connectable is None:
+        connectable = engine_from_config(
+            config.get_section(config.config_ini_section, {}),
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+        )
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite не умеет ALTER TABLE для большинства операций
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,92 @@
+"""Начальная схема базы данных
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+Базы данных, созданные до появления миграций через Base.metadata.create_all,
+уже содержат часть таблиц — такие таблицы пропускаются.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    def create_table(name, *columns):
+        if name not in existing:
+            op.create_table(name, *columns)
+
+    create_table(
+        'clients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('telegram_id', sa.Integer(), nullable=True),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('telegram_id'),
+    )
+    create_table(
+        'procedures',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    create_table(
+        'inactive_slots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=True),
+        sa.Column('time', sa.String(), nullable=True),
+        sa.Column('is_weekend', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('date', 'time', name='uix_date_time'),
+    )
+    create_table(
+        'appointments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=True),
+        sa.Column('procedure_id', sa.Integer(), nullable=True),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('reminder_sent', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id']),
+        sa.ForeignKeyConstraint(['procedure_id'], ['procedures.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    create_table(
+        'slot_claims',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('unit', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('date', 'unit', name='uix_claim_date_unit'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('slot_claims')
+    op.drop_table('appointments')
+    op.drop_table('inactive_slots')
+    op.drop_table('procedures')
+    op.drop_table('clients')
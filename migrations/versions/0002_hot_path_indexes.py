@@ -0,0 +1,47 @@
+"""Индексы для частых запросов
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:05:00.000000
+
+Индекс по inactive_slots.date не нужен: уникальный индекс uix_date_time
+начинается с date и уже используется для выборок по дате и диапазону дат.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEDULED = sa.text("status = 'scheduled'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Запланированные записи по дате: свободное время, списки и напоминания
+    op.create_index(
+        'ix_appointments_scheduled_date', 'appointments', ['date'],
+        sqlite_where=SCHEDULED, postgresql_where=SCHEDULED,
+    )
+    op.create_index('ix_appointments_date_status', 'appointments', ['date', 'status'])
+    # Записи клиента: «Мои записи»
+    op.create_index('ix_appointments_client_status_date', 'appointments', ['client_id', 'status', 'date'])
+    # Поиск клиента администратором
+    op.create_index('ix_clients_username', 'clients', ['username'])
+    # Освобождение времени при отмене и удалении записи
+    op.create_index('ix_slot_claims_appointment_id', 'slot_claims', ['appointment_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_slot_claims_appointment_id', table_name='slot_claims')
+    op.drop_index('ix_clients_username', table_name='clients')
+    op.drop_index('ix_appointments_client_status_date', table_name='appointments')
+    op.drop_index('ix_appointments_date_status', table_name='appointments')
+    op.drop_index('ix_appointments_scheduled_date', table_name='appointments')
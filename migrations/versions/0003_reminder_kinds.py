@@ -0,0 +1,46 @@
+"""Отдельные отметки для каждого вида напоминаний
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 12:00:00.000000
+
+Один флаг reminder_sent покрывал и напоминание накануне, и напоминание
+в день процедуры. Его значение переносится в оба новых флага.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.add_column(sa.Column('day_before_reminder_sent', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('day_of_reminder_sent', sa.Boolean(), nullable=True))
+    op.execute(
+        "UPDATE appointments SET day_before_reminder_sent = reminder_sent, "
+        "day_of_reminder_sent = reminder_sent"
+    )
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_column('reminder_sent')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.add_column(sa.Column('reminder_sent', sa.Boolean(), nullable=True))
+    op.execute(
+        "UPDATE appointments SET reminder_sent = "
+        "(COALESCE(day_before_reminder_sent, FALSE) OR COALESCE(day_of_reminder_sent, FALSE))"
+    )
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_column('day_of_reminder_sent')
+        batch_op.drop_column('day_before_reminder_sent')
@@ -0,0 +1,52 @@
+"""Очередь исходящих сообщений (transactional outbox)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 14:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('dedup_key', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedup_key'),
+    )
+    op.create_index(
+        'ix_outbox_pending', 'outbox', ['priority', 'id'],
+        sqlite_where=PENDING, postgresql_where=PENDING,
+    )
+    op.create_index('ix_outbox_status_locked_until', 'outbox', ['status', 'locked_until'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outbox_status_locked_until', table_name='outbox')
+    op.drop_index('ix_outbox_pending', table_name='outbox')
+    op.drop_table('outbox')
@@ -0,0 +1,51 @@
+"""Расписание: рабочие часы по дням недели и исключения по датам
+
+Выходные дни больше не хранятся строками inactive_slots: они следуют из
+недельного расписания, поэтому заранее созданные строки выходных удаляются.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'working_hours',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('start', sa.String(), nullable=True),
+        sa.Column('end', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_working_hours_weekday', 'working_hours', ['weekday'])
+    op.create_table(
+        'schedule_exceptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('start', sa.String(), nullable=True),
+        sa.Column('end', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_schedule_exceptions_date', 'schedule_exceptions', ['date'])
+    op.execute(sa.text("DELETE FROM inactive_slots WHERE is_weekend"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_schedule_exceptions_date', table_name='schedule_exceptions')
+    op.drop_table('schedule_exceptions')
+    op.drop_index('ix_working_hours_weekday', table_name='working_hours')
+    op.drop_table('working_hours')
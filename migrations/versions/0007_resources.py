@@ -0,0 +1,77 @@
+"""Ресурсы: специалисты и кабинеты, допуск процедур к ресурсам
+
+Записи и занятое время получают ресурс; уникальность занятого времени
+становится раздельной для каждого ресурса. Существующие записи переходят
+к ресурсу по умолчанию — единственному специалисту, с которым бот работал раньше.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 20:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_RESOURCE = "Основной специалист"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    resources = op.create_table(
+        'resources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'procedure_resources',
+        sa.Column('procedure_id', sa.Integer(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['procedure_id'], ['procedures.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('procedure_id', 'resource_id'),
+    )
+    op.create_index('ix_procedure_resources_resource_id', 'procedure_resources', ['resource_id'])
+    op.bulk_insert(resources, [{'name': DEFAULT_RESOURCE, 'kind': 'specialist', 'is_active': True}])
+    default_id = f"(SELECT id FROM resources WHERE name = '{DEFAULT_RESOURCE}')"
+
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.add_column(sa.Column('resource_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_appointments_resource_id', 'resources', ['resource_id'], ['id'])
+    op.execute(f"UPDATE appointments SET resource_id = {default_id}")
+
+    with op.batch_alter_table('slot_claims') as batch_op:
+        batch_op.add_column(sa.Column('resource_id', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.drop_constraint('uix_claim_date_unit', type_='unique')
+        batch_op.create_unique_constraint('uix_claim_resource_date_unit', ['resource_id', 'date', 'unit'])
+    op.execute(f"UPDATE slot_claims SET resource_id = {default_id}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Без ресурсов занятое время снова общее: оставляем по одной заявке на отрезок
+    op.execute(
+        "DELETE FROM slot_claims WHERE id NOT IN "
+        "(SELECT MIN(id) FROM slot_claims GROUP BY date, unit)"
+    )
+    with op.batch_alter_table('slot_claims') as batch_op:
+        batch_op.drop_constraint('uix_claim_resource_date_unit', type_='unique')
+        batch_op.create_unique_constraint('uix_claim_date_unit', ['date', 'unit'])
+        batch_op.drop_column('resource_id')
+    with op.batch_alter_table('appointments') as batch_op:
+        batch_op.drop_constraint('fk_appointments_resource_id', type_='foreignkey')
+        batch_op.drop_column('resource_id')
+    op.drop_index('ix_procedure_resources_resource_id', table_name='procedure_resources')
+    op.drop_table('procedure_resources')
+    op.drop_table('resources')
@@ -0,0 +1,182 @@
+"""Студии (tenants): данные каждой студии отделены столбцом tenant_id
+
+Все данные, накопленные до миграции, переходят к студии по умолчанию,
+которая работает через бота BOT_TOKEN и администраторов ADMIN_IDS. Ее
+текст напоминания с адресом студии, раньше зашитый в код, становится
+шаблоном сообщения. Уникальные ключи и индексы горячих запросов
+начинаются с tenant_id.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 22:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEDULED = sa.text("status = 'scheduled'")
+
+DEFAULT_SLUG = 'default'
+
+LEGACY_REMINDER = (
+    "🔔  Здравствуйте!🤍\n\n"
+    "Вы записаны на процедуру:\n"
+    "{procedure}\n"
+    "📅 Дата: {date}\n"
+    "🕒 Время: {time}\n\n"
+    "Адрес: улица Пушкинская 31, корпус 3\n"
+    "Чтобы вам было легче меня найти, прикрепляю точные координаты студии, вы можете ввести их в картах:\n"
+    "44.0520270, 43.0663848\n"
+    "Ваш косметолог ~ Полина💜"
+)
+
+# Таблицы с данными студии в порядке зависимостей
+TABLES = [
+    'clients', 'procedures', 'resources', 'procedure_resources', 'appointments', 'inactive_slots',
+    'working_hours', 'schedule_exceptions', 'slot_claims', 'outbox',
+]
+
+# Безымянные UNIQUE из первых миграций: (таблица, столбец)
+UNNAMED_UNIQUE = [('clients', 'telegram_id'), ('procedures', 'name'), ('resources', 'name')]
+
+# (таблица, старый индекс, новый индекс, новые столбцы)
+INDEXES = [
+    ('clients', 'ix_clients_username', 'ix_clients_tenant_username', ['tenant_id', 'username']),
+    ('appointments', 'ix_appointments_date_status', 'ix_appointments_tenant_date_status',
+     ['tenant_id', 'date', 'status']),
+    ('working_hours', 'ix_working_hours_weekday', 'ix_working_hours_tenant_weekday',
+     ['tenant_id', 'weekday']),
+    ('schedule_exceptions', 'ix_schedule_exceptions_date', 'ix_schedule_exceptions_tenant_date',
+     ['tenant_id', 'date']),
+]
+
+# (таблица, старое имя, новое имя, новые столбцы)
+UNIQUES = [
+    ('inactive_slots', 'uix_date_time', 'uix_inactive_slots_tenant_date_time', ['tenant_id', 'date', 'time']),
+    ('slot_claims', 'uix_claim_resource_date_unit', 'uix_claim_tenant_resource_date_unit',
+     ['tenant_id', 'resource_id', 'date', 'unit']),
+]
+
+# Новые ключи вместо безымянных UNIQUE
+TENANT_UNIQUES = {
+    'clients': ('uix_clients_tenant_telegram_id', ['tenant_id', 'telegram_id']),
+    'procedures': ('uix_procedures_tenant_name', ['tenant_id', 'name']),
+    'resources': ('uix_resources_tenant_name', ['tenant_id', 'name']),
+}
+
+# Имена, под которыми SQLite-пересоздание таблицы видит безымянные UNIQUE
+BATCH_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def unnamed_unique(table: str, column: str) -> str:
+    """Имя безымянного UNIQUE: в SQLite — по BATCH_CONVENTION, в PostgreSQL — имя по умолчанию"""
+    if op.get_bind().dialect.name == 'sqlite':
+        return f"uq_{table}_{column}"
+    return f"{table}_{column}_key"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tenants = op.create_table(
+        'tenants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slug', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('bot_token', sa.String(), nullable=True),
+        sa.Column('admin_ids', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug'),
+        sa.UniqueConstraint('bot_token'),
+    )
+    op.bulk_insert(tenants, [{'slug': DEFAULT_SLUG, 'name': "Студия", 'admin_ids': '', 'is_active': True}])
+    default_id = f"(SELECT id FROM tenants WHERE slug = '{DEFAULT_SLUG}')"
+
+    op.create_table(
+        'message_templates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'name', name='uix_message_templates_tenant_name'),
+    )
+    op.execute(sa.text(
+        f"INSERT INTO message_templates (tenant_id, name, text) "
+        f"SELECT id, 'reminder', :text FROM tenants WHERE slug = '{DEFAULT_SLUG}'"
+    ).bindparams(text=LEGACY_REMINDER))
+
+    op.drop_index('ix_appointments_scheduled_date', table_name='appointments')
+    for table, old, new, columns in INDEXES:
+        op.drop_index(old, table_name=table)
+
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('tenant_id', sa.Integer(), nullable=True))
+        op.execute(f"UPDATE {table} SET tenant_id = {default_id}")
+
+    unnamed = dict(UNNAMED_UNIQUE)
+    uniques = {table: (old, new, columns) for table, old, new, columns in UNIQUES}
+    for table in TABLES:
+        with op.batch_alter_table(table, naming_convention=BATCH_CONVENTION) as batch_op:
+            batch_op.alter_column('tenant_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_foreign_key(f'fk_{table}_tenant_id', 'tenants', ['tenant_id'], ['id'])
+            if table in unnamed:
+                batch_op.drop_constraint(unnamed_unique(table, unnamed[table]), type_='unique')
+                batch_op.create_unique_constraint(*TENANT_UNIQUES[table])
+            if table in uniques:
+                old, new, columns = uniques[table]
+                batch_op.drop_constraint(old, type_='unique')
+                batch_op.create_unique_constraint(new, columns)
+
+    op.create_index(
+        'ix_appointments_tenant_scheduled_date', 'appointments', ['tenant_id', 'date'],
+        sqlite_where=SCHEDULED, postgresql_where=SCHEDULED,
+    )
+    for table, old, new, columns in INDEXES:
+        op.create_index(new, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Одна база снова обслуживает одну студию: данные остальных студий удаляются
+    default_id = f"(SELECT id FROM tenants WHERE slug = '{DEFAULT_SLUG}')"
+    for table in reversed(TABLES):
+        op.execute(f"DELETE FROM {table} WHERE tenant_id != {default_id}")
+
+    for table, old, new, columns in INDEXES:
+        op.drop_index(new, table_name=table)
+    op.drop_index('ix_appointments_tenant_scheduled_date', table_name='appointments')
+
+    unnamed = dict(UNNAMED_UNIQUE)
+    uniques = {table: (old, new, columns) for table, old, new, columns in UNIQUES}
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            if table in unnamed:
+                batch_op.drop_constraint(TENANT_UNIQUES[table][0], type_='unique')
+                batch_op.create_unique_constraint(unnamed_unique(table, unnamed[table]), [unnamed[table]])
+            if table in uniques:
+                old, new, columns = uniques[table]
+                batch_op.drop_constraint(new, type_='unique')
+                batch_op.create_unique_constraint(old, columns[1:])
+            batch_op.drop_constraint(f'fk_{table}_tenant_id', type_='foreignkey')
+            batch_op.drop_column('tenant_id')
+
+    for table, old, new, columns in INDEXES:
+        op.create_index(old, table, columns[1:])
+    op.create_index(
+        'ix_appointments_scheduled_date', 'appointments', ['date'],
+        sqlite_where=SCHEDULED, postgresql_where=SCHEDULED,
+    )
+    op.drop_table('message_templates')
+    op.drop_table('tenants')
@@ -0,0 +1,41 @@
+"""Уникальные правила недельного расписания
+
+Два процесса, одновременно заполнявшие расписание при первом запуске,
+могли добавить одни и те же часы дважды. Повторы удаляются, а уникальный
+индекс (tenant_id, weekday, start) дает заполнять расписание через
+INSERT ... ON CONFLICT DO NOTHING. Строки выходных (start = NULL) индекс
+не ограничивает: их повтор ни на что не влияет.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.text(
+        "DELETE FROM working_hours WHERE start IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM working_hours WHERE start IS NOT NULL "
+        "GROUP BY tenant_id, weekday, start)"
+    ))
+    op.create_index(
+        'uix_working_hours_tenant_weekday_start', 'working_hours',
+        ['tenant_id', 'weekday', 'start'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uix_working_hours_tenant_weekday_start', table_name='working_hours')
@@ -1,16 +1,68 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Date, UniqueConstraint
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from sqlalchemy import create_engine, event, text, Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Float, Date, UniqueConstraint, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import Session, declared_attr, relationship, sessionmaker, with_loader_criteria
 from datetime import datetime
 from config import DATABASE_URL
+from tenancy import current_tenant
 
 Base = declarative_base()
 
-class Client(Base):
+class Tenant(Base):
+    __tablename__ = 'tenants'
+    
+    id = Column(Integer, primary_key=True)
+    slug = Column(String, unique=True, nullable=False)  # короткое имя студии, часть пути webhook
+    name = Column(String, nullable=False)
+    bot_token = Column(String, unique=True)  # без токена — бот BOT_TOKEN (только студия по умолчанию)
+    admin_ids = Column(String, nullable=False, default='')  # Telegram ID администраторов через запятую
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TenantScoped:
+    """
+    Таблица с данными одной студии
+
+    Запросы ORM к таким таблицам видят только строки текущей студии,
+    новые строки получают ее id.
+    """
+    
+    @declared_attr
+    def tenant_id(cls):
+        return Column(Integer, ForeignKey('tenants.id'), nullable=False, default=current_tenant)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _filter_by_tenant(state):
+    """Условие на текущую студию для всех SELECT, UPDATE и DELETE через ORM"""
+    tenant_id = current_tenant()
+    if tenant_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(with_loader_criteria(
+            TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True
+        ))
+
+class MessageTemplate(TenantScoped, Base):
+    __tablename__ = 'message_templates'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)  # reminder, welcome
+    text = Column(Text, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'name', name='uix_message_templates_tenant_name'),
+    )
+
+class Client(TenantScoped, Base):
     __tablename__ = 'clients'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True)
+    telegram_id = Column(Integer)
     username = Column(String)
     name = Column(String)
     phone = Column(String)
@@ -18,31 +70,77 @@ class Client(Base):
     is_active = Column(Boolean, default=True)
     
     appointments = relationship("Appointment", back_populates="client")
+    
+    __table_args__ = (
+        # Один человек может быть клиентом нескольких студий
+        UniqueConstraint('tenant_id', 'telegram_id', name='uix_clients_tenant_telegram_id'),
+        Index('ix_clients_tenant_username', 'tenant_id', 'username'),
+    )
 
-class Procedure(Base):
+class Procedure(TenantScoped, Base):
     __tablename__ = 'procedures'
     
     id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True)
+    name = Column(String)
     duration = Column(Float)  # длительность в часах
     description = Column(String)
     appointments = relationship("Appointment", back_populates="procedure")
+    
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'name', name='uix_procedures_tenant_name'),
+    )
 
-class Appointment(Base):
+class Resource(TenantScoped, Base):
+    __tablename__ = 'resources'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default='specialist')  # specialist, room
+    is_active = Column(Boolean, nullable=False, default=True)
+    
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'name', name='uix_resources_tenant_name'),
+    )
+
+class ProcedureResource(TenantScoped, Base):
+    __tablename__ = 'procedure_resources'
+    
+    # Процедура без строк в этой таблице доступна у любого активного ресурса
+    procedure_id = Column(Integer, ForeignKey('procedures.id', ondelete='CASCADE'), primary_key=True)
+    resource_id = Column(Integer, ForeignKey('resources.id', ondelete='CASCADE'), primary_key=True)
+    
+    __table_args__ = (
+        Index('ix_procedure_resources_resource_id', 'resource_id'),
+    )
+
+class Appointment(TenantScoped, Base):
     __tablename__ = 'appointments'
     
     id = Column(Integer, primary_key=True)
     client_id = Column(Integer, ForeignKey('clients.id'))
     procedure_id = Column(Integer, ForeignKey('procedures.id'))
+    resource_id = Column(Integer, ForeignKey('resources.id'))  # специалист или кабинет записи
     date = Column(DateTime)
     status = Column(String, default='scheduled')  # scheduled, completed, cancelled
     created_at = Column(DateTime, default=datetime.utcnow)
-    reminder_sent = Column(Boolean, default=False)
+    day_before_reminder_sent = Column(Boolean, default=False)  # напоминание накануне
+    day_of_reminder_sent = Column(Boolean, default=False)  # напоминание в день процедуры
     
     client = relationship("Client", back_populates="appointments")
     procedure = relationship("Procedure", back_populates="appointments")
+    
+    __table_args__ = (
+        # Только запланированные записи, упорядоченные по дате
+        Index(
+            'ix_appointments_tenant_scheduled_date', 'tenant_id', 'date',
+            sqlite_where=text("status = 'scheduled'"),
+            postgresql_where=text("status = 'scheduled'")
+        ),
+        Index('ix_appointments_tenant_date_status', 'tenant_id', 'date', 'status'),
+        Index('ix_appointments_client_status_date', 'client_id', 'status', 'date'),
+    )
 
-class InactiveSlot(Base):
+class InactiveSlot(TenantScoped, Base):
     __tablename__ = 'inactive_slots'
     
     id = Column(Integer, primary_key=True)
@@ -51,7 +149,89 @@ class InactiveSlot(Base):
     is_weekend = Column(Boolean, default=False)  # True для субботы и воскресенья
     
     __table_args__ = (
-        UniqueConstraint('date', 'time', name='uix_date_time'),
+        UniqueConstraint('tenant_id', 'date', 'time', name='uix_inactive_slots_tenant_date_time'),
+    )
+
+class WorkingHours(TenantScoped, Base):
+    __tablename__ = 'working_hours'
+    
+    id = Column(Integer, primary_key=True)
+    weekday = Column(Integer, nullable=False)  # 0 - понедельник, 6 - воскресенье
+    start = Column(String)  # "HH:MM"; без времени — выходной день недели
+    end = Column(String)
+    
+    __table_args__ = (
+        Index('ix_working_hours_tenant_weekday', 'tenant_id', 'weekday'),
+        # Ключ для заполнения расписания без повторов при одновременном запуске
+        Index('uix_working_hours_tenant_weekday_start', 'tenant_id', 'weekday', 'start', unique=True),
+    )
+
+class ScheduleException(TenantScoped, Base):
+    __tablename__ = 'schedule_exceptions'
+    
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False)
+    start = Column(String)  # "HH:MM"; без времени — выходной день
+    end = Column(String)
+    
+    __table_args__ = (
+        Index('ix_schedule_exceptions_tenant_date', 'tenant_id', 'date'),
+    )
+
+class SlotClaim(TenantScoped, Base):
+    __tablename__ = 'slot_claims'
+    
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False)
+    unit = Column(Integer, nullable=False)  # номер отрезка CLAIM_UNIT минут от начала суток
+    appointment_id = Column(Integer, ForeignKey('appointments.id', ondelete='CASCADE'), nullable=False)
+    # Календарь, в котором занято время; 0 — общий календарь, пока ресурсы не заведены
+    resource_id = Column(Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'resource_id', 'date', 'unit', name='uix_claim_tenant_resource_date_unit'),
+        Index('ix_slot_claims_appointment_id', 'appointment_id'),
+    )
+
+# Условие частичного индекса очереди; внутри класса имя text занято колонкой
+OUTBOX_PENDING = text("status = 'pending'")
+
+class OutboxMessage(TenantScoped, Base):
+    __tablename__ = 'outbox'
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)  # меньше — раньше
+    dedup_key = Column(String, unique=True)  # повторная постановка с тем же ключом игнорируется
+    status = Column(String, nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # не отправлять раньше
+    locked_until = Column(DateTime)  # срок захвата сообщения воркером
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    last_error = Column(String)
+    
+    __table_args__ = (
+        # Очередь на отправку: ожидающие сообщения по приоритету
+        Index(
+            'ix_outbox_pending', 'priority', 'id',
+            sqlite_where=OUTBOX_PENDING,
+            postgresql_where=OUTBOX_PENDING,
+        ),
+        Index('ix_outbox_status_locked_until', 'status', 'locked_until'),
+    )
+
+class FSMState(Base):
+    __tablename__ = 'fsm_states'
+    
+    key = Column(String, primary_key=True)  # "bot:chat:user:thread:destiny" из StorageKey aiogram
+    state = Column(String)
+    data = Column(Text)  # данные сценария в JSON
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_fsm_states_updated_at', 'updated_at'),
     )
 
 # Создание подключения к базе данных
@@ -65,37 +245,180 @@ def get_db():
     finally:
         db.close()
 
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
+# Асинхронные драйверы для тех же баз данных
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
 
-# Инициализация процедур при первом запуске
-def init_procedures():
-    db = SessionLocal()
-    try:
-        # Проверяем, есть ли уже процедуры
-        if db.query(Procedure).count() == 0:
-            procedures = [
-                Procedure(
-                    name="Эстетика (уход, чистка, пилинг и пр.)",
-                    duration=1.5,
-                    description="Комплексные процедуры по уходу за кожей"
-                ),
-                Procedure(
-                    name="Контурная пластика губ",
-                    duration=1.0,
-                    description="Процедура увеличения объема губ"
-                ),
-                Procedure(
-                    name="Биоревитализация",
-                    duration=1.0,
-                    description="Процедура омоложения кожи"
+def make_async_url(url: str):
+    """Преобразование URL базы данных в URL с асинхронным драйвером"""
+    url = make_url(url)
+    backend = url.drivername.split('+')[0]
+    return url.set(drivername=ASYNC_DRIVERS.get(backend, url.drivername))
+
+class PoolStats:
+    """Статистика выдачи соединений из пула асинхронного подключения"""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record_wait(self, seconds: float):
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+    
+    def on_checkout(self, *args):
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+    
+    def on_checkin(self, *args):
+        self.checked_out -= 1
+    
+    def snapshot(self) -> dict:
+        return {
+            'checkouts': self.checkouts,
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'avg_wait_ms': self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+pool_stats = PoolStats()
+
+def instrumented_pool_class(url):
+    """
+    Класс пула по умолчанию для URL, который замеряет время ожидания соединения
+    """
+    base = url.get_dialect().get_pool_class(url)
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return base._do_get(self)
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+    
+    return type(f'Instrumented{base.__name__}', (base,), {'_do_get': _do_get})
+
+# Асинхронное подключение для обработчиков бота.
+# expire_on_commit=False: объекты остаются доступными после коммита,
+# ленивые загрузки в асинхронном коде невозможны
+async_url = make_async_url(DATABASE_URL)
+async_engine = create_async_engine(async_url, poolclass=instrumented_pool_class(async_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+event.listen(async_engine.sync_engine, 'checkout', pool_stats.on_checkout)
+event.listen(async_engine.sync_engine, 'checkin', pool_stats.on_checkin)
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Сессия на одну единицу работы: коммит при успехе, откат при ошибке,
+    закрытие и возврат соединения в пул в любом случае
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+def run_migrations(url: str = None):
+    """
+    Применение миграций Alembic до последней версии
+    """
+    from alembic import command
+    from alembic.config import Config
+    
+    alembic_config = Config(str(Path(__file__).resolve().parent.parent / 'alembic.ini'))
+    alembic_config.set_main_option('sqlalchemy.url', url or DATABASE_URL)
+    command.upgrade(alembic_config, 'head')
+
+def dialect_insert(db):
+    """
+    Конструктор INSERT с поддержкой ON CONFLICT для базы сессии db
+
+    Для SQLite и PostgreSQL возвращает insert() их диалекта, для остальных баз — None.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+# Строк в одном INSERT при массовой вставке
+INSERT_CHUNK = 500
+
+def insert_ignore(db, model, rows: list, index_elements: list) -> int:
+    """
+    Массовая вставка строк с пропуском уже существующих (без коммита)
+
+    Запросами INSERT ... ON CONFLICT DO NOTHING по INSERT_CHUNK строк; на
+    других базах — построчно в точках сохранения. Возвращает число добавленных строк.
+    """
+    if not rows:
+        return 0
+    insert = dialect_insert(db)
+    if insert is not None:
+        added = 0
+        # Пачками: число параметров одного запроса ограничено драйвером
+        for i in range(0, len(rows), INSERT_CHUNK):
+            result = db.execute(
+                insert(model).values(rows[i:i + INSERT_CHUNK]).on_conflict_do_nothing(
+                    index_elements=index_elements
                 )
-            ]
-            for procedure in procedures:
-                db.add(procedure)
-            db.commit()
-    finally:
-        db.close()
+            )
+            added += result.rowcount
+        return added
+    added = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.add(model(**row))
+            added += 1
+        except IntegrityError:
+            pass
+    return added
+
+# Справочник процедур для пустой базы
+DEFAULT_PROCEDURES = [
+    {
+        'name': "Эстетика (уход, чистка, пилинг и пр.)",
+        'duration': 1.5,
+        'description': "Комплексные процедуры по уходу за кожей",
+    },
+    {
+        'name': "Контурная пластика губ",
+        'duration': 1.0,
+        'description': "Процедура увеличения объема губ",
+    },
+    {
+        'name': "Биоревитализация",
+        'duration': 1.0,
+        'description': "Процедура омоложения кожи",
+    },
+]
+
+def seed_procedures(db) -> int:
+    """
+    Заполнение справочника процедур при первом запуске
 
-# Инициализируем процедуры при импорте модуля
-init_procedures() 
\ No newline at end of file
+    Справочник, который уже правил администратор, не трогаем; одновременный
+    запуск нескольких процессов не создает дублей. Процедуры получает
+    текущая студия. Возвращает число новых процедур.
+    """
+    if db.query(Procedure.id).first() is not None:
+        db.commit()
+        return 0
+    added = insert_ignore(db, Procedure, DEFAULT_PROCEDURES, ['tenant_id', 'name'])
+    db.commit()
+    return added
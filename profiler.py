@@ -0,0 +1,205 @@
+"""
+Профилировщик SQL-запросов по событиям движка SQLAlchemy.
+
+Каждый запрос приписывается обработчику aiogram, во время которого он
+выполнен (запросы промежуточных слоев — обновлению, запросы вне обновлений —
+"-"), и суммируется по нормализованному тексту: литералы и списки
+параметров заменяются на "?", поэтому одинаковые запросы с разными
+значениями попадают в одну строку. Профилировщик предупреждает в логе о
+медленных запросах и о запросе, который повторяется за одно обновление
+SQL_PROFILE_REPEAT раз и больше (типичный N+1 из-за ленивой загрузки), и
+раз в SQL_PROFILE_REPORT_INTERVAL секунд пишет в лог самые затратные запросы.
+
+Включается параметром SQL_PROFILE; выключенный профилировщик не
+подписывается на события и ничего не замеряет.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from config import SQL_PROFILE_SLOW_MS, SQL_PROFILE_REPEAT, SQL_PROFILE_TOP
+
+logger = logging.getLogger(__name__)
+
+# Сколько разных запросов хранить; новые сверх этого только считаются
+MAX_STATEMENTS = 1000
+
+# Длина текста запроса в сообщениях лога
+LOG_SQL_LENGTH = 300
+
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """
+    Текст запроса без значений
+
+    Параметры всех стилей, строки и числа заменяются на "?", списки
+    параметров (IN, строки VALUES) — на "(?...)" независимо от длины.
+    """
+    sql = _SPACES.sub(" ", statement).strip()
+    sql = _PARAMS.sub("?", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(?...)", sql)
+    return _ROWS.sub("(?...)", sql)
+
+
+class StatementStats:
+    """Сводка по одному нормализованному запросу"""
+
+    __slots__ = ('count', 'total', 'max', 'slow', 'repeated', 'handlers')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.repeated = 0
+        self.handlers = Counter()
+
+
+class ProfileScope:
+    """Запросы одного обновления: текущий обработчик и повторы запросов"""
+
+    def __init__(self, handler: str):
+        self.handler = handler
+        self.counts = Counter()
+
+
+_scope = ContextVar('sql_profile_scope', default=None)
+
+
+@contextmanager
+def profile_scope(handler: str = "-"):
+    """Область подсчета повторов, например одно обновление или одна задача"""
+    token = _scope.set(ProfileScope(handler))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+def current_scope():
+    return _scope.get()
+
+
+class SQLProfiler:
+    """Сводка запросов по тексту и обработчикам с предупреждениями о медленных и повторах"""
+
+    def __init__(self, slow_ms: float = SQL_PROFILE_SLOW_MS, repeat: int = SQL_PROFILE_REPEAT,
+                 top: int = SQL_PROFILE_TOP, max_statements: int = MAX_STATEMENTS):
+        self.slow_ms = slow_ms
+        self.repeat = repeat
+        self.top_n = top
+        self.max_statements = max_statements
+        self.statements = {}
+        self.dropped = 0
+
+    def attach(self, engine):
+        """Подписка на события движка (синхронного или асинхронного)"""
+        engine = getattr(engine, 'sync_engine', engine)
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._error)
+
+    def detach(self, engine):
+        engine = getattr(engine, 'sync_engine', engine)
+        event.remove(engine, 'before_cursor_execute', self._before)
+        event.remove(engine, 'after_cursor_execute', self._after)
+        event.remove(engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['profiler_started'].pop()
+        self.record(statement, time.perf_counter() - started)
+
+    def _error(self, context):
+        started = context.connection.info.get('profiler_started') if context.connection else None
+        if started:
+            started.pop()
+
+    def record(self, statement: str, elapsed: float):
+        """Учет одного выполненного запроса"""
+        scope = _scope.get()
+        handler = scope.handler if scope is not None else "-"
+        sql = normalize(statement)
+        stats = self.statements.get(sql)
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                self.dropped += 1
+                return
+            stats = self.statements[sql] = StatementStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        stats.handlers[handler] += 1
+
+        if elapsed * 1000 >= self.slow_ms:
+            stats.slow += 1
+            logger.warning(
+                f"Медленный запрос {elapsed * 1000:.0f} мс в {handler}: {sql[:LOG_SQL_LENGTH]}"
+            )
+        if scope is not None:
+            scope.counts[sql] += 1
+            # Предупреждаем один раз за обновление, когда повторов становится достаточно
+            if scope.counts[sql] == self.repeat:
+                stats.repeated += 1
+                logger.warning(
+                    f"Запрос выполнен {self.repeat} раз за одно обновление в {handler}, "
+                    f"возможен N+1: {sql[:LOG_SQL_LENGTH]}"
+                )
+
+    def top(self, n: int = None) -> list:
+        """Самые затратные запросы по суммарному времени"""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)
+        return [
+            {
+                'sql': sql,
+                'count': stats.count,
+                'total_ms': stats.total * 1000,
+                'avg_ms': stats.total / stats.count * 1000,
+                'max_ms': stats.max * 1000,
+                'slow': stats.slow,
+                'repeated': stats.repeated,
+                'handlers': dict(stats.handlers.most_common(3)),
+            }
+            for sql, stats in ranked[:n or self.top_n]
+        ]
+
+    def report(self, n: int = None) -> str:
+        lines = [f"Самые затратные SQL-запросы (всего разных: {len(self.statements)}):"]
+        for i, row in enumerate(self.top(n), 1):
+            handlers = ", ".join(f"{name} {count}" for name, count in row['handlers'].items())
+            lines.append(
+                f"{i}. {row['total_ms']:.0f} мс всего, {row['count']} раз, "
+                f"в среднем {row['avg_ms']:.2f} мс, максимум {row['max_ms']:.1f} мс, "
+                f"медленных {row['slow']}, N+1 {row['repeated']} [{handlers}]: "
+                f"{row['sql'][:LOG_SQL_LENGTH]}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        self.statements = {}
+        self.dropped = 0
+
+    async def run_reports(self, interval: float):
+        """Периодический отчет в лог, пока задачу не отменят"""
+        while True:
+            await asyncio.sleep(interval)
+            if self.statements:
+                logger.info(self.report())
+
+
+sql_profiler = SQLProfiler()
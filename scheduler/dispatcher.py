@@ -0,0 +1,205 @@
+"""
+Параллельная рассылка сообщений с учетом ограничений Telegram.
+
+Telegram принимает от бота не больше ~30 сообщений в секунду суммарно и
+не больше ~1 сообщения в секунду в один чат; при превышении он отвечает
+ошибкой RetryAfter с временем ожидания. ReminderDispatcher отправляет
+сообщения ограниченным пулом задач, берет токен из общего ведра и из ведра
+конкретного чата, а на RetryAfter и сетевые ошибки повторяет отправку
+с паузой вместо того, чтобы терять сообщение.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+)
+from config import REMINDER_CONCURRENCY, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE
+
+logger = logging.getLogger(__name__)
+
+# Сколько ведер чатов хранить, прежде чем выбросить простаивающие
+MAX_CHAT_BUCKETS = 1000
+
+
+class TokenBucket:
+    """Ведро токенов: не больше rate событий в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ожидание и взятие одного токена"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def is_idle(self) -> bool:
+        """Ведро полное и никто его не ждет — его можно забыть без потери ограничений"""
+        now = time.monotonic()
+        if self._lock.locked() or now < self._blocked_until:
+            return False
+        self._refill(now)
+        return self._tokens >= self.capacity
+
+    def blocked_for(self) -> float:
+        """Сколько секунд еще действует запрет на выдачу токенов"""
+        return max(self._blocked_until - time.monotonic(), 0.0)
+
+    def block(self, seconds: float):
+        """Запрет выдачи токенов на seconds секунд (ответ RetryAfter)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class DispatchStats:
+    """Итоги одного прогона рассылки"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors = Counter()
+        # Недоставленные сообщения, которые бесполезно повторять, и самая
+        # длинная пауза, которую потребовал Telegram
+        self.undeliverable = 0
+        self.retry_after = 0.0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def snapshot(self) -> dict:
+        elapsed = self.elapsed
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'errors': dict(self.errors),
+            'elapsed_s': elapsed,
+            'throughput_per_s': self.sent / elapsed if elapsed else 0.0,
+        }
+
+
+class ReminderDispatcher:
+    """
+    Рассылка сообщений пулом из concurrency задач
+
+    dispatch() принимает тройки (ключ, chat_id, текст) и возвращает ключи
+    доставленных сообщений вместе со статистикой прогона; сообщения,
+    которые не удалось доставить за max_attempts попыток, в результат
+    не попадают и могут быть отправлены при следующем прогоне.
+
+    max_wait ограничивает паузу RetryAfter, которую отправка выжидает сама:
+    если чат закрыт дольше, сообщение сразу считается недоставленным.
+    """
+
+    def __init__(self, bot, concurrency: int = REMINDER_CONCURRENCY,
+                 global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 chat_rate: float = TELEGRAM_CHAT_RATE,
+                 max_attempts: int = 5, backoff: float = 1.0, max_wait: float = None):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_wait = max_wait
+        # Без запаса: сообщения идут равномерно и не превышают лимит ни в одном окне
+        self.global_bucket = TokenBucket(global_rate, 1)
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                # Долгоживущий диспетчер (очередь outbox) не копит ведра всех чатов
+                self._chat_buckets = {
+                    chat: bucket for chat, bucket in self._chat_buckets.items()
+                    if not bucket.is_idle()
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+        return bucket
+
+    async def send(self, chat_id: int, text: str, stats: DispatchStats) -> bool:
+        """Отправка одного сообщения с повторами; True, если оно доставлено"""
+        chat_bucket = self._chat_bucket(chat_id)
+        for attempt in range(1, self.max_attempts + 1):
+            blocked = chat_bucket.blocked_for()
+            if self.max_wait is not None and blocked > self.max_wait:
+                stats.errors['retry_after'] += 1
+                stats.retry_after = max(stats.retry_after, blocked)
+                break
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                stats.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                stats.errors['retry_after'] += 1
+                # Пауза выдерживается ведром чата перед следующей попыткой
+                chat_bucket.block(e.retry_after)
+                stats.retry_after = max(stats.retry_after, e.retry_after)
+                delay = 0
+            except (TelegramNetworkError, TelegramServerError) as e:
+                stats.errors[type(e).__name__] += 1
+                delay = self.backoff * 2 ** (attempt - 1)
+            except Exception as e:
+                # Заблокированный бот, удаленный чат и т.п. — повтор не поможет
+                stats.errors[type(e).__name__] += 1
+                logger.warning("Не удалось отправить сообщение в чат %s: %s", chat_id, e)
+                stats.undeliverable += 1
+                break
+            if attempt < self.max_attempts:
+                stats.retries += 1
+                await asyncio.sleep(delay)
+        stats.failed += 1
+        return False
+
+    async def dispatch(self, messages) -> tuple:
+        """
+        Отправка сообщений (ключ, chat_id, текст)
+
+        Возвращает (список ключей доставленных сообщений, DispatchStats).
+        """
+        stats = DispatchStats()
+        queue = asyncio.Queue()
+        for message in messages:
+            queue.put_nowait(message)
+        delivered = []
+
+        async def worker():
+            while True:
+                try:
+                    key, chat_id, text = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if await self.send(chat_id, text, stats):
+                    delivered.append(key)
+
+        workers = min(self.concurrency, queue.qsize())
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        stats.finished = time.perf_counter()
+        # Ведра чатов нужны только в пределах одного прогона
+        self._chat_buckets.clear()
+        return delivered, stats
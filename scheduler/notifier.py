@@ -1,83 +1,79 @@
+import time
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
-from models.database import get_db, Appointment
-from config import REMINDER_BEFORE_DAY, REMINDER_DAY_OF
+from models.database import engine, session_scope, Appointment
+from services.async_booking import get_appointment, enqueue_reminder, get_template
+from services.templates import DEFAULT_TEMPLATES, render
+from services.tenants import studio_name
+from services.outbox import wake_workers
+from services.reminders import set_reminder_scheduler
+import metrics
+from tenancy import DEFAULT_TENANT, tenant_scope
+from config import TIMEZONE, REMINDER_MISFIRE_GRACE, FSM_CLEANUP_INTERVAL
 
-async def send_reminder(bot, chat_id: int, appointment: Appointment):
+
+def format_reminder(appointment: Appointment, template: str = DEFAULT_TEMPLATES['reminder']) -> str:
     """
-    Отправка напоминания клиенту
+    Текст напоминания клиенту по шаблону студии
     """
-    message = (
-        f"🔔  Здравствуйте!🤍\n\n"
-        f"Вы записаны на процедуру:\n"
-        f"{appointment.procedure.name}\n"
-        f"📅 Дата: {appointment.date.strftime('%d.%m.%Y')}\n"
-        f"🕒 Время: {appointment.date.strftime('%H:%M')}\n\n"
-        f"Адрес: улица Пушкинская 31, корпус 3\n"
-        f"Чтобы вам было легче меня найти, прикрепляю точные координаты студии, вы можете ввести их в картах:\n"
-        f"44.0520270, 43.0663848\n"
-        f"Ваш косметолог ~ Полина💜"
+    return render(
+        template,
+        procedure=appointment.procedure.name,
+        date=appointment.date.strftime('%d.%m.%Y'),
+        time=appointment.date.strftime('%H:%M'),
+        client=appointment.client.name or "",
+        studio=studio_name(),
     )
-    
-    try:
-        await bot.send_message(chat_id=chat_id, text=message)
-    except Exception as e:
-        print(f"Ошибка отправки напоминания: {e}")
 
-async def check_and_send_reminders(bot):
+async def send_reminder(bot, chat_id: int, appointment: Appointment, template: str = DEFAULT_TEMPLATES['reminder']):
     """
-    Проверка и отправка напоминаний
+    Отправка напоминания клиенту; ошибки отправки передаются вызывающему
     """
-    db = next(get_db())
-    now = datetime.now()
-    
-    # Проверяем записи на завтра
-    tomorrow = now.date() + timedelta(days=1)
-    tomorrow_appointments = db.query(Appointment).filter(
-        Appointment.date >= tomorrow,
-        Appointment.date < tomorrow + timedelta(days=1),
-        Appointment.status == 'scheduled',
-        Appointment.reminder_sent == False
-    ).all()
-    
-    for appointment in tomorrow_appointments:
-        await send_reminder(bot, appointment.client.telegram_id, appointment)
-        appointment.reminder_sent = True
-    
-    # Проверяем записи на сегодня
-    today_appointments = db.query(Appointment).filter(
-        Appointment.date >= now.date(),
-        Appointment.date < now.date() + timedelta(days=1),
-        Appointment.status == 'scheduled',
-        Appointment.reminder_sent == False
-    ).all()
-    
-    for appointment in today_appointments:
-        await send_reminder(bot, appointment.client.telegram_id, appointment)
-        appointment.reminder_sent = True
-    
-    db.commit()
+    await bot.send_message(chat_id=chat_id, text=format_reminder(appointment, template))
 
-def setup_scheduler(bot):
+async def send_appointment_reminder(appointment_id: int, kind: str, tenant_id: int = DEFAULT_TENANT):
+    """
+    Задача планировщика: постановка напоминания вида kind об одной записи в очередь outbox
+
+    Задачи, поставленные до появления студий, относятся к студии по умолчанию.
+    """
+    started = time.perf_counter()
+    try:
+        with tenant_scope(tenant_id):
+            async with session_scope() as db:
+                appointment = await get_appointment(db, appointment_id)
+                if appointment is None or appointment.status != 'scheduled':
+                    return
+                if getattr(appointment, f"{kind}_reminder_sent") or not appointment.client.telegram_id:
+                    return
+                template = await get_template(db, 'reminder')
+                await enqueue_reminder(db, appointment, kind, format_reminder(appointment, template))
+        wake_workers()
+    finally:
+        if metrics.enabled:
+            metrics.observe_reminder(kind, started)
+
+def setup_scheduler():
     """
     Настройка планировщика для отправки напоминаний
+
+    Задачи напоминаний хранятся в той же базе данных, что и записи,
+    и восстанавливаются после перезапуска. Напоминание, пропущенное во время
+    простоя, отправляется, если с его времени прошло не больше
+    REMINDER_MISFIRE_GRACE секунд. Сами сообщения доставляет очередь outbox.
     """
-    scheduler = AsyncIOScheduler()
-    
-    # Добавляем задачи для проверки и отправки напоминаний
-    scheduler.add_job(
-        check_and_send_reminders,
-        CronTrigger(hour=13, minute=32),  # В 8:00
-        args=[bot],
-        id='morning_reminders'
+    scheduler = AsyncIOScheduler(
+        jobstores={'default': SQLAlchemyJobStore(engine=engine, tablename='apscheduler_jobs')},
+        job_defaults={'misfire_grace_time': REMINDER_MISFIRE_GRACE, 'coalesce': True},
+        timezone=TIMEZONE
     )
-    
+    set_reminder_scheduler(scheduler)
+    # Удаление брошенных сценариев записи из хранилища FSM
     scheduler.add_job(
-        check_and_send_reminders,
-        CronTrigger(hour=13, minute=41),  # В 10:00
-        args=[bot],
-        id='evening_reminders'
+        'services.fsm_storage:cleanup_expired_states',
+        'interval',
+        seconds=FSM_CLEANUP_INTERVAL,
+        id='fsm_cleanup',
+        replace_existing=True
     )
-    
-    return scheduler 
\ No newline at end of file
+    return scheduler
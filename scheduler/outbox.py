@@ -0,0 +1,174 @@
+"""
+Фоновая доставка сообщений из очереди outbox.
+
+Опросчик забирает готовые сообщения из таблицы в порядке приоритета
+и складывает их в локальную очередь с приоритетом, а пул воркеров
+отправляет их через ReminderDispatcher с учетом лимитов Telegram.
+Локальная очередь маленькая, поэтому сообщение с более высоким
+приоритетом, поставленное позже, не ждет за длинной рассылкой.
+
+Очередь общая для всех студий: опросчик работает без фильтра по студии,
+а сообщение отправляется ботом той студии, которой оно принадлежит.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from models.database import session_scope
+from services import outbox
+from scheduler.dispatcher import DispatchStats, ReminderDispatcher
+from tenancy import DEFAULT_TENANT, all_tenants
+from config import (
+    OUTBOX_WORKERS, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxStats:
+    """Статистика доставки сообщений из очереди с момента запуска"""
+
+    def __init__(self):
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def record_sent(self, created_at: datetime):
+        # Задержка доставки: от записи сообщения в очередь до ответа Telegram
+        lag = max((datetime.utcnow() - created_at).total_seconds(), 0.0)
+        self.sent += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def snapshot(self) -> dict:
+        return {
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'avg_lag_ms': self.total_lag / self.sent * 1000 if self.sent else 0.0,
+            'max_lag_ms': self.max_lag * 1000,
+        }
+
+
+outbox_stats = OutboxStats()
+
+
+class OutboxWorker:
+    """Опросчик таблицы outbox и пул воркеров отправки"""
+
+    def __init__(self, bots, workers: int = OUTBOX_WORKERS,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, lease: float = OUTBOX_LEASE,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS, backoff: float = OUTBOX_BACKOFF,
+                 dispatcher: ReminderDispatcher = None, stats: OutboxStats = None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        # bots — один бот или боты студий по их id. Попытка из очереди — одна
+        # отправка: повторы с паузой делает сама очередь, а RetryAfter внутри
+        # отправки выжидается не дольше половины захвата, чтобы сообщение
+        # не успели передать другому воркеру
+        if not isinstance(bots, dict):
+            bots = {DEFAULT_TENANT: bots}
+        self.dispatchers = {
+            tenant_id: ReminderDispatcher(bot, max_attempts=1, max_wait=lease / 2)
+            for tenant_id, bot in bots.items()
+        }
+        if dispatcher is not None:
+            self.dispatchers[DEFAULT_TENANT] = dispatcher
+        self.dispatcher = self.dispatchers.get(DEFAULT_TENANT)
+        self.stats = stats or outbox_stats
+        self._queue = asyncio.PriorityQueue(maxsize=workers * 2)
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._running = False
+
+    def start(self):
+        """Запуск опросчика и воркеров в текущем цикле событий"""
+        self._running = True
+        outbox.set_wakeup(self._wakeup)
+        # Задачи наследуют контекст: очередь обслуживается без фильтра по студии
+        with all_tenants():
+            self._tasks = [asyncio.create_task(self._poll())]
+            self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Остановка: уже захваченные сообщения дорабатываются, остальные остаются в таблице
+        """
+        self._running = False
+        self._wakeup.set()
+        await self._tasks[0]
+        await self._queue.join()
+        for task in self._tasks[1:]:
+            task.cancel()
+        await asyncio.gather(*self._tasks[1:], return_exceptions=True)
+        outbox.set_wakeup(None)
+
+    async def _poll(self):
+        last_release = 0.0
+        while self._running:
+            # Сброс до выборки: сообщение, поставленное во время выборки, разбудит следующий цикл
+            self._wakeup.clear()
+            try:
+                if time.monotonic() - last_release >= self.lease:
+                    async with session_scope() as db:
+                        await db.run_sync(outbox.release_expired)
+                    last_release = time.monotonic()
+
+                free = self._queue.maxsize - self._queue.qsize()
+                messages = []
+                if free:
+                    async with session_scope() as db:
+                        messages = await db.run_sync(outbox.claim, free, self.lease)
+                for message in messages:
+                    self._queue.put_nowait((message.priority, message.id, message))
+            except Exception as e:
+                logger.error(f"Ошибка при выборке сообщений из очереди: {e}")
+                messages = []
+
+            if not messages or self._queue.full():
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _work(self):
+        while True:
+            _, _, message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as e:
+                logger.error(f"Ошибка при доставке сообщения {message.id}: {e}")
+            finally:
+                self._queue.task_done()
+                # Освободилось место в локальной очереди
+                self._wakeup.set()
+
+    async def _deliver(self, message):
+        run_stats = DispatchStats()
+        dispatcher = self.dispatchers.get(message.tenant_id)
+        if dispatcher is None:
+            # Бот студии не запущен: сообщение ждет его в очереди до исчерпания попыток
+            run_stats.errors['no_bot'] += 1
+        elif await dispatcher.send(message.chat_id, message.text, run_stats):
+            async with session_scope() as db:
+                await db.run_sync(outbox.mark_sent, message.id, message.locked_until)
+            self.stats.record_sent(message.created_at)
+            return
+
+        error = ", ".join(run_stats.errors) or "не доставлено"
+        async with session_scope() as db:
+            status = await db.run_sync(
+                outbox.mark_failed, message.id, message.locked_until, error,
+                self.max_attempts, self.backoff,
+                permanent=bool(run_stats.undeliverable), retry_after=run_stats.retry_after
+            )
+        if status == 'failed':
+            self.stats.failed += 1
+            logger.warning(f"Сообщение {message.id} не доставлено после {message.attempts} попыток: {error}")
+        else:
+            self.stats.retried += 1
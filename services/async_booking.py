@@ -0,0 +1,222 @@
+"""
+Асинхронные варианты сервисов записи для обработчиков бота.
+
+Логика остается в services.booking и services.repository: каждая функция
+выполняется через AsyncSession.run_sync поверх асинхронного драйвера
+(asyncpg или aiosqlite), поэтому ожидание базы данных не блокирует цикл
+событий aiogram.
+Все объекты возвращаются с уже загруженными связями — ленивые загрузки
+в асинхронном коде невозможны. Создание, отмена и удаление записи
+заодно ставят или снимают задачи напоминаний о ней.
+"""
+import asyncio
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import Appointment, Client
+from services import booking, outbox, reminders, repository, resources, schedule, templates
+from services.catalog import procedure_catalog
+from services.booking import HORIZON_DAYS
+
+
+async def get_available_slots(db: AsyncSession, date=None, duration: float = None, procedure_id: int = None):
+    """Получение доступных слотов с учетом длительности процедур"""
+    return await db.run_sync(
+        lambda session: booking.get_available_slots(date, duration, db=session, procedure_id=procedure_id)
+    )
+
+async def get_available_dates(db: AsyncSession, duration: float = None, days: int = HORIZON_DAYS,
+                              procedure_id: int = None) -> list:
+    """Получение дат, на которые еще можно записаться на процедуру"""
+    return await db.run_sync(
+        lambda session: booking.get_available_dates(duration, days, db=session, procedure_id=procedure_id)
+    )
+
+async def create_appointment(db: AsyncSession, client_id: int, procedure_id: int, date: datetime,
+                             resource_id: int = None) -> Appointment:
+    """Создание новой записи"""
+    def create(session):
+        appointment = booking.create_appointment(session, client_id, procedure_id, date, resource_id)
+        return repository.get_appointment(session, appointment.id)
+    appointment = await db.run_sync(create)
+    outbox.wake_workers()
+    # Хранилище задач планировщика синхронное — пишем в него вне цикла событий
+    await asyncio.to_thread(reminders.schedule_reminders, appointment.id, appointment.date)
+    return appointment
+
+async def cancel_appointment(db: AsyncSession, appointment_id: int) -> bool:
+    """Отмена записи"""
+    cancelled = await db.run_sync(booking.cancel_appointment, appointment_id)
+    if cancelled:
+        await asyncio.to_thread(reminders.cancel_reminders, appointment_id)
+    return cancelled
+
+async def complete_appointment(db: AsyncSession, appointment_id: int) -> bool:
+    """Завершение записи"""
+    completed = await db.run_sync(booking.complete_appointment, appointment_id)
+    if completed:
+        await asyncio.to_thread(reminders.cancel_reminders, appointment_id)
+    return completed
+
+async def delete_appointment(db: AsyncSession, appointment_id: int) -> bool:
+    """Удаление записи по ID"""
+    deleted = await db.run_sync(booking.delete_appointment, appointment_id)
+    if deleted:
+        await asyncio.to_thread(reminders.cancel_reminders, appointment_id)
+    return deleted
+
+async def get_appointment(db: AsyncSession, appointment_id: int, client_id: int = None):
+    """Получение записи по ID вместе с клиентом и процедурой"""
+    return await db.run_sync(repository.get_appointment, appointment_id, client_id)
+
+async def get_client_appointments(db: AsyncSession, client_id: int) -> list:
+    """Получение запланированных записей клиента"""
+    return await db.run_sync(repository.get_client_appointments, client_id)
+
+async def get_upcoming_appointments(db: AsyncSession) -> list:
+    """Получение запланированных записей начиная с сегодняшнего дня"""
+    return await db.run_sync(repository.get_upcoming_appointments)
+
+async def get_appointments_page(db: AsyncSession, start_date, end_date=None, cursor=None,
+                                direction: str = 'next', limit: int = 10):
+    """Страница запланированных записей с keyset-пагинацией по (date, id)"""
+    return await db.run_sync(
+        lambda session: repository.get_appointments_page(
+            session, start_date, end_date, cursor, direction, limit
+        )
+    )
+
+async def get_upcoming_appointment_times(db: AsyncSession) -> list:
+    """Пары (id, дата) запланированных записей начиная с текущего момента"""
+    return await db.run_sync(repository.get_upcoming_appointment_times)
+
+async def enqueue_reminder(db: AsyncSession, appointment: Appointment, kind: str, text: str) -> bool:
+    """Постановка напоминания в очередь outbox вместе с отметкой о нем"""
+    return await db.run_sync(booking.enqueue_reminder, appointment, kind, text)
+
+async def mark_reminders_sent(db: AsyncSession, appointment_ids: list, kind: str):
+    """Отметка об отправленных напоминаниях вида kind"""
+    await db.run_sync(booking.mark_reminders_sent, appointment_ids, kind)
+
+async def get_client_by_telegram_id(db: AsyncSession, telegram_id: int) -> Client:
+    """Получение клиента по Telegram ID"""
+    return await db.run_sync(repository.get_client_by_telegram_id, telegram_id)
+
+async def get_client_by_username(db: AsyncSession, username: str) -> Client:
+    """Получение клиента по username"""
+    return await db.run_sync(repository.get_client_by_username, username)
+
+async def get_client_by_id(db: AsyncSession, client_id: int) -> Client:
+    """Получение клиента по ID"""
+    return await db.run_sync(repository.get_client_by_id, client_id)
+
+async def get_or_create_client(db: AsyncSession, telegram_id: int, username: str, name: str) -> Client:
+    """Получение клиента по Telegram ID или его регистрация"""
+    return await db.run_sync(booking.get_or_create_client, telegram_id, username, name)
+
+async def get_procedures(db: AsyncSession) -> list:
+    """Получение списка всех процедур; база данных читается, только если каталог устарел"""
+    if not procedure_catalog.is_fresh():
+        await db.run_sync(procedure_catalog.load)
+    return list(procedure_catalog.all())
+
+async def get_procedure_by_id(db: AsyncSession, procedure_id: int):
+    """Получение процедуры по ID из справочника в памяти; неизвестный id — None без запроса к базе"""
+    if not procedure_catalog.is_fresh():
+        await db.run_sync(procedure_catalog.load)
+    return procedure_catalog.get(procedure_id)
+
+async def get_procedure_duration(db: AsyncSession, procedure_id: int) -> float:
+    """Получение длительности процедуры в часах"""
+    procedure = await get_procedure_by_id(db, procedure_id)
+    return procedure.duration if procedure else 0.0
+
+async def reload_procedures(db: AsyncSession) -> list:
+    """Принудительное перечитывание справочника процедур"""
+    await db.run_sync(procedure_catalog.load)
+    return list(procedure_catalog.all())
+
+async def set_inactive_slot(db: AsyncSession, date, time: str, is_weekend: bool = False) -> bool:
+    """Установка временного слота как неактивного"""
+    return await db.run_sync(booking.set_inactive_slot, date, time, is_weekend)
+
+async def remove_inactive_slot(db: AsyncSession, date, time: str) -> bool:
+    """Удаление временного слота из неактивных"""
+    return await db.run_sync(booking.remove_inactive_slot, date, time)
+
+async def block_period(db: AsyncSession, start_date, end_date, times: list = None) -> int:
+    """Закрытие записи на период (дни целиком или отдельные слоты)"""
+    return await db.run_sync(booking.block_period, start_date, end_date, times)
+
+async def unblock_period(db: AsyncSession, start_date, end_date, times: list = None) -> int:
+    """Открытие записи на период"""
+    return await db.run_sync(booking.unblock_period, start_date, end_date, times)
+
+async def get_inactive_slots(db: AsyncSession, date=None) -> list:
+    """Получение списка неактивных слотов"""
+    return await db.run_sync(booking.get_inactive_slots, date)
+
+async def get_weekly_hours(db: AsyncSession) -> dict:
+    """Недельное расписание работы"""
+    return await db.run_sync(schedule.get_weekly_hours)
+
+async def set_working_hours(db: AsyncSession, weekday: int, intervals: list):
+    """Замена рабочих часов дня недели"""
+    await db.run_sync(schedule.set_working_hours, weekday, intervals)
+
+async def get_schedule_exceptions(db: AsyncSession, start_date, days: int = 60) -> dict:
+    """Исключения из расписания на ближайшие дни"""
+    return await db.run_sync(schedule.get_exceptions, start_date, days)
+
+async def set_schedule_exception(db: AsyncSession, day, intervals: list):
+    """Особые часы работы или выходной на дату"""
+    await db.run_sync(schedule.set_exception, day, intervals)
+
+async def remove_schedule_exception(db: AsyncSession, day) -> bool:
+    """Возврат даты к недельному расписанию"""
+    return await db.run_sync(schedule.remove_exception, day)
+
+async def get_resources(db: AsyncSession) -> list:
+    """Все ресурсы с id допущенных процедур"""
+    return await db.run_sync(resources.get_resources)
+
+async def add_resource(db: AsyncSession, name: str, kind: str = 'specialist'):
+    """Новый специалист или кабинет"""
+    return await db.run_sync(resources.add_resource, name, kind)
+
+async def set_resource_procedures(db: AsyncSession, resource_id: int, procedure_ids: list) -> bool:
+    """Замена списка процедур, которые выполняет ресурс"""
+    return await db.run_sync(resources.set_resource_procedures, resource_id, procedure_ids)
+
+async def set_resource_active(db: AsyncSession, resource_id: int, is_active: bool) -> bool:
+    """Включение или выключение ресурса"""
+    return await db.run_sync(resources.set_resource_active, resource_id, is_active)
+
+async def get_template(db: AsyncSession, name: str) -> str:
+    """Шаблон сообщения студии; база данных читается, только если шаблоны устарели"""
+    if not templates.template_catalog.is_fresh():
+        await db.run_sync(templates.template_catalog.load)
+    return templates.template_catalog.get(name)
+
+async def set_template(db: AsyncSession, name: str, text: str):
+    """Замена шаблона сообщения студии"""
+    await db.run_sync(templates.set_template, name, text)
+
+async def reset_template(db: AsyncSession, name: str) -> bool:
+    """Возврат шаблона сообщения к тексту по умолчанию"""
+    return await db.run_sync(templates.reset_template, name)
+
+async def get_outbox_backlog(db: AsyncSession) -> dict:
+    """Размер очереди исходящих сообщений и возраст самого старого из них"""
+    return await db.run_sync(outbox.backlog)
+
+async def get_upcoming_inactive_slots(db: AsyncSession) -> list:
+    """Получение неактивных слотов начиная с сегодняшнего дня"""
+    return await db.run_sync(repository.get_upcoming_inactive_slots)
+
+async def backfill_slot_claims(db: AsyncSession) -> int:
+    """Занятие отрезков времени для будущих записей, созданных до появления slot_claims"""
+    return await db.run_sync(booking.backfill_slot_claims)
+
+async def warm_availability_cache(db: AsyncSession, days: int = HORIZON_DAYS):
+    """Прогрев кэша свободного времени на ближайшие дни"""
+    await db.run_sync(lambda session: booking.warm_availability_cache(days, db=session))
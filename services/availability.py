@@ -0,0 +1,307 @@
+"""
+Движок расчёта свободного времени.
+
+Каждый день хранится как битовая маска занятых минут (бит i — минута i
+от полуночи). Проверка «свободен ли интервал» сводится к одному сдвигу и
+побитовому И, поэтому ответ на вопрос «с какого времени можно начать
+процедуру» стоит O(количества слотов) и не требует ORM-объектов.
+
+Записи разных ресурсов (специалистов, кабинетов) хранятся отдельными
+масками. Свободные начала для ресурса получаются одной маской — занятость,
+растянутая на длину процедуры, — а ответ «у любого свободного специалиста»
+— объединением таких масок по допущенным ресурсам.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date as date_type, datetime
+from tenancy import TenantLocal
+from config import WORK_START, WORK_END, SLOT_DURATION, AVAILABILITY_CACHE_SIZE
+
+MINUTES_IN_DAY = 24 * 60
+
+# Размер отрезка, которым записи занимают время в таблице slot_claims
+CLAIM_UNIT = 15
+
+
+def time_to_minutes(value) -> int:
+    """Перевод времени ("HH:MM", time или datetime) в минуты от начала суток"""
+    if isinstance(value, str):
+        hours, minutes = value.split(":")
+        return int(hours) * 60 + int(minutes)
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(minutes: int) -> str:
+    """Перевод минут от начала суток в строку "HH:MM" """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def duration_to_minutes(duration: float) -> int:
+    """Перевод длительности процедуры из часов в минуты"""
+    return int(round(duration * 60))
+
+
+def claim_units(start: int, length: int) -> range:
+    """Номера отрезков CLAIM_UNIT, которые перекрывает интервал [start, start + length)"""
+    end = min(start + length, MINUTES_IN_DAY)
+    return range(start // CLAIM_UNIT, -(-end // CLAIM_UNIT))
+
+
+def interval_mask(start: int, length: int) -> int:
+    """Битовая маска минут [start, start + length) в пределах суток"""
+    end = min(start + length, MINUTES_IN_DAY)
+    start = max(start, 0)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def blocked_starts(busy: int, length: int) -> int:
+    """
+    Маска минут, начиная с которых интервал длиной length задевает занятое время
+
+    Бит s установлен, если в [s, s + length) есть занятая минута. Маска
+    растягивается удвоением сдвига: O(log length) операций вместо проверки
+    каждого начала.
+    """
+    mask, span = busy, 1
+    while span < length:
+        shift = min(span, length - span)
+        mask |= mask >> shift
+        span += shift
+    return mask
+
+
+class DayGrid:
+    """Рабочие интервалы дня и шаг, с которым предлагаются начала записи"""
+    __slots__ = ('hours', 'step')
+
+    def __init__(self, hours, step: int):
+        # Интервалы (начало, конец) в минутах; смежные и пересекающиеся сливаются
+        merged = []
+        for start, end in sorted(hours):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            elif start < end:
+                merged.append((start, end))
+        self.hours = tuple(merged)
+        self.step = step
+
+    @classmethod
+    def from_config(cls) -> 'DayGrid':
+        return cls([(time_to_minutes(WORK_START), time_to_minutes(WORK_END))], SLOT_DURATION)
+
+    def starts(self):
+        """Начала записи: от начала каждого рабочего интервала с шагом step"""
+        for start, end in self.hours:
+            yield from range(start, end, self.step)
+
+    def fits(self, start: int, length: int) -> bool:
+        """Помещается ли процедура [start, start + length) в один рабочий интервал"""
+        return any(begin <= start and start + length <= end for begin, end in self.hours)
+
+    def start_mask(self, length: int) -> int:
+        """Маска начал, с которых процедура длиной length помещается в рабочий интервал"""
+        mask = 0
+        for start in self.starts():
+            if self.fits(start, length):
+                mask |= 1 << start
+        return mask
+
+
+class DayAvailability:
+    """
+    Занятость одного дня в виде битовых масок минут
+
+    busy — время, закрытое для всех (неактивные слоты, записи без ресурса),
+    resources — ресурс -> минуты, занятые его записями.
+    """
+    __slots__ = ('day', 'busy', 'grid', 'resources')
+
+    def __init__(self, day: date_type, busy: int = 0, grid: DayGrid = None, resources: dict = None):
+        self.day = day
+        self.busy = busy
+        self.grid = grid
+        self.resources = resources if resources is not None else {}
+
+    def occupy(self, start: int, length: int, resource: int = None):
+        """Пометить интервал [start, start + length) как занятый у ресурса или у всех"""
+        mask = interval_mask(start, length)
+        if resource is None:
+            self.busy |= mask
+        else:
+            self.resources[resource] = self.resources.get(resource, 0) | mask
+
+    def close(self):
+        """Пометить весь день как занятый"""
+        self.busy = interval_mask(0, MINUTES_IN_DAY)
+
+    def busy_for(self, resource: int = None) -> int:
+        """
+        Занятые минуты календаря ресурса
+
+        Без ресурса студия считается одним календарем: занято время
+        записей всех ресурсов.
+        """
+        if resource is None:
+            busy = self.busy
+            for mask in self.resources.values():
+                busy |= mask
+            return busy
+        return self.busy | self.resources.get(resource, 0)
+
+    def is_free(self, start: int, length: int, resource: int = None) -> bool:
+        """Свободен ли интервал [start, start + length)"""
+        return not self.busy_for(resource) & interval_mask(start, length)
+
+    def free_mask(self, length: int, grid: DayGrid = None, resource_ids=None) -> int:
+        """Маска начал, свободных хотя бы у одного из resource_ids (без них — в общем календаре)"""
+        grid = grid or self.grid or DayGrid.from_config()
+        fits = grid.start_mask(length)
+        if resource_ids is None:
+            return fits & ~blocked_starts(self.busy_for(), length)
+        free = 0
+        for resource in resource_ids:
+            free |= ~blocked_starts(self.busy_for(resource), length)
+            if fits & free == fits:
+                break
+        return fits & free
+
+    def free_starts(self, length: int, grid: DayGrid = None, resource_ids=None) -> list:
+        """Минуты, с которых процедура длиной length целиком помещается в рабочий интервал"""
+        grid = grid or self.grid or DayGrid.from_config()
+        free = self.free_mask(length, grid, resource_ids)
+        return [start for start in grid.starts() if (free >> start) & 1]
+
+    def free_resources(self, start: int, length: int, resource_ids) -> list:
+        """Ресурсы, у которых интервал [start, start + length) свободен"""
+        mask = interval_mask(start, length)
+        return [resource for resource in resource_ids if not self.busy_for(resource) & mask]
+
+    def load(self, resource: int) -> int:
+        """Минуты дня, занятые записями ресурса"""
+        return self.resources.get(resource, 0).bit_count()
+
+
+def build_day(day: date_type, appointments, inactive_times, slot_length: int,
+              grid: DayGrid = None) -> DayAvailability:
+    """
+    Построение занятости дня
+
+    appointments — пары (начало записи, длительность в часах) или тройки
+    с ресурсом записи (None — запись занимает время всей студии),
+    inactive_times — времена "HH:MM" неактивных слотов; None закрывает весь день,
+    grid — рабочие интервалы дня по расписанию.
+    """
+    availability = DayAvailability(day, grid=grid)
+    for start, duration, *resource in appointments:
+        if isinstance(start, datetime):
+            start = start.time()
+        availability.occupy(
+            time_to_minutes(start), duration_to_minutes(duration), resource[0] if resource else None
+        )
+    for time in inactive_times:
+        if time is None:
+            availability.close()
+            break
+        availability.occupy(time_to_minutes(time), slot_length)
+    return availability
+
+
+class AvailabilityCache:
+    """
+    Кэш свободного времени в памяти процесса
+
+    Ключ — (дата, длительность процедуры в минутах, допущенные ресурсы). У каждой даты есть счетчик
+    версий: любое изменение записей или неактивных слотов на эту дату
+    увеличивает версию, и все записи кэша со старой версией становятся
+    недействительными; изменение недельного расписания сбрасывает версии
+    всех дат сразу. Результат, посчитанный до изменения, не попадет в кэш,
+    если версия за время расчета успела смениться. Счетчики прошедших дат
+    выбрасываются, когда их становится больше max_entries, поэтому
+    долгоживущий процесс не копит их для каждого когда-либо измененного дня.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def version(self, day: date_type) -> tuple:
+        """Текущая версия даты; ее нужно взять до чтения из базы данных"""
+        return (self._epoch, self._versions.get(day, 0))
+
+    def get(self, day: date_type, length: int, resources: tuple = None):
+        """Свободные начала записи из кэша или None"""
+        key = (day, length, resources)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self.version(day):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, day: date_type, length: int, starts, version: tuple, resources: tuple = None):
+        """Сохранение результата, посчитанного при версии version"""
+        key = (day, length, resources)
+        with self._lock:
+            if version != self.version(day):
+                return
+            self._entries[key] = (version, tuple(starts))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *days):
+        """Сброс кэша для дат, на которые изменилось расписание"""
+        with self._lock:
+            for day in days:
+                if isinstance(day, datetime):
+                    day = day.date()
+                self._versions[day] = self._versions.get(day, 0) + 1
+            if len(self._versions) > self.max_entries:
+                self._prune_past()
+
+    def _prune_past(self):
+        # Прошедшие даты не запрашиваются: счетчик выбрасывается вместе с
+        # записями даты, чтобы старая запись не ожила при версии 0
+        today = date_type.today()
+        for day in [day for day in self._versions if day < today]:
+            del self._versions[day]
+        for key in [key for key in self._entries if key[0] < today]:
+            del self._entries[key]
+
+    def invalidate_all(self):
+        """Сброс кэша для всех дат (изменилось недельное расписание)"""
+        with self._lock:
+            # Новая эпоха делает недействительными все версии: счетчики дат не нужны
+            self._epoch += 1
+            self._entries.clear()
+            self._versions.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+        }
+
+
+availability_cache = TenantLocal(lambda: AvailabilityCache(AVAILABILITY_CACHE_SIZE))
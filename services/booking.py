@@ -1,90 +1,254 @@
 from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models.database import Appointment, Procedure, Client, get_db, InactiveSlot
-from config import WORK_START, WORK_END, SLOT_DURATION, ADMIN_IDS
-from aiogram import Bot
+from models.database import (
+    Appointment, Procedure, Client, get_db, InactiveSlot, SessionLocal, SlotClaim,
+    INSERT_CHUNK, insert_ignore
+)
+from services.repository import get_client_by_telegram_id
+from services.catalog import procedure_catalog
+from services.resources import resource_catalog, SHARED_CALENDAR, RESOURCE_KINDS
+from services import outbox
+from services.schedule import load_rules
+from services.tenants import admin_ids
+from config import SLOT_DURATION
+from services.availability import (
+    DayAvailability, build_day, claim_units, duration_to_minutes,
+    minutes_to_time, time_to_minutes, availability_cache
+)
 
-def get_available_slots(date=None):
-    """Получение доступных слотов с учетом длительности процедур"""
-    db = next(get_db())
-    today = datetime.now().date()
+HORIZON_DAYS = 14
+
+def get_available_slots(date=None, duration: float = None, db: Session = None, procedure_id: int = None):
+    """
+    Получение доступных слотов с учетом длительности процедур
+
+    Время свободно, если оно свободно хотя бы у одного ресурса, допущенного
+    к процедуре procedure_id (без нее — у любого активного ресурса).
+    """
+    if db is None:
+        db = next(get_db())
     
     if date is None:
-        # Получаем даты на ближайшие 14 дней
-        dates = []
-        for i in range(14):
-            current_date = today + timedelta(days=i)
-            # Проверяем, является ли дата выходным днем
-            inactive_slot = db.query(InactiveSlot).filter(
-                InactiveSlot.date == current_date,
-                InactiveSlot.is_weekend == True
-            ).first()
-            if not inactive_slot:
-                dates.append(current_date)
-        return dates
-    
-    # Получаем все записи на выбранную дату
-    appointments = db.query(Appointment).filter(
-        Appointment.date >= date,
-        Appointment.date < date + timedelta(days=1),
+        # Даты на ближайшие дни, в которых еще есть свободное время
+        return [day for day, _ in get_available_dates(duration, db=db, procedure_id=procedure_id)]
+    
+    if isinstance(date, datetime):
+        date = date.date()
+    
+    length = duration_to_minutes(duration) if duration else SLOT_DURATION
+    resources = resource_catalog.ensure(db).eligible(procedure_id)
+    starts = availability_cache.get(date, length, resources)
+    if starts is None:
+        version = availability_cache.version(date)
+        starts = get_day_availability(db, date).free_starts(length, resource_ids=resources)
+        availability_cache.put(date, length, starts, version, resources)
+    return [minutes_to_time(start) for start in starts]
+
+def get_available_dates(duration: float = None, days: int = HORIZON_DAYS, db: Session = None,
+                        procedure_id: int = None) -> list:
+    """
+    Получение дат, на которые еще можно записаться на процедуру
+
+    Возвращает пары (дата, количество свободных начал записи), полностью
+    занятые дни не попадают в список.
+    """
+    if db is None:
+        db = next(get_db())
+    
+    length = duration_to_minutes(duration) if duration else SLOT_DURATION
+    resources = resource_catalog.ensure(db).eligible(procedure_id)
+    today = datetime.now().date()
+    horizon = [today + timedelta(days=i) for i in range(days)]
+    
+    free_starts = {}
+    for date in horizon:
+        starts = availability_cache.get(date, length, resources)
+        if starts is not None:
+            free_starts[date] = starts
+    
+    missing = [date for date in horizon if date not in free_starts]
+    if missing:
+        # Дочитываем из базы только непокрытый кэшем отрезок
+        versions = {date: availability_cache.version(date) for date in missing}
+        span = (missing[-1] - missing[0]).days + 1
+        for day in get_days_availability(db, missing[0], span):
+            if day.day in free_starts:
+                continue
+            starts = day.free_starts(length, resource_ids=resources)
+            availability_cache.put(day.day, length, starts, versions[day.day], resources)
+            free_starts[day.day] = starts
+    
+    return [(date, len(free_starts[date])) for date in horizon if free_starts[date]]
+
+def get_day_availability(db: Session, date) -> DayAvailability:
+    """Построение битовой карты занятости дня по расписанию, записям и неактивным слотам"""
+    return get_days_availability(db, date, 1)[0]
+
+def get_days_availability(db: Session, start_date, days: int) -> list:
+    """
+    Построение карт занятости для нескольких дней подряд
+
+    Записи, неактивные слоты и правила расписания за весь период
+    выбираются запросами по диапазону дат, без загрузки ORM-объектов.
+    """
+    end_date = start_date + timedelta(days=days)
+    
+    appointments_by_day = {}
+    appointments = db.query(Appointment.date, Procedure.duration, Appointment.resource_id).join(
+        Procedure, Appointment.procedure_id == Procedure.id
+    ).filter(
+        Appointment.date >= start_date,
+        Appointment.date < end_date,
         Appointment.status == 'scheduled'
     ).all()
+    for start, duration, resource_id in appointments:
+        appointments_by_day.setdefault(start.date(), []).append((start, duration, resource_id))
     
-    # Базовые временные слоты
-    base_slots = [
-        "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "18:00", "19:00", "20:00"
-    ]
-    
-    # Получаем неактивные слоты на эту дату
-    inactive_slots = db.query(InactiveSlot).filter(
-        InactiveSlot.date == date
+    inactive_by_day = {}
+    inactive_slots = db.query(InactiveSlot.date, InactiveSlot.time).filter(
+        InactiveSlot.date >= start_date,
+        InactiveSlot.date < end_date
     ).all()
-    inactive_times = [slot.time for slot in inactive_slots]
+    for date, time in inactive_slots:
+        inactive_by_day.setdefault(date, []).append(time)
     
-    # Создаем список занятых временных слотов
-    occupied_slots = []
-    for appointment in appointments:
-        start_time = appointment.date.time()
-        duration = appointment.procedure.duration
-        end_time = (datetime.combine(date, start_time) + timedelta(hours=duration)).time()
-        
-        # Добавляем все слоты, которые перекрываются с этой записью
-        current_time = start_time
-        while current_time < end_time:
-            occupied_slots.append(current_time.strftime("%H:%M"))
-            current_time = (datetime.combine(date, current_time) + timedelta(hours=1)).time()
-    
-    # Фильтруем доступные слоты, исключая занятые и неактивные
-    available_slots = []
-    for slot in base_slots:
-        if slot not in occupied_slots and slot not in inactive_times:
-            available_slots.append(slot)
-    
-    return available_slots
-
-def create_appointment(db: Session, client_id: int, procedure_id: int, date: datetime) -> Appointment:
-    """Создание новой записи"""
-    appointment = Appointment(
-        client_id=client_id,
-        procedure_id=procedure_id,
-        date=date,
-        status='scheduled'
-    )
-    db.add(appointment)
+    rules = load_rules(db, start_date, end_date)
+    result = []
+    for i in range(days):
+        date = start_date + timedelta(days=i)
+        result.append(build_day(
+            date,
+            appointments_by_day.get(date, ()),
+            inactive_by_day.get(date, ()),
+            SLOT_DURATION,
+            rules.grid(date)
+        ))
+    return result
+
+def create_appointment(db: Session, client_id: int, procedure_id: int, date: datetime,
+                       resource_id: int = None) -> Appointment:
+    """
+    Создание новой записи
+
+    Вместе с записью в той же транзакции занимаются все отрезки времени
+    процедуры в таблице slot_claims календаря ее ресурса. Без явного
+    resource_id запись достается наименее загруженному в этот день
+    свободному ресурсу из допущенных к процедуре; если отрезок у ресурса уже
+    занят другой записью, уникальный индекс не даст сохранить ее, и
+    пробуется следующий ресурс. Если время занято у всех, будет выброшено
+    ValueError. Уведомления администраторам ставятся в очередь outbox той
+    же транзакцией.
+    """
+    length = procedure_length(db, procedure_id)
+    candidates = [resource_id] if resource_id is not None else pick_resources(db, procedure_id, date, length)
+    for candidate in candidates:
+        appointment = Appointment(
+            client_id=client_id,
+            procedure_id=procedure_id,
+            resource_id=candidate or None,
+            date=date,
+            status='scheduled'
+        )
+        try:
+            # Откат точки сохранения не затрагивает остальные объекты сессии
+            with db.begin_nested():
+                db.add(appointment)
+                db.flush()
+                claim_slots(db, appointment, length)
+        except IntegrityError:
+            continue
+        break
+    else:
+        raise ValueError("выбранное время уже занято")
+    # Уведомления уйдут только если запись сохранится
+    enqueue_admin_notices(db, appointment)
     db.commit()
+    availability_cache.invalidate(date)
     return appointment
 
-def get_procedures(db: Session = None):
-    """Получение списка всех процедур"""
-    if db is None:
-        db = next(get_db())
-    return db.query(Procedure).all()
+def pick_resources(db: Session, procedure_id: int, date: datetime, length: int) -> list:
+    """
+    Ресурсы, свободные в момент date для процедуры длиной length минут, от наименее загруженного за день
+
+    Пока ресурсы не заведены, запись идет в общий календарь без проверки.
+    """
+    eligible = resource_catalog.ensure(db).eligible(procedure_id)
+    if eligible == (SHARED_CALENDAR,):
+        return [SHARED_CALENDAR]
+    day = get_day_availability(db, date.date())
+    free = day.free_resources(time_to_minutes(date), length, eligible)
+    return sorted(free, key=lambda resource: (day.load(resource), resource))
+
+def procedure_length(db: Session, procedure_id: int) -> int:
+    """
+    Длина процедуры в минутах, прочитанная из базы в текущей транзакции
+
+    Число занимаемых отрезков slot_claims не берется из справочника в
+    памяти: устаревшая длительность оставила бы часть времени записи
+    незанятой. Для неизвестной процедуры выбрасывается ValueError.
+    """
+    row = db.query(Procedure.duration).filter(Procedure.id == procedure_id).first()
+    if row is None:
+        raise ValueError("процедура не найдена")
+    return duration_to_minutes(row.duration) if row.duration else SLOT_DURATION
+
+def claim_slots(db: Session, appointment: Appointment, length: int = None):
+    """Занятие отрезков времени записи в таблице slot_claims (без коммита)"""
+    if length is None:
+        length = procedure_length(db, appointment.procedure_id)
+    units = claim_units(time_to_minutes(appointment.date), length)
+    resource_id = appointment.resource_id or SHARED_CALENDAR
+    db.execute(insert(SlotClaim), [
+        {'resource_id': resource_id, 'date': appointment.date.date(), 'unit': unit,
+         'appointment_id': appointment.id}
+        for unit in units
+    ])
+
+def release_slots(db: Session, appointment_id: int):
+    """Освобождение отрезков времени записи (без коммита)"""
+    db.query(SlotClaim).filter(
+        SlotClaim.appointment_id == appointment_id
+    ).delete(synchronize_session=False)
+
+def get_or_create_client(db: Session, telegram_id: int, username: str, name: str) -> Client:
+    """Получение клиента по Telegram ID или его регистрация"""
+    client = get_client_by_telegram_id(db, telegram_id)
+    if not client:
+        client = Client(telegram_id=telegram_id, username=username, name=name)
+        db.add(client)
+        db.commit()
+    return client
+
+REMINDER_FLAGS = {
+    'day_before': Appointment.day_before_reminder_sent,
+    'day_of': Appointment.day_of_reminder_sent,
+}
+
+def mark_reminders_sent(db: Session, appointment_ids: list, kind: str):
+    """Отметка об отправленных напоминаниях вида kind ('day_before' или 'day_of')"""
+    if appointment_ids:
+        db.query(Appointment).filter(
+            Appointment.id.in_(appointment_ids)
+        ).update({REMINDER_FLAGS[kind]: True}, synchronize_session=False)
+        db.commit()
+
+def get_procedures(db: Session = None) -> list:
+    """Получение списка всех процедур из справочника в памяти"""
+    if not procedure_catalog.is_fresh():
+        if db is None:
+            db = next(get_db())
+        procedure_catalog.load(db)
+    return list(procedure_catalog.all())
 
 def get_procedure_by_id(procedure_id: int, db: Session = None):
-    """Получение процедуры по ID"""
-    if db is None:
-        db = next(get_db())
-    return db.query(Procedure).filter(Procedure.id == procedure_id).first()
+    """Получение процедуры по ID из справочника в памяти; неизвестный id — None без запроса к базе"""
+    if not procedure_catalog.is_fresh():
+        if db is None:
+            db = next(get_db())
+        procedure_catalog.load(db)
+    return procedure_catalog.get(procedure_id)
 
 def get_procedure_duration(procedure_id: int, db: Session = None) -> float:
     """Получение длительности процедуры в часах"""
@@ -104,7 +268,9 @@ def cancel_appointment(db: Session, appointment_id: int) -> bool:
         return False
     
     appointment.status = 'cancelled'
+    release_slots(db, appointment.id)
     db.commit()
+    availability_cache.invalidate(appointment.date)
     return True
 
 def complete_appointment(db: Session, appointment_id: int) -> bool:
@@ -120,7 +286,9 @@ def complete_appointment(db: Session, appointment_id: int) -> bool:
         return False
     
     appointment.status = 'completed'
+    release_slots(db, appointment.id)
     db.commit()
+    availability_cache.invalidate(appointment.date)
     return True
 
 def delete_appointment(db: Session, appointment_id: int) -> bool:
@@ -131,62 +299,149 @@ def delete_appointment(db: Session, appointment_id: int) -> bool:
     if not appointment:
         return False
     
+    appointment_date = appointment.date
+    release_slots(db, appointment.id)
     db.delete(appointment)
     db.commit()
+    availability_cache.invalidate(appointment_date)
     return True
 
-async def notify_admins_about_new_appointment(bot: Bot, appointment: Appointment):
+def format_new_appointment_notice(appointment: Appointment) -> str:
     """
-    Отправка уведомления администраторам о новой записи
+    Текст уведомления администраторам о новой записи
     """
-    message = (
+    return (
         f"🆕 Новая запись!\n\n"
         f"ID: {appointment.id}\n"
         f"Процедура: {appointment.procedure.name}\n"
         f"Длительность: {appointment.procedure.duration}ч\n"
+        f"{format_resource_line(appointment)}"
         f"Дата: {appointment.date.strftime('%d.%m.%Y')}\n"
         f"Время: {appointment.date.strftime('%H:%M')}\n"
         f"Клиент: {appointment.client.name}\n"
         f"Username: @{appointment.client.username}\n"
         f"Телефон: {appointment.client.phone or 'Не указан'}"
     )
-    
-    for admin_id in ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, message)
-        except Exception as e:
-            print(f"Ошибка при отправке уведомления администратору {admin_id}: {str(e)}")
+
+def format_resource_line(appointment: Appointment) -> str:
+    """Строка с ресурсом записи или пустая строка для общего календаря"""
+    resource = resource_catalog.get(appointment.resource_id)
+    if resource is None:
+        return ""
+    return f"{RESOURCE_KINDS[resource.kind].capitalize()}: {resource.name}\n"
+
+def enqueue_admin_notices(db: Session, appointment: Appointment):
+    """
+    Постановка уведомлений администраторам о новой записи в очередь (без коммита)
+    """
+    text = format_new_appointment_notice(appointment)
+    for admin_id in admin_ids():
+        outbox.enqueue(
+            db, admin_id, text, outbox.PRIORITY_ADMIN,
+            dedup_key=f"new_appointment:{appointment.id}:{admin_id}"
+        )
+
+def enqueue_reminder(db: Session, appointment: Appointment, kind: str, text: str) -> bool:
+    """
+    Постановка напоминания вида kind в очередь вместе с отметкой о нем
+
+    Отметка и сообщение сохраняются одной транзакцией: напоминание не
+    потеряется при падении и не будет поставлено повторно.
+    """
+    queued = outbox.enqueue(
+        db, appointment.client.telegram_id, text, outbox.PRIORITY_REMINDER,
+        dedup_key=f"reminder:{appointment.id}:{kind}"
+    )
+    db.query(Appointment).filter(
+        Appointment.id == appointment.id
+    ).update({REMINDER_FLAGS[kind]: True}, synchronize_session=False)
+    db.commit()
+    return queued
+
+def period_dates(start_date, end_date) -> list:
+    """Все даты с start_date по end_date включительно"""
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+def expand_times(start: str, end: str, step: int = SLOT_DURATION) -> list:
+    """
+    Начала слотов "HH:MM" с шагом step, из которых состоит интервал [start, end)
+
+    Интервал должен складываться из целых слотов: иначе закрылось бы больше
+    времени, чем указано. В этом случае выбрасывается ValueError.
+    """
+    start_minutes, end_minutes = time_to_minutes(start), time_to_minutes(end)
+    if (end_minutes - start_minutes) % step:
+        raise ValueError(f"интервал {start}-{end} не делится на слоты по {step} мин")
+    return [minutes_to_time(minutes) for minutes in range(start_minutes, end_minutes, step)]
+
+def block_period(db: Session, start_date, end_date, times: list = None, is_weekend: bool = False) -> int:
+    """
+    Закрытие записи на даты с start_date по end_date одной транзакцией
+
+    times — начала закрываемых слотов "HH:MM"; без них закрываются дни
+    целиком, и отдельные слоты этих дней становятся не нужны. Уже закрытые
+    слоты пропускаются. Возвращает число добавленных строк.
+    """
+    dates = period_dates(start_date, end_date)
+    if times:
+        added = insert_ignore(db, InactiveSlot, [
+            {'date': date, 'time': time, 'is_weekend': is_weekend}
+            for date in dates for time in times
+        ], ['tenant_id', 'date', 'time'])
+    else:
+        # Строки "весь день" не уникальны (time = NULL), поэтому дни пересоздаются целиком
+        db.query(InactiveSlot).filter(
+            InactiveSlot.date >= start_date,
+            InactiveSlot.date <= end_date
+        ).delete(synchronize_session=False)
+        rows = [{'date': date, 'time': None, 'is_weekend': is_weekend} for date in dates]
+        # Пачками, как в insert_ignore: число параметров одного запроса ограничено драйвером
+        for i in range(0, len(rows), INSERT_CHUNK):
+            db.execute(insert(InactiveSlot).values(rows[i:i + INSERT_CHUNK]))
+        added = len(dates)
+    db.commit()
+    availability_cache.invalidate(*dates)
+    return added
+
+def unblock_period(db: Session, start_date, end_date, times: list = None) -> int:
+    """
+    Открытие записи на даты с start_date по end_date одним запросом
+
+    times — начала открываемых слотов; без них снимаются все закрытия
+    этих дней, включая закрытие дня целиком. Часы внутри дня, закрытого
+    целиком, открыть нельзя: тогда выбрасывается ValueError. Возвращает
+    число удаленных строк.
+    """
+    query = db.query(InactiveSlot).filter(
+        InactiveSlot.date >= start_date,
+        InactiveSlot.date <= end_date
+    )
+    if times:
+        closed = [
+            date for date, in query.with_entities(InactiveSlot.date).filter(
+                InactiveSlot.time.is_(None)
+            ).order_by(InactiveSlot.date)
+        ]
+        if closed:
+            raise ValueError(
+                f"{', '.join(date.strftime('%d.%m.%Y') for date in closed)} закрыто целиком: "
+                f"откройте эти дни полностью и закройте лишние часы заново"
+            )
+        query = query.filter(InactiveSlot.time.in_(times))
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        availability_cache.invalidate(*period_dates(start_date, end_date))
+    return deleted
 
 def set_inactive_slot(db: Session, date: datetime.date, time: str, is_weekend: bool = False) -> bool:
     """
     Установка временного слота как неактивного
     """
     try:
-        # Проверяем, существует ли уже такой слот
-        existing_slot = db.query(InactiveSlot).filter(
-            InactiveSlot.date == date,
-            InactiveSlot.time == time
-        ).first()
-        
-        if existing_slot:
-            return True
-            
-        inactive_slot = InactiveSlot(date=date, time=time, is_weekend=is_weekend)
-        
-        db.add(inactive_slot)
-        db.commit()
-        
-        # Проверяем, что слот действительно добавлен
-        added_slot = db.query(InactiveSlot).filter(
-            InactiveSlot.date == date,
-            InactiveSlot.time == time
-        ).first()
-        
-        if not added_slot:
-            return False
-            
+        block_period(db, date, date, [time], is_weekend)
         return True
-    except Exception as e:
+    except Exception:
         db.rollback()
         return False
 
@@ -195,15 +450,7 @@ def remove_inactive_slot(db: Session, date: datetime.date, time: str) -> bool:
     Удаление временного слота из неактивных
     """
     try:
-        inactive_slot = db.query(InactiveSlot).filter(
-            InactiveSlot.date == date,
-            InactiveSlot.time == time
-        ).first()
-        if inactive_slot:
-            db.delete(inactive_slot)
-            db.commit()
-            return True
-        return False
+        return unblock_period(db, date, date, [time]) > 0
     except Exception:
         db.rollback()
         return False
@@ -217,34 +464,42 @@ def get_inactive_slots(db: Session, date: datetime.date = None) -> list:
         query = query.filter(InactiveSlot.date == date)
     return query.order_by(InactiveSlot.date, InactiveSlot.time).all()
 
-async def init_inactive_dates(db: Session = None):
+def warm_availability_cache(days: int = HORIZON_DAYS, db: Session = None):
     """
-    Инициализация неактивных слотов на выходные дни
+    Прогрев кэша свободного времени на ближайшие дни для всех длительностей процедур
+    """
+    if db is None:
+        with SessionLocal() as db:
+            return warm_availability_cache(days, db)
+    
+    # Процедуры с одинаковыми длительностью и ресурсами делят записи кэша
+    for procedure in get_procedures(db):
+        get_available_dates(procedure.duration, days, db=db, procedure_id=procedure.id)
+    get_available_dates(None, days, db=db)  # Один базовый слот, как в управлении неактивными слотами
+
+def backfill_slot_claims(db: Session = None) -> int:
+    """
+    Занятие отрезков времени для будущих записей, созданных до появления slot_claims
     """
     if db is None:
         db = next(get_db())
     
     today = datetime.now().date()
+    claimed = db.query(SlotClaim.appointment_id).distinct()
+    appointments = db.query(Appointment).filter(
+        Appointment.date >= today,
+        Appointment.status == 'scheduled',
+        Appointment.id.notin_(claimed)
+    ).order_by(Appointment.date, Appointment.id).all()
     
-    # Базовые временные слоты
-    base_slots = [
-        "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", 
-        "15:00", "16:00", "17:00", "18:00", "19:00", "20:00"
-    ]
-    
-    # Добавляем выходные на ближайшие 30 дней
-    for i in range(30):
-        date = today + timedelta(days=i)
-        if date.weekday() >= 5:  # 5 - суббота, 6 - воскресенье
-            # Добавляем все временные слоты для выходного дня
-            for time in base_slots:
-                # Проверяем, не существует ли уже такой слот
-                existing = db.query(InactiveSlot).filter(
-                    InactiveSlot.date == date,
-                    InactiveSlot.time == time
-                ).first()
-                if not existing:
-                    inactive_slot = InactiveSlot(date=date, time=time, is_weekend=True)
-                    db.add(inactive_slot)
-    
-    db.commit() 
\ No newline at end of file
+    count = 0
+    for appointment in appointments:
+        try:
+            with db.begin_nested():
+                claim_slots(db, appointment)
+            count += 1
+        except IntegrityError:
+            # Пересекающиеся старые записи оставляем как есть
+            pass
+    db.commit()
+    return count
@@ -0,0 +1,100 @@
+"""
+Справочник процедур в памяти процесса.
+
+Каталог процедур меняется крайне редко, а читается на каждом шаге записи.
+Поэтому он загружается из базы данных одним запросом и хранится как набор
+неизменяемых объектов ProcedureInfo с индексами по id и по названию.
+Снимок перечитывается по истечении TTL или после явного сброса (например,
+когда администратор изменил процедуры). Неизвестный id до этого момента
+считается отсутствующим и к базе данных не обращается: устаревшие или
+подделанные данные кнопок не могут заставить перечитывать справочник на
+каждом обновлении.
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from config import PROCEDURE_CATALOG_TTL
+from models.database import Procedure
+from tenancy import TenantLocal
+
+
+class ProcedureInfo(NamedTuple):
+    """Неизменяемое описание процедуры, не привязанное к сессии"""
+    id: int
+    name: str
+    duration: float
+    description: Optional[str] = None
+
+
+class _Snapshot(NamedTuple):
+    items: tuple
+    by_id: dict
+    by_name: dict
+    loaded_at: Optional[float]
+
+
+_EMPTY = _Snapshot((), {}, {}, None)
+
+
+class ProcedureCatalog:
+    """
+    Неизменяемый снимок справочника процедур
+
+    Процедуры, индексы и время загрузки лежат в одном снимке, который
+    заменяется одним присваиванием, поэтому читатели никогда не видят
+    наполовину обновленный каталог и не нуждаются в блокировке.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.loads = 0
+        self._snapshot = _EMPTY
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        """Загружен ли каталог и не истек ли его TTL"""
+        loaded_at = self._snapshot.loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def load(self, db: Session) -> 'ProcedureCatalog':
+        """Перечитывание справочника из базы данных одним запросом"""
+        rows = db.query(
+            Procedure.id, Procedure.name, Procedure.duration, Procedure.description
+        ).order_by(Procedure.id).all()
+        items = tuple(ProcedureInfo(*row) for row in rows)
+        snapshot = _Snapshot(
+            items, {item.id: item for item in items}, {item.name: item for item in items}, time.monotonic()
+        )
+        with self._lock:
+            self._snapshot = snapshot
+            self.loads += 1
+        return self
+
+    def ensure(self, db: Session) -> 'ProcedureCatalog':
+        """Загрузка каталога, если он еще не загружен или устарел"""
+        if not self.is_fresh():
+            self.load(db)
+        return self
+
+    def all(self) -> tuple:
+        return self._snapshot.items
+
+    def get(self, procedure_id: int) -> Optional[ProcedureInfo]:
+        return self._snapshot.by_id.get(procedure_id)
+
+    def by_name(self, name: str) -> Optional[ProcedureInfo]:
+        return self._snapshot.by_name.get(name)
+
+    def invalidate(self):
+        """Сброс каталога: следующее обращение перечитает его из базы данных"""
+        with self._lock:
+            self._snapshot = self._snapshot._replace(loaded_at=None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = _EMPTY
+            self.loads = 0
+
+
+procedure_catalog = TenantLocal(lambda: ProcedureCatalog(PROCEDURE_CATALOG_TTL))
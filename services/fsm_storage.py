@@ -0,0 +1,221 @@
+"""
+Хранилище состояний FSM aiogram в базе данных.
+
+Состояние и данные сценария записи (BookingStates, AdminStates) хранятся
+одной строкой на ключ (бот, чат, пользователь) в таблице fsm_states,
+поэтому несколько процессов бота за webhook видят один и тот же сценарий,
+а перезапуск не теряет незаконченные записи.
+
+Внутри одного обновления (см. batch и FSMBatchMiddleware) строка читается
+из базы один раз, а все set_state/update_data копятся в памяти и
+записываются одним запросом после обработки. Для этого FSM-слой aiogram,
+который читает состояние до обработчиков, переносится внутрь batch
+(middlewares.fsm.move_state_reads); get_state вне batch каждый раз
+читает базу. Сценарии, брошенные на
+FSM_STATE_TTL секунд, удаляет периодическая задача планировщика.
+"""
+import json
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from sqlalchemy.orm import Session
+from models.database import AsyncSessionLocal, FSMState, dialect_insert, session_scope
+from config import FSM_STATE_TTL
+
+# Теги для значений, которых нет в JSON: обработчики кладут в данные даты
+DATETIME_TAG = '$dt'
+DATE_TAG = '$d'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {DATE_TAG: value.isoformat()}
+    raise TypeError(f"Значение типа {type(value).__name__} нельзя сохранить в состоянии FSM")
+
+
+def _decode_object(obj: dict):
+    if len(obj) == 1:
+        if DATETIME_TAG in obj:
+            return datetime.fromisoformat(obj[DATETIME_TAG])
+        if DATE_TAG in obj:
+            return date.fromisoformat(obj[DATE_TAG])
+    return obj
+
+
+def dump_data(data: Dict[str, Any]) -> Optional[str]:
+    """Компактный JSON данных сценария; пустые данные не хранятся"""
+    if not data:
+        return None
+    return json.dumps(data, default=_encode_value, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode_object) if raw else {}
+
+
+def storage_key(key: StorageKey) -> str:
+    thread_id = '' if key.thread_id is None else key.thread_id
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{thread_id}:{key.destiny}"
+
+
+def load_state(db: Session, key: str) -> tuple:
+    """Состояние и данные (JSON) по ключу; (None, None), если строки нет"""
+    row = db.query(FSMState.state, FSMState.data).filter(FSMState.key == key).first()
+    db.commit()
+    return tuple(row) if row else (None, None)
+
+
+def save_states(db: Session, rows: dict):
+    """
+    Запись состояний {ключ: (состояние, данные JSON)} одной транзакцией
+
+    Строка без состояния и данных удаляется: завершенный сценарий не
+    занимает место в таблице.
+    """
+    now = datetime.utcnow()
+    empty = [key for key, (state, data) in rows.items() if state is None and data is None]
+    if empty:
+        db.query(FSMState).filter(FSMState.key.in_(empty)).delete(synchronize_session=False)
+    values = [
+        {'key': key, 'state': state, 'data': data, 'updated_at': now}
+        for key, (state, data) in rows.items() if key not in empty
+    ]
+    if values:
+        _upsert(db, values)
+    db.commit()
+
+
+def _upsert(db: Session, values: list):
+    insert = dialect_insert(db)
+    if insert is None:
+        for row in values:
+            db.merge(FSMState(**row))
+        return
+    statement = insert(FSMState).values(values)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[FSMState.key],
+        set_={
+            'state': statement.excluded.state,
+            'data': statement.excluded.data,
+            'updated_at': statement.excluded.updated_at,
+        }
+    ))
+
+
+def delete_expired_states(db: Session, ttl: float = FSM_STATE_TTL) -> int:
+    """Удаление сценариев, которые не менялись дольше ttl секунд"""
+    deleted = db.query(FSMState).filter(
+        FSMState.updated_at < datetime.utcnow() - timedelta(seconds=ttl)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+async def cleanup_expired_states():
+    """Задача планировщика: удаление брошенных сценариев"""
+    async with session_scope() as db:
+        return await db.run_sync(delete_expired_states)
+
+
+class _Entry:
+    """Состояние ключа внутри обновления"""
+    __slots__ = ('state', 'data', 'dirty')
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]):
+        self.state = state
+        self.data = data
+        self.dirty = False
+
+
+class SQLStorage(BaseStorage):
+    """
+    Хранилище FSM в таблице fsm_states
+
+    reads и writes считают обращения к базе: по ним видно, что обновление
+    с несколькими update_data стоит одного чтения и одной записи.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.reads = 0
+        self.writes = 0
+        self._batch: ContextVar[Optional[dict]] = ContextVar(f'fsm_batch_{id(self)}', default=None)
+
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Накопление изменений до конца блока и запись их одним запросом
+
+        Вложенный batch работает внутри внешнего.
+        """
+        if self._batch.get() is not None:
+            yield
+            return
+        token = self._batch.set({})
+        try:
+            yield
+        finally:
+            try:
+                await self.flush()
+            finally:
+                self._batch.reset(token)
+
+    async def flush(self):
+        """Запись измененных в текущем batch состояний"""
+        entries = self._batch.get()
+        if not entries:
+            return
+        rows = {
+            key: (entry.state, dump_data(entry.data))
+            for key, entry in entries.items() if entry.dirty
+        }
+        if not rows:
+            return
+        async with self.session_factory() as db:
+            await db.run_sync(save_states, rows)
+        self.writes += 1
+        for key in rows:
+            entries[key].dirty = False
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        entries = self._batch.get()
+        db_key = storage_key(key)
+        if entries is not None and db_key in entries:
+            return entries[db_key]
+        async with self.session_factory() as db:
+            state, data = await db.run_sync(load_state, db_key)
+        self.reads += 1
+        entry = _Entry(state, load_data(data))
+        if entries is not None:
+            entries[db_key] = entry
+        return entry
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        async with self.batch():
+            entry = await self._entry(key)
+            state = state.state if isinstance(state, State) else state
+            if state != entry.state:
+                entry.state = state
+                entry.dirty = True
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        async with self.batch():
+            entry = await self._entry(key)
+            if data != entry.data:
+                entry.data = data.copy()
+                entry.dirty = True
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._entry(key)).data.copy()
+
+    async def close(self) -> None:
+        # Подключение к базе общее с остальным ботом и закрывается в main
+        pass
@@ -0,0 +1,186 @@
+"""
+Очередь исходящих сообщений Telegram (transactional outbox).
+
+Сообщение записывается в таблицу outbox в той же транзакции, что и
+изменение, о котором оно сообщает, поэтому падение бота не теряет
+уведомления, а откат транзакции не отправляет лишних. Фоновые воркеры
+(scheduler.outbox) забирают сообщения по приоритету, отправляют их и
+отмечают отправленными.
+
+Доставка «как минимум один раз»: ключ dedup_key не дает поставить одно и
+то же сообщение дважды, а отметить сообщение отправленным или вернуть его
+в очередь может только владелец захвата: mark_sent и mark_failed сверяют
+locked_until, выданный при захвате. Воркер, чей захват истек и был
+передан другому, отчитаться уже не сможет.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.database import OutboxMessage
+
+# Приоритеты доставки: меньше — раньше
+# Ответы в диалоге пока отправляются напрямую через message.answer;
+# уровень PRIORITY_REPLY зарезервирован для ответов клиентам через очередь
+PRIORITY_REPLY = 0      # ответы и уведомления клиентам
+PRIORITY_ADMIN = 1      # уведомления администраторам
+PRIORITY_REMINDER = 2   # напоминания о записях
+
+# Событие, которым воркеры рассылки будятся после постановки сообщений
+_wakeup = None
+
+
+def set_wakeup(event):
+    global _wakeup
+    _wakeup = event
+
+
+def wake_workers():
+    """Разбудить воркеры рассылки, не дожидаясь очередного опроса таблицы"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def enqueue(db: Session, chat_id: int, text: str, priority: int = PRIORITY_REPLY,
+            dedup_key: str = None, available_at: datetime = None) -> bool:
+    """
+    Постановка сообщения в очередь в текущей транзакции (без коммита)
+
+    Возвращает False, если сообщение с таким dedup_key уже стоит в очереди
+    или было отправлено.
+    """
+    now = datetime.utcnow()
+    try:
+        # Конфликт ключа откатывает только точку сохранения, а не всю транзакцию
+        with db.begin_nested():
+            db.execute(insert(OutboxMessage).values(
+                chat_id=chat_id,
+                text=text,
+                priority=priority,
+                dedup_key=dedup_key,
+                status='pending',
+                attempts=0,
+                available_at=available_at or now,
+                created_at=now,
+            ))
+    except IntegrityError:
+        return False
+    return True
+
+
+def claim(db: Session, limit: int, lease: float) -> list:
+    """
+    Захват до limit готовых к отправке сообщений в порядке приоритета
+
+    Захваченные сообщения переводятся в статус 'sending' до locked_until;
+    если воркер не отчитается до этого срока, release_expired вернет их
+    в очередь. Возвращает объекты OutboxMessage, отвязанные от сессии.
+    """
+    now = datetime.utcnow()
+    ids = [message_id for message_id, in db.query(OutboxMessage.id).filter(
+        OutboxMessage.status == 'pending',
+        OutboxMessage.available_at <= now
+    ).order_by(
+        OutboxMessage.priority, OutboxMessage.id
+    ).limit(limit).with_for_update(skip_locked=True)]
+    if not ids:
+        db.commit()
+        return []
+
+    locked_until = now + timedelta(seconds=lease)
+    db.query(OutboxMessage).filter(
+        OutboxMessage.id.in_(ids),
+        OutboxMessage.status == 'pending'
+    ).update({
+        OutboxMessage.status: 'sending',
+        OutboxMessage.locked_until: locked_until,
+        OutboxMessage.attempts: OutboxMessage.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    
+    # Часть сообщений мог успеть забрать другой процесс — берем только свои
+    messages = db.query(OutboxMessage).filter(
+        OutboxMessage.id.in_(ids),
+        OutboxMessage.status == 'sending',
+        OutboxMessage.locked_until == locked_until
+    ).order_by(OutboxMessage.priority, OutboxMessage.id).populate_existing().all()
+    for message in messages:
+        db.expunge(message)
+    db.commit()
+    return messages
+
+
+def mark_sent(db: Session, message_id: int, locked_until: datetime) -> bool:
+    """Отметка об отправке; False, если захват locked_until уже истек или передан другому"""
+    updated = db.query(OutboxMessage).filter(
+        OutboxMessage.id == message_id,
+        OutboxMessage.status == 'sending',
+        OutboxMessage.locked_until == locked_until
+    ).update({
+        OutboxMessage.status: 'sent',
+        OutboxMessage.sent_at: datetime.utcnow(),
+        OutboxMessage.locked_until: None,
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def mark_failed(db: Session, message_id: int, locked_until: datetime, error: str,
+                max_attempts: int, backoff: float, permanent: bool = False,
+                retry_after: float = 0.0) -> str:
+    """
+    Возврат неотправленного сообщения в очередь с паузой backoff * 2^(попытка - 1),
+    но не короче retry_after секунд, которых потребовал Telegram
+
+    После max_attempts попыток или сразу при permanent (повтор не поможет:
+    бот заблокирован, чат удален) сообщение получает статус 'failed'.
+    Возвращает новый статус сообщения; если захват locked_until уже истек
+    или передан другому, сообщение не меняется.
+    """
+    message = db.get(OutboxMessage, message_id, populate_existing=True)
+    if message is None or message.status != 'sending' or message.locked_until != locked_until:
+        db.commit()
+        return message.status if message else 'missing'
+
+    message.last_error = error[:500] if error else None
+    message.locked_until = None
+    if permanent or message.attempts >= max_attempts:
+        message.status = 'failed'
+    else:
+        message.status = 'pending'
+        message.available_at = datetime.utcnow() + timedelta(
+            seconds=max(backoff * 2 ** (message.attempts - 1), retry_after)
+        )
+    status = message.status
+    db.commit()
+    return status
+
+
+def release_expired(db: Session) -> int:
+    """Возврат в очередь сообщений, захват которых истек (воркер упал или завис)"""
+    released = db.query(OutboxMessage).filter(
+        OutboxMessage.status == 'sending',
+        OutboxMessage.locked_until < datetime.utcnow()
+    ).update({
+        OutboxMessage.status: 'pending',
+        OutboxMessage.locked_until: None,
+    }, synchronize_session=False)
+    db.commit()
+    return released
+
+
+def backlog(db: Session) -> dict:
+    """Размер очереди и возраст самого старого неотправленного сообщения"""
+    pending, oldest = db.query(
+        func.count(OutboxMessage.id), func.min(OutboxMessage.created_at)
+    ).filter(
+        OutboxMessage.status.in_(('pending', 'sending'))
+    ).one()
+    failed = db.query(func.count(OutboxMessage.id)).filter(
+        OutboxMessage.status == 'failed'
+    ).scalar()
+    return {
+        'pending': pending,
+        'failed': failed,
+        'oldest_age_s': (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+    }
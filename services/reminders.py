@@ -0,0 +1,131 @@
+"""
+Планирование напоминаний о записях.
+
+Для каждой записи и каждого вида напоминания заводится отдельная задача
+APScheduler с DateTrigger на точное время в часовом поясе TIMEZONE.
+Задачи лежат в SQL-хранилище планировщика и переживают перезапуск бота,
+а id задачи выводится из id записи, поэтому постановка, перенос и
+удаление напоминаний стоят O(1) и не требуют просмотра таблицы записей.
+Задача хранит id студии записи и выполняется в ее рамках.
+"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.date import DateTrigger
+from tenancy import current_tenant
+from config import TIMEZONE, REMINDER_BEFORE_DAY, REMINDER_DAY_OF
+
+# Вид напоминания: (за сколько дней до процедуры, время отправки "HH:MM")
+REMINDER_KINDS = {
+    'day_before': (1, REMINDER_BEFORE_DAY),
+    'day_of': (0, REMINDER_DAY_OF),
+}
+
+# Задача ссылается на функцию по имени: так ее можно сохранить в базе данных
+REMINDER_JOB_FUNC = 'scheduler.notifier:send_appointment_reminder'
+
+# Планировщик, в который ставятся задачи; задается в setup_scheduler
+reminder_scheduler = None
+
+
+def set_reminder_scheduler(scheduler):
+    global reminder_scheduler
+    reminder_scheduler = scheduler
+
+
+def reminder_job_id(appointment_id: int, kind: str) -> str:
+    return f"reminder:{appointment_id}:{kind}"
+
+
+def reminder_times(appointment_date: datetime, now: datetime = None) -> dict:
+    """
+    Время отправки каждого вида напоминания о записи
+
+    Время записи хранится без часового пояса и считается временем TIMEZONE.
+    Напоминания, время которых уже прошло или наступает не раньше самой
+    процедуры, пропускаются.
+    """
+    zone = ZoneInfo(TIMEZONE)
+    start = appointment_date.replace(tzinfo=zone)
+    now = now or datetime.now(zone)
+    times = {}
+    for kind, (days_before, at) in REMINDER_KINDS.items():
+        run_time = datetime.combine(
+            start.date() - timedelta(days=days_before),
+            datetime.strptime(at, "%H:%M").time(),
+            tzinfo=zone
+        )
+        if now < run_time < start:
+            times[kind] = run_time
+    return times
+
+
+def schedule_reminders(appointment_id: int, appointment_date: datetime, scheduler=None) -> list:
+    """Постановка (или перенос) задач напоминаний о записи; возвращает id задач"""
+    scheduler = scheduler or reminder_scheduler
+    if scheduler is None:
+        return []
+
+    job_ids = []
+    times = reminder_times(appointment_date)
+    for kind in REMINDER_KINDS:
+        job_id = reminder_job_id(appointment_id, kind)
+        if kind not in times:
+            # При переносе записи напоминание этого вида могло стать ненужным
+            _remove_job(scheduler, job_id)
+            continue
+        scheduler.add_job(
+            REMINDER_JOB_FUNC,
+            DateTrigger(run_date=times[kind]),
+            args=[appointment_id, kind, current_tenant()],
+            id=job_id,
+            replace_existing=True
+        )
+        job_ids.append(job_id)
+    return job_ids
+
+
+def cancel_reminders(appointment_id: int, scheduler=None):
+    """Снятие задач напоминаний об отмененной или удаленной записи"""
+    scheduler = scheduler or reminder_scheduler
+    if scheduler is None:
+        return
+    for kind in REMINDER_KINDS:
+        _remove_job(scheduler, reminder_job_id(appointment_id, kind))
+
+
+def restore_reminders(appointments, scheduler=None) -> int:
+    """
+    Постановка недостающих задач для будущих записей (id, дата)
+
+    Задачи из хранилища планировщика восстанавливаются сами; здесь
+    досоздаются задачи для записей, появившихся без планировщика, например
+    до перехода на точные напоминания. Возвращает число новых задач.
+    """
+    scheduler = scheduler or reminder_scheduler
+    if scheduler is None:
+        return 0
+
+    existing = {job.id for job in scheduler.get_jobs()}
+    added = 0
+    for appointment_id, appointment_date in appointments:
+        for kind, run_time in reminder_times(appointment_date).items():
+            job_id = reminder_job_id(appointment_id, kind)
+            if job_id in existing:
+                continue
+            scheduler.add_job(
+                REMINDER_JOB_FUNC,
+                DateTrigger(run_date=run_time),
+                args=[appointment_id, kind, current_tenant()],
+                id=job_id,
+                replace_existing=True
+            )
+            added += 1
+    return added
+
+
+def _remove_job(scheduler, job_id: str):
+    try:
+        scheduler.remove_job(job_id)
+    except JobLookupError:
+        pass
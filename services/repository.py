@@ -0,0 +1,123 @@
+"""
+Запросы чтения для экранов бота и планировщика.
+
+Списки записей подгружают клиента и процедуру в том же запросе
+(joinedload по связям «многие к одному»), поэтому каждый экран обходится
+фиксированным числом запросов независимо от количества записей.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload
+from models.database import Appointment, Client, InactiveSlot
+
+
+def with_client_and_procedure(query):
+    """Подгрузка клиента и процедуры записи в одном запросе с записями"""
+    return query.options(
+        joinedload(Appointment.client),
+        joinedload(Appointment.procedure)
+    )
+
+def get_client_by_telegram_id(db: Session, telegram_id: int):
+    """Получение клиента по Telegram ID"""
+    return db.query(Client).filter(Client.telegram_id == telegram_id).first()
+
+def get_client_by_username(db: Session, username: str):
+    """Получение клиента по username"""
+    return db.query(Client).filter(Client.username == username).first()
+
+def get_client_by_id(db: Session, client_id: int):
+    """Получение клиента по ID"""
+    return db.query(Client).filter(Client.id == client_id).first()
+
+def get_appointment(db: Session, appointment_id: int, client_id: int = None):
+    """Получение записи по ID вместе с клиентом и процедурой"""
+    query = with_client_and_procedure(db.query(Appointment)).filter(
+        Appointment.id == appointment_id
+    )
+    if client_id is not None:
+        query = query.filter(Appointment.client_id == client_id)
+    return query.first()
+
+def get_client_appointments(db: Session, client_id: int) -> list:
+    """Получение запланированных записей клиента"""
+    return db.query(Appointment).options(
+        joinedload(Appointment.procedure)
+    ).filter(
+        Appointment.client_id == client_id,
+        Appointment.status == 'scheduled'
+    ).order_by(Appointment.date).all()
+
+def get_upcoming_appointments(db: Session) -> list:
+    """Получение запланированных записей начиная с сегодняшнего дня"""
+    today = datetime.now().date()
+    return with_client_and_procedure(db.query(Appointment)).filter(
+        Appointment.date >= today,
+        Appointment.status == 'scheduled'
+    ).order_by(Appointment.date).all()
+
+def get_appointments_page(db: Session, start_date, end_date=None, cursor=None,
+                          direction: str = 'next', limit: int = 10):
+    """
+    Страница запланированных записей с keyset-пагинацией по (date, id)
+
+    cursor — пара (дата записи, id) на границе страницы, direction:
+    'next' — записи после курсора, 'prev' — записи до курсора,
+    'at' — записи начиная с курсора включительно (перерисовка текущей страницы).
+    Конец диапазона end_date включается в выборку.
+    Возвращает (записи по возрастанию даты, есть ли записи до страницы,
+    есть ли записи после страницы).
+    """
+    key = tuple_(Appointment.date, Appointment.id)
+    query = db.query(Appointment).filter(
+        Appointment.date >= start_date,
+        Appointment.status == 'scheduled'
+    )
+    if end_date is not None:
+        query = query.filter(Appointment.date < end_date + timedelta(days=1))
+    
+    page_query = query
+    if cursor is not None:
+        if direction == 'prev':
+            page_query = page_query.filter(key < tuple_(*cursor))
+        elif direction == 'at':
+            page_query = page_query.filter(key >= tuple_(*cursor))
+        else:
+            page_query = page_query.filter(key > tuple_(*cursor))
+    if direction == 'prev':
+        page_query = page_query.order_by(Appointment.date.desc(), Appointment.id.desc())
+    else:
+        page_query = page_query.order_by(Appointment.date, Appointment.id)
+    
+    # Лишняя запись показывает, есть ли продолжение в направлении листания
+    rows = with_client_and_procedure(page_query).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return [], False, False
+    
+    if direction == 'prev':
+        edge = key > tuple_(rows[-1].date, rows[-1].id)
+    else:
+        edge = key < tuple_(rows[0].date, rows[0].id)
+    has_other = db.query(query.filter(edge).exists()).scalar()
+    
+    if direction == 'prev':
+        return rows, has_more, has_other
+    return rows, has_other, has_more
+
+def get_upcoming_appointment_times(db: Session) -> list:
+    """Пары (id, дата) запланированных записей начиная с текущего момента"""
+    return db.query(Appointment.id, Appointment.date).filter(
+        Appointment.date >= datetime.now(),
+        Appointment.status == 'scheduled'
+    ).all()
+
+def get_upcoming_inactive_slots(db: Session) -> list:
+    """Получение неактивных слотов начиная с сегодняшнего дня"""
+    today = datetime.now().date()
+    return db.query(InactiveSlot).filter(
+        InactiveSlot.date >= today
+    ).order_by(InactiveSlot.date, InactiveSlot.time).all()
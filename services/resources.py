@@ -0,0 +1,185 @@
+"""
+Ресурсы студии: специалисты и кабинеты.
+
+Каждый ресурс — отдельный календарь: запись занимает время только своего
+ресурса, поэтому у двух специалистов могут идти процедуры одновременно.
+Допуск процедур задается таблицей procedure_resources; процедура без строк
+в ней доступна у любого активного ресурса. Расписание работы и закрытое
+время (inactive_slots) общие для всей студии.
+
+Ресурсы и допуски читаются на каждом шаге записи, поэтому, как справочник
+процедур, хранятся в памяти снимком с TTL. Пока ресурсы не заведены,
+все записи ведутся в одном общем календаре SHARED_CALENDAR.
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from models.database import Procedure, Resource, ProcedureResource
+from services.availability import availability_cache
+from tenancy import TenantLocal
+from config import PROCEDURE_CATALOG_TTL
+
+# Календарь записей, когда ни одного ресурса не заведено
+SHARED_CALENDAR = 0
+
+RESOURCE_KINDS = {'specialist': "специалист", 'room': "кабинет"}
+
+
+class ResourceInfo(NamedTuple):
+    """Неизменяемое описание активного ресурса"""
+    id: int
+    name: str
+    kind: str
+
+
+class ResourceCatalog:
+    """Снимок активных ресурсов и допусков процедур к ним"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.loads = 0
+        self._items = ()
+        self._by_id = {}
+        self._eligible = {}
+        self._configured = False
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def load(self, db: Session) -> 'ResourceCatalog':
+        """Перечитывание ресурсов и допусков одним запросом"""
+        rows = db.query(
+            Resource.id, Resource.name, Resource.kind, Resource.is_active, ProcedureResource.procedure_id
+        ).outerjoin(
+            ProcedureResource, ProcedureResource.resource_id == Resource.id
+        ).order_by(Resource.id).all()
+        by_id = {}
+        eligible = {}
+        for resource_id, name, kind, is_active, procedure_id in rows:
+            if procedure_id is not None:
+                # Неактивный ресурс сохраняет допуск: процедура остается закрепленной за ним
+                eligible.setdefault(procedure_id, [])
+                if is_active:
+                    eligible[procedure_id].append(resource_id)
+            if is_active:
+                by_id[resource_id] = ResourceInfo(resource_id, name, kind)
+        with self._lock:
+            self._items = tuple(by_id.values())
+            self._by_id = by_id
+            self._eligible = {procedure_id: tuple(ids) for procedure_id, ids in eligible.items()}
+            self._configured = bool(rows)
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        return self
+
+    def ensure(self, db: Session) -> 'ResourceCatalog':
+        if not self.is_fresh():
+            self.load(db)
+        return self
+
+    def all(self) -> tuple:
+        return self._items
+
+    def get(self, resource_id: int) -> Optional[ResourceInfo]:
+        return self._by_id.get(resource_id)
+
+    def eligible(self, procedure_id: int = None) -> tuple:
+        """
+        Календари, в которых можно записаться на процедуру
+
+        Без ресурсов — общий календарь; для процедуры без допусков — все
+        активные ресурсы; пустой кортеж — процедуру сейчас делать некому.
+        """
+        if not self._configured:
+            return (SHARED_CALENDAR,)
+        if procedure_id in self._eligible:
+            return self._eligible[procedure_id]
+        return tuple(self._by_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def clear(self):
+        with self._lock:
+            self._items = ()
+            self._by_id = {}
+            self._eligible = {}
+            self._configured = False
+            self._loaded_at = None
+            self.loads = 0
+
+
+resource_catalog = TenantLocal(lambda: ResourceCatalog(PROCEDURE_CATALOG_TTL))
+
+
+def _changed():
+    # Набор календарей изменился: свободное время всех дат нужно пересчитать
+    resource_catalog.invalidate()
+    availability_cache.invalidate_all()
+
+
+def get_resources(db: Session) -> list:
+    """Все ресурсы с id допущенных процедур: [(Resource, [procedure_id, ...])]"""
+    resources = db.query(Resource).order_by(Resource.id).all()
+    procedures = {}
+    for procedure_id, resource_id in db.query(ProcedureResource.procedure_id, ProcedureResource.resource_id):
+        procedures.setdefault(resource_id, []).append(procedure_id)
+    return [(resource, sorted(procedures.get(resource.id, []))) for resource in resources]
+
+
+def add_resource(db: Session, name: str, kind: str = 'specialist') -> Resource:
+    """Новый ресурс; при неизвестном виде или занятом имени выбрасывается ValueError"""
+    if kind not in RESOURCE_KINDS:
+        raise ValueError(f"неизвестный вид ресурса {kind}")
+    if db.query(Resource.id).filter(Resource.name == name).first() is not None:
+        raise ValueError(f"ресурс {name} уже есть")
+    resource = Resource(name=name, kind=kind, is_active=True)
+    db.add(resource)
+    db.commit()
+    _changed()
+    return resource
+
+
+def set_resource_procedures(db: Session, resource_id: int, procedure_ids: list) -> bool:
+    """
+    Замена списка процедур, которые выполняет ресурс
+
+    Процедуры ищутся среди процедур текущей студии; при неизвестных id
+    выбрасывается ValueError.
+    """
+    if db.get(Resource, resource_id) is None:
+        return False
+    procedure_ids = list(dict.fromkeys(procedure_ids))
+    known = {
+        procedure_id for procedure_id, in
+        db.query(Procedure.id).filter(Procedure.id.in_(procedure_ids))
+    } if procedure_ids else set()
+    unknown = [procedure_id for procedure_id in procedure_ids if procedure_id not in known]
+    if unknown:
+        raise ValueError(f"нет процедур с ID: {', '.join(map(str, unknown))}")
+    db.query(ProcedureResource).filter(
+        ProcedureResource.resource_id == resource_id
+    ).delete(synchronize_session=False)
+    db.add_all([
+        ProcedureResource(procedure_id=procedure_id, resource_id=resource_id)
+        for procedure_id in procedure_ids
+    ])
+    db.commit()
+    _changed()
+    return True
+
+
+def set_resource_active(db: Session, resource_id: int, is_active: bool) -> bool:
+    """Включение или выключение ресурса; уже созданные записи не меняются"""
+    resource = db.get(Resource, resource_id)
+    if resource is None:
+        return False
+    resource.is_active = is_active
+    db.commit()
+    _changed()
+    return True
@@ -0,0 +1,182 @@
+"""
+Расписание работы: часы по дням недели и исключения по датам.
+
+Рабочее время дня не хранится заранее, а вычисляется из правил при
+расчете свободного времени: недельные правила (working_hours) задают
+один или несколько интервалов на каждый день недели, а исключения
+(schedule_exceptions) заменяют их на конкретную дату — другими часами
+или выходным. Поэтому расписание действует на любой горизонт без
+заполнения таблиц на будущее. Если недельные правила не заданы вовсе,
+каждый день открыт с WORK_START до WORK_END; заданное расписание всегда
+содержит правило (хотя бы «выходной») на каждый день недели.
+"""
+from datetime import date as date_type, timedelta
+from sqlalchemy.orm import Session
+from models.database import WorkingHours, ScheduleException, insert_ignore
+from services.availability import (
+    DayGrid, availability_cache, minutes_to_time, time_to_minutes
+)
+from config import WORK_START, WORK_END, WORK_DAYS, SLOT_DURATION
+
+WEEKDAY_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# Слово, которым в командах администратора обозначается выходной
+DAY_OFF = "выходной"
+
+
+def parse_hours(text: str) -> list:
+    """
+    Разбор интервалов вида "09:00-13:00, 14:00-20:00" в пары "HH:MM"
+
+    "выходной" дает пустой список. При неверном формате выбрасывается ValueError.
+    """
+    text = text.strip().lower()
+    if text == DAY_OFF:
+        return []
+    intervals = []
+    for part in text.replace(" ", "").split(","):
+        start, end = part.split("-")
+        start_minutes, end_minutes = time_to_minutes(start), time_to_minutes(end)
+        if not 0 <= start_minutes < end_minutes <= 24 * 60:
+            raise ValueError(f"неверный интервал {part}")
+        intervals.append((minutes_to_time(start_minutes), minutes_to_time(end_minutes)))
+    return intervals
+
+
+def format_hours(intervals) -> str:
+    """Интервалы "HH:MM" в строку для администратора"""
+    if not intervals:
+        return DAY_OFF
+    return ", ".join(f"{start}-{end}" for start, end in intervals)
+
+
+class ScheduleRules:
+    """Правила расписания, загруженные для расчета диапазона дат"""
+
+    def __init__(self, weekly: dict = None, exceptions: dict = None, step: int = SLOT_DURATION):
+        # weekly: день недели -> [(начало, конец) в минутах]; None — правила не заданы
+        self.weekly = weekly
+        # exceptions: дата -> [(начало, конец) в минутах]; пустой список — выходной
+        self.exceptions = exceptions or {}
+        self.step = step
+
+    def hours(self, day: date_type) -> list:
+        if day in self.exceptions:
+            return self.exceptions[day]
+        if self.weekly is None:
+            return [(time_to_minutes(WORK_START), time_to_minutes(WORK_END))]
+        return self.weekly.get(day.weekday(), [])
+
+    def grid(self, day: date_type) -> DayGrid:
+        """Рабочие интервалы и шаг записи на дату"""
+        return DayGrid(self.hours(day), self.step)
+
+
+def load_rules(db: Session, start_date: date_type, end_date: date_type) -> ScheduleRules:
+    """Недельные правила и исключения на даты [start_date, end_date)"""
+    weekdays = {(start_date + timedelta(days=i)).weekday() for i in range(min((end_date - start_date).days, 7))}
+    weekly = {}
+    rows = db.query(WorkingHours.weekday, WorkingHours.start, WorkingHours.end).filter(
+        WorkingHours.weekday.in_(weekdays)
+    )
+    for weekday, start, end in rows:
+        hours = weekly.setdefault(weekday, [])
+        if start is not None:
+            hours.append((time_to_minutes(start), time_to_minutes(end)))
+
+    exceptions = {}
+    rows = db.query(ScheduleException.date, ScheduleException.start, ScheduleException.end).filter(
+        ScheduleException.date >= start_date,
+        ScheduleException.date < end_date
+    )
+    for day, start, end in rows:
+        hours = exceptions.setdefault(day, [])
+        if start is not None:
+            hours.append((time_to_minutes(start), time_to_minutes(end)))
+    return ScheduleRules(weekly or None, exceptions)
+
+
+def get_weekly_hours(db: Session) -> dict:
+    """Недельное расписание: день недели -> [(начало, конец) "HH:MM"]"""
+    weekly = {weekday: [] for weekday in range(7)}
+    rows = db.query(WorkingHours.weekday, WorkingHours.start, WorkingHours.end).order_by(
+        WorkingHours.weekday, WorkingHours.start
+    )
+    for weekday, start, end in rows:
+        if start is not None:
+            weekly[weekday].append((start, end))
+    return weekly
+
+
+def set_working_hours(db: Session, weekday: int, intervals: list):
+    """Замена рабочих часов дня недели; пустой список делает день выходным"""
+    # Расписание задается сразу на всю неделю: остальные дни получают часы по умолчанию
+    seed_working_hours(db)
+    db.query(WorkingHours).filter(WorkingHours.weekday == weekday).delete(synchronize_session=False)
+    if intervals:
+        # Начало интервала уникально в пределах дня: из одинаковых начал берется самый длинный
+        ends = {}
+        for start, end in intervals:
+            ends[start] = max(ends.get(start, end), end)
+        db.add_all([WorkingHours(weekday=weekday, start=start, end=end) for start, end in ends.items()])
+    else:
+        db.add(WorkingHours(weekday=weekday))
+    db.commit()
+    availability_cache.invalidate_all()
+
+
+def get_exceptions(db: Session, start_date: date_type, days: int = 60) -> dict:
+    """Исключения на ближайшие days дней: дата -> [(начало, конец) "HH:MM"]"""
+    exceptions = {}
+    rows = db.query(ScheduleException).filter(
+        ScheduleException.date >= start_date,
+        ScheduleException.date < start_date + timedelta(days=days)
+    ).order_by(ScheduleException.date, ScheduleException.start)
+    for row in rows:
+        hours = exceptions.setdefault(row.date, [])
+        if row.start is not None:
+            hours.append((row.start, row.end))
+    return exceptions
+
+
+def set_exception(db: Session, day: date_type, intervals: list):
+    """Особые часы работы на дату; пустой список — выходной"""
+    db.query(ScheduleException).filter(ScheduleException.date == day).delete(synchronize_session=False)
+    if intervals:
+        db.add_all([ScheduleException(date=day, start=start, end=end) for start, end in intervals])
+    else:
+        db.add(ScheduleException(date=day))
+    db.commit()
+    availability_cache.invalidate(day)
+
+
+def remove_exception(db: Session, day: date_type) -> bool:
+    """Возврат даты к недельному расписанию"""
+    deleted = db.query(ScheduleException).filter(
+        ScheduleException.date == day
+    ).delete(synchronize_session=False)
+    db.commit()
+    availability_cache.invalidate(day)
+    return bool(deleted)
+
+
+def seed_working_hours(db: Session) -> int:
+    """
+    Недельное расписание при первом запуске: WORK_DAYS с WORK_START до WORK_END,
+    остальные дни недели — выходные
+
+    Уже заданное администратором расписание не трогаем. Одновременный
+    запуск нескольких процессов не создает повторных часов: вставка
+    пропускает строки, уже занявшие ключ (tenant_id, weekday, start).
+    Возвращает число добавленных правил.
+    """
+    if db.query(WorkingHours.id).first() is not None:
+        db.commit()
+        return 0
+    added = insert_ignore(db, WorkingHours, [
+        {'weekday': weekday, 'start': WORK_START, 'end': WORK_END} if weekday in WORK_DAYS
+        else {'weekday': weekday, 'start': None, 'end': None}
+        for weekday in range(7)
+    ], ['tenant_id', 'weekday', 'start'])
+    db.commit()
+    return added
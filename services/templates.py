@@ -0,0 +1,130 @@
+"""
+Шаблоны сообщений студии.
+
+Тексты, которые у каждой студии свои (напоминание с адресом и подписью
+мастера, приветствие), хранятся в таблице message_templates; для шаблона,
+который студия не меняла, используется текст по умолчанию. Подстановки
+пишутся в фигурных скобках, например {procedure}; допустимы только
+перечисленные в TEMPLATE_FIELDS. Шаблоны читаются из базы один раз и
+хранятся отдельно для каждой студии до истечения TTL или изменения.
+"""
+import threading
+import time
+from string import Formatter
+from sqlalchemy.orm import Session
+from models.database import MessageTemplate
+from tenancy import TenantLocal
+from config import PROCEDURE_CATALOG_TTL
+
+DEFAULT_TEMPLATES = {
+    'reminder': (
+        "🔔  Здравствуйте!🤍\n\n"
+        "Вы записаны на процедуру:\n"
+        "{procedure}\n"
+        "📅 Дата: {date}\n"
+        "🕒 Время: {time}\n\n"
+        "{studio}"
+    ),
+    'welcome': (
+        "👋 Добро пожаловать в бот для записи на процедуры!\n\n"
+        "Выберите действие:"
+    ),
+}
+
+TEMPLATE_NAMES = {
+    'reminder': "напоминание о записи",
+    'welcome': "приветствие",
+}
+
+TEMPLATE_FIELDS = {
+    'reminder': {'procedure', 'date', 'time', 'client', 'studio'},
+    'welcome': {'client', 'studio'},
+}
+
+
+def check_template(name: str, text: str):
+    """Проверка имени шаблона и подстановок; при ошибке выбрасывается ValueError"""
+    if name not in DEFAULT_TEMPLATES:
+        raise ValueError(f"неизвестный шаблон {name}")
+    if not text.strip():
+        raise ValueError("пустой шаблон")
+    for _, field, format_spec, conversion in Formatter().parse(text):
+        if field is None:
+            continue
+        # Только простые имена: без атрибутов, индексов и форматирования
+        if field not in TEMPLATE_FIELDS[name] or format_spec or conversion:
+            raise ValueError(
+                f"недопустимая подстановка {{{field}}}, доступны: "
+                + ", ".join(f"{{{allowed}}}" for allowed in sorted(TEMPLATE_FIELDS[name]))
+            )
+
+
+def render(template: str, **values) -> str:
+    """Текст сообщения по шаблону"""
+    return template.format_map(values)
+
+
+class TemplateCatalog:
+    """Измененные студией шаблоны"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._texts = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def load(self, db: Session) -> 'TemplateCatalog':
+        texts = dict(db.query(MessageTemplate.name, MessageTemplate.text).all())
+        with self._lock:
+            self._texts = texts
+            self._loaded_at = time.monotonic()
+        return self
+
+    def ensure(self, db: Session) -> 'TemplateCatalog':
+        if not self.is_fresh():
+            self.load(db)
+        return self
+
+    def get(self, name: str) -> str:
+        return self._texts.get(name, DEFAULT_TEMPLATES[name])
+
+    def is_custom(self, name: str) -> bool:
+        return name in self._texts
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+template_catalog = TenantLocal(lambda: TemplateCatalog(PROCEDURE_CATALOG_TTL))
+
+
+def get_template(db: Session, name: str) -> str:
+    """Шаблон текущей студии"""
+    return template_catalog.ensure(db).get(name)
+
+
+def set_template(db: Session, name: str, text: str):
+    """Замена шаблона текущей студии; при ошибке в шаблоне выбрасывается ValueError"""
+    check_template(name, text)
+    template = db.query(MessageTemplate).filter(MessageTemplate.name == name).first()
+    if template is None:
+        db.add(MessageTemplate(name=name, text=text))
+    else:
+        template.text = text
+    db.commit()
+    template_catalog.invalidate()
+
+
+def reset_template(db: Session, name: str) -> bool:
+    """Возврат шаблона к тексту по умолчанию"""
+    deleted = db.query(MessageTemplate).filter(
+        MessageTemplate.name == name
+    ).delete(synchronize_session=False)
+    db.commit()
+    template_catalog.invalidate()
+    return bool(deleted)
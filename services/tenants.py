@@ -0,0 +1,124 @@
+"""
+Студии (tenants), которые обслуживает процесс бота.
+
+У каждой студии свой бот в Telegram и свои администраторы. Реестр
+студий загружается при запуске и сопоставляет боту студию, от имени
+которой обрабатываются его обновления; студия по умолчанию работает через
+BOT_TOKEN и администраторов ADMIN_IDS, как однотенантная установка.
+Новые студии заводятся командой tools.tenants.
+"""
+import logging
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from models.database import Tenant, seed_procedures
+from services.schedule import seed_working_hours
+from tenancy import DEFAULT_TENANT, current_tenant, tenant_scope
+from config import ADMIN_IDS
+
+logger = logging.getLogger(__name__)
+
+
+class TenantInfo(NamedTuple):
+    """Неизменяемое описание студии"""
+    id: int
+    slug: str
+    name: str
+    bot_token: Optional[str]
+    admin_ids: tuple
+
+
+def parse_admin_ids(text: str) -> tuple:
+    """Telegram ID администраторов из строки "1, 2, 3"; при неверном формате ValueError"""
+    return tuple(int(value) for value in (text or "").replace(" ", "").split(",") if value)
+
+
+class TenantRegistry:
+    """Активные студии и боты, через которые они работают"""
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_bot = {}
+
+    def load(self, db: Session) -> 'TenantRegistry':
+        rows = db.query(Tenant).filter(Tenant.is_active.is_(True)).order_by(Tenant.id).all()
+        self._by_id = {
+            row.id: TenantInfo(row.id, row.slug, row.name, row.bot_token, parse_admin_ids(row.admin_ids))
+            for row in rows
+        }
+        return self
+
+    def all(self) -> list:
+        return list(self._by_id.values())
+
+    def get(self, tenant_id: int) -> Optional[TenantInfo]:
+        return self._by_id.get(tenant_id)
+
+    def bot_tokens(self, default_token: str) -> dict:
+        """
+        Токены ботов по id студий
+
+        Студия по умолчанию без своего токена работает через default_token;
+        другие студии без токена пропускаются.
+        """
+        tokens = {DEFAULT_TENANT: default_token}
+        for tenant in self._by_id.values():
+            if tenant.bot_token:
+                tokens[tenant.id] = tenant.bot_token
+            elif tenant.id != DEFAULT_TENANT:
+                logger.warning(f"У студии {tenant.slug} нет токена бота, она не будет обслуживаться")
+        return tokens
+
+    def register_bot(self, bot_id: int, tenant_id: int):
+        self._by_bot[bot_id] = tenant_id
+
+    def for_bot(self, bot_id: int) -> int:
+        """Студия бота; незарегистрированный бот работает на студию по умолчанию"""
+        return self._by_bot.get(bot_id, DEFAULT_TENANT)
+
+    def clear(self):
+        self._by_id = {}
+        self._by_bot = {}
+
+
+tenant_registry = TenantRegistry()
+
+
+def admin_ids(tenant_id: int = None) -> list:
+    """Telegram ID администраторов студии (по умолчанию — текущей)"""
+    tenant_id = current_tenant() if tenant_id is None else tenant_id
+    tenant = tenant_registry.get(tenant_id)
+    ids = list(tenant.admin_ids) if tenant else []
+    if tenant_id == DEFAULT_TENANT:
+        ids += [admin_id for admin_id in ADMIN_IDS if admin_id not in ids]
+    return ids
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in admin_ids()
+
+
+def studio_name() -> str:
+    tenant = tenant_registry.get(current_tenant())
+    return tenant.name if tenant else ""
+
+
+def add_tenant(db: Session, slug: str, name: str, bot_token: str = None, admins: tuple = ()) -> Tenant:
+    """
+    Новая студия со справочником процедур и расписанием по умолчанию
+
+    При занятом slug или токене выбрасывается ValueError.
+    """
+    if db.query(Tenant.id).filter(Tenant.slug == slug).first() is not None:
+        raise ValueError(f"студия {slug} уже есть")
+    if bot_token and db.query(Tenant.id).filter(Tenant.bot_token == bot_token).first() is not None:
+        raise ValueError("этот бот уже подключен к другой студии")
+    tenant = Tenant(
+        slug=slug, name=name, bot_token=bot_token,
+        admin_ids=",".join(map(str, admins)), is_active=True
+    )
+    db.add(tenant)
+    db.commit()
+    with tenant_scope(tenant.id):
+        seed_procedures(db)
+        seed_working_hours(db)
+    return tenant
@@ -0,0 +1,84 @@
+"""
+Текущая студия (tenant) и данные процесса, разделенные по студиям.
+
+Один процесс бота обслуживает несколько студий: у каждой свой бот в
+Telegram, свои процедуры, расписание, администраторы и шаблоны сообщений,
+а база данных и пул соединений общие. Студия, в рамках которой идет
+работа, хранится в ContextVar: промежуточный слой выставляет ее по боту,
+получившему обновление, задачи планировщика — по записи. Запросы ORM к
+таблицам студий фильтруются по ней автоматически (models.database), новые
+строки получают ее id по умолчанию.
+
+Кэши и справочники в памяти заводятся отдельно на каждую студию через
+TenantLocal, поэтому изменение расписания одной студии не сбрасывает кэш
+другой, а одинаковые id и даты разных студий не смешиваются.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Студия, в которую переносятся данные однотенантной установки
+DEFAULT_TENANT = 1
+
+_tenant = ContextVar('tenant_id', default=DEFAULT_TENANT)
+
+
+def current_tenant():
+    """id текущей студии; None — работа со всеми студиями сразу"""
+    return _tenant.get()
+
+
+@contextmanager
+def tenant_scope(tenant_id):
+    """Выполнение блока в рамках студии tenant_id"""
+    token = _tenant.set(tenant_id)
+    try:
+        yield tenant_id
+    finally:
+        _tenant.reset(token)
+
+
+def all_tenants():
+    """
+    Выполнение блока без фильтра по студии
+
+    Нужно фоновым задачам, которые обслуживают все студии разом (очередь
+    outbox). Новые строки в этом режиме должны получать tenant_id явно.
+    """
+    return tenant_scope(None)
+
+
+class TenantLocal:
+    """
+    Отдельный экземпляр объекта на каждую студию
+
+    Обращения к атрибутам передаются экземпляру текущей студии, который
+    создается factory при первом обращении. clear() сбрасывает экземпляры
+    всех студий.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def current(self):
+        tenant_id = _tenant.get()
+        instance = self._instances.get(tenant_id)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant_id)
+                if instance is None:
+                    instance = self._instances[tenant_id] = self._factory()
+        return instance
+
+    def instances(self) -> dict:
+        """Экземпляры по id студий"""
+        return dict(self._instances)
+
+    def clear(self):
+        with self._lock:
+            self._instances = {}
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
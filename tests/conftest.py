@@ -1,9 +1,21 @@
+import os
 import sys
 from pathlib import Path
 import pytest
+import pytest_asyncio
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from models.database import Base, Client, Procedure
+from sqlalchemy.pool import StaticPool
+
+# Тесты не должны зависеть от .env и реальной базы данных
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from models.database import Base, Client, Procedure, SessionLocal
+from services.availability import availability_cache
+from services.catalog import procedure_catalog
+from services.resources import resource_catalog
+from services.templates import template_catalog
 from datetime import datetime
 
 # Добавляем корневую директорию проекта в путь импорта
@@ -15,6 +27,9 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Сервисы, которые открывают сессию сами (get_db), работают с той же тестовой базой
+SessionLocal.configure(bind=engine)
+
 @pytest.fixture(scope="session")
 def db_engine():
     """Создание тестового движка базы данных"""
@@ -31,6 +46,10 @@ def db_session(db_engine):
         yield session
     finally:
         session.rollback()
+        # Очищаем таблицы, чтобы записи одного теста не занимали время в другом
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
         session.close() 
 
 @pytest.fixture
@@ -56,4 +75,24 @@ def test_client(db_session):
     )
     db_session.add(client)
     db_session.commit()
-    return client
\ No newline at end of file
+    return client
+
+@pytest.fixture(autouse=True)
+def clear_availability_cache():
+    """Кэш свободного времени, справочники и шаблоны общие для процесса — очищаем их между тестами"""
+    availability_cache.clear()
+    procedure_catalog.clear()
+    resource_catalog.clear()
+    template_catalog.clear()
+    yield
+
+@pytest_asyncio.fixture
+async def async_db():
+    """Асинхронная сессия к отдельной тестовой базе данных (aiosqlite)"""
+    async_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+    await async_engine.dispose()
@@ -0,0 +1,40 @@
+import pytest
+from datetime import datetime, date
+from types import SimpleNamespace
+from handlers.admin import encode_page, decode_page, create_appointments_list_keyboard, parse_period, PeriodError
+
+
+def test_page_token_roundtrip():
+    """Тест: страница списка восстанавливается из callback_data"""
+    cursor = (datetime(2026, 10, 17, 13, 30), 1234567)
+    token = encode_page('prev', cursor, date(2026, 10, 17), date(2026, 10, 31))
+    assert decode_page(token) == ('prev', cursor, date(2026, 10, 17), date(2026, 10, 31))
+    assert decode_page(encode_page('next', None, date(2026, 10, 17), None)) == (
+        'next', None, date(2026, 10, 17), None
+    )
+
+def test_list_keyboard_fits_callback_limit():
+    """Тест: callback_data кнопок не превышает 64 байта"""
+    appointments = [
+        SimpleNamespace(id=9999990 + i, date=datetime(2026, 10, 17, 9 + i, 0))
+        for i in range(3)
+    ]
+    keyboard = create_appointments_list_keyboard(
+        appointments, True, True, date(2026, 10, 17), date(2026, 12, 31)
+    )
+    buttons = [button for row in keyboard.inline_keyboard for button in row]
+    assert len(buttons) == 5
+    assert all(len(button.callback_data.encode()) <= 64 for button in buttons)
+    assert buttons[0].callback_data.startswith("delete_9999990_a_")
+
+def test_parse_period():
+    """Тест: разбор периода для закрытия и открытия записи"""
+    assert parse_period("01.11.2026") == (date(2026, 11, 1), date(2026, 11, 1), None)
+    start, end, times = parse_period("01.11.2026-07.11.2026 10:00-12:00, 15:00-16:00")
+    assert (start, end) == (date(2026, 11, 1), date(2026, 11, 7))
+    assert times == ["10:00", "11:00", "15:00"]
+    for wrong in ("", "31.02.2026", "07.11.2026-01.11.2026", "01.11.2026 выходной", "01.01.2026-01.01.2028"):
+        with pytest.raises(ValueError):
+            parse_period(wrong)
+    with pytest.raises(PeriodError, match="10:00-10:30"):
+        parse_period("01.11.2026 10:00-10:30")
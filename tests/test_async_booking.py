@@ -0,0 +1,53 @@
+import pytest
+from datetime import datetime, timedelta
+from models.database import Client, Procedure
+from models.database import make_async_url
+from services import async_booking
+
+
+async def create_client_and_procedure(db):
+    """Создание клиента и процедуры в асинхронной сессии"""
+    client = Client(telegram_id=555, name="Асинхронный клиент", username="async_user")
+    procedure = Procedure(name="Асинхронная процедура", duration=1.5)
+    db.add_all([client, procedure])
+    await db.commit()
+    return client, procedure
+
+def test_make_async_url():
+    """Тест выбора асинхронного драйвера по URL базы данных"""
+    assert make_async_url("sqlite:///bot.db").drivername == "sqlite+aiosqlite"
+    assert make_async_url("postgresql://u:p@localhost/db").drivername == "postgresql+asyncpg"
+    assert make_async_url("postgresql+psycopg2://u:p@localhost/db").drivername == "postgresql+asyncpg"
+
+@pytest.mark.asyncio
+async def test_async_booking_flow(async_db):
+    """Тест записи, просмотра и отмены через асинхронный слой"""
+    client, procedure = await create_client_and_procedure(async_db)
+    test_date = datetime.now().date() + timedelta(days=3)
+
+    slots = await async_booking.get_available_slots(async_db, test_date, procedure.duration)
+    assert "10:00" in slots
+
+    appointment = await async_booking.create_appointment(
+        async_db, client.id, procedure.id,
+        datetime.combine(test_date, datetime.strptime("10:00", "%H:%M").time())
+    )
+    # Связи загружены заранее и доступны без обращения к базе данных
+    assert appointment.procedure.name == procedure.name
+    assert appointment.client.username == "async_user"
+
+    slots = await async_booking.get_available_slots(async_db, test_date, procedure.duration)
+    assert "10:00" not in slots
+    assert "11:00" not in slots
+
+    upcoming = await async_booking.get_upcoming_appointments(async_db)
+    assert [app.client.name for app in upcoming] == ["Асинхронный клиент"]
+
+    with pytest.raises(ValueError):
+        await async_booking.create_appointment(
+            async_db, client.id, procedure.id,
+            datetime.combine(test_date, datetime.strptime("11:00", "%H:%M").time())
+        )
+
+    assert await async_booking.cancel_appointment(async_db, appointment.id) is True
+    assert await async_booking.get_client_appointments(async_db, client.id) == []
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, date
+from services.availability import (
+    AvailabilityCache, DayAvailability, DayGrid, build_day,
+    availability_cache, time_to_minutes, minutes_to_time
+)
+from services.booking import (
+    get_available_slots, get_available_dates, create_appointment, cancel_appointment
+)
+from models.database import InactiveSlot
+
+
+def test_time_conversion():
+    """Тест перевода времени в минуты и обратно"""
+    assert time_to_minutes("09:30") == 570
+    assert minutes_to_time(570) == "09:30"
+    assert time_to_minutes(datetime(2024, 1, 1, 13, 15)) == 795
+
+def test_free_starts_respects_duration():
+    """Тест: процедура должна целиком помещаться в свободное окно"""
+    grid = DayGrid([(9 * 60, 20 * 60)], 60)
+    day = DayAvailability(date(2024, 1, 1))
+    day.occupy(12 * 60, 90)
+
+    hour_starts = [minutes_to_time(m) for m in day.free_starts(60, grid)]
+    assert "11:00" in hour_starts
+    assert "12:00" not in hour_starts
+    assert "13:00" not in hour_starts
+    assert "14:00" in hour_starts
+    assert "19:00" in hour_starts
+
+    long_starts = [minutes_to_time(m) for m in day.free_starts(90, grid)]
+    assert "10:00" in long_starts
+    assert "11:00" not in long_starts
+    assert "19:00" not in long_starts
+
+def test_build_day_with_inactive_slots():
+    """Тест построения дня из записей и неактивных слотов"""
+    grid = DayGrid([(9 * 60, 20 * 60)], 60)
+    test_date = date(2024, 1, 1)
+    day = build_day(test_date, [(datetime(2024, 1, 1, 10, 0), 1.0)], ["15:00"], 60)
+    starts = [minutes_to_time(m) for m in day.free_starts(60, grid)]
+    assert "10:00" not in starts
+    assert "15:00" not in starts
+    assert "09:00" in starts
+
+    closed = build_day(test_date, [], [None], 60)
+    assert closed.free_starts(60, grid) == []
+
+def test_get_available_slots_excludes_booked(db_session, test_client, test_procedure):
+    """Тест: занятое и неактивное время не предлагается"""
+    test_date = datetime.now().date() + timedelta(days=3)
+    create_appointment(
+        db_session,
+        test_client.id,
+        test_procedure.id,
+        datetime.combine(test_date, datetime.strptime("11:00", "%H:%M").time())
+    )
+    db_session.add(InactiveSlot(date=test_date, time="15:00"))
+    db_session.commit()
+
+    slots = get_available_slots(test_date, db=db_session)
+    assert "11:00" not in slots
+    assert "15:00" not in slots
+    assert "10:00" in slots
+
+    long_slots = get_available_slots(test_date, 2.0, db=db_session)
+    assert "10:00" not in long_slots
+    assert "14:00" not in long_slots
+
+def test_get_available_dates_hides_full_days(db_session):
+    """Тест: полностью занятые дни не попадают в горизонт записи"""
+    today = datetime.now().date()
+    closed_date = today + timedelta(days=2)
+    for hour in range(9, 20):
+        db_session.add(InactiveSlot(date=closed_date, time=f"{hour:02d}:00"))
+    db_session.commit()
+
+    dates = get_available_dates(db=db_session)
+    assert all(isinstance(free_count, int) and free_count > 0 for _, free_count in dates)
+    assert closed_date not in [day for day, _ in dates]
+    assert all(today <= day < today + timedelta(days=14) for day, _ in dates)
+    assert get_available_slots(db=db_session) == [day for day, _ in dates]
+
+def test_availability_cache_versions():
+    """Тест: устаревший результат не попадает в кэш"""
+    cache = AvailabilityCache(max_entries=2)
+    day = date(2024, 1, 1)
+
+    version = cache.version(day)
+    cache.invalidate(day)
+    cache.put(day, 60, [540], version)
+    assert cache.get(day, 60) is None
+
+    cache.put(day, 60, [540], cache.version(day))
+    assert cache.get(day, 60) == (540,)
+
+    cache.put(day + timedelta(days=1), 60, [600], cache.version(day + timedelta(days=1)))
+    cache.put(day + timedelta(days=2), 60, [660], cache.version(day + timedelta(days=2)))
+    assert cache.get(day, 60) is None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['hits'] == 1
+
+def test_availability_cache_forgets_past_versions():
+    """Тест: счетчики версий прошедших дат не копятся, а сброс всего кэша их очищает"""
+    cache = AvailabilityCache(max_entries=4)
+    today = date.today()
+    past = today - timedelta(days=30)
+    cache.put(past, 60, [540], cache.version(past))
+    cache.invalidate(*(past + timedelta(days=i) for i in range(10)))
+    cache.invalidate(today)
+    assert set(cache._versions) == {today}
+    assert cache.get(past, 60) is None
+
+    version = cache.version(today)
+    cache.invalidate_all()
+    assert cache._versions == {}
+    # Результат, посчитанный до сброса, в кэш не попадает
+    cache.put(today, 60, [540], version)
+    assert cache.get(today, 60) is None
+
+def test_mutations_invalidate_cache(db_session, test_client, test_procedure):
+    """Тест: создание и отмена записи сбрасывают кэш только своей даты"""
+    test_date = datetime.now().date() + timedelta(days=4)
+    other_date = test_date + timedelta(days=1)
+    assert "12:00" in get_available_slots(test_date, db=db_session)
+    get_available_slots(other_date, db=db_session)
+
+    appointment = create_appointment(
+        db_session,
+        test_client.id,
+        test_procedure.id,
+        datetime.combine(test_date, datetime.strptime("12:00", "%H:%M").time())
+    )
+    assert "12:00" not in get_available_slots(test_date, db=db_session)
+
+    hits = availability_cache.hits
+    get_available_slots(other_date, db=db_session)
+    assert availability_cache.hits == hits + 1
+
+    cancel_appointment(db_session, appointment.id)
+    assert "12:00" in get_available_slots(test_date, db=db_session)
@@ -0,0 +1,26 @@
+from services.availability import availability_cache
+from datetime import date
+from tools.benchmark_booking import run
+from config import WORK_DAYS
+
+
+def test_booking_benchmark_on_small_data(tmp_path):
+    """Тест: генератор дает согласованные данные, а все сценарии замера выполняются"""
+    try:
+        report = run(f"sqlite:///{tmp_path / 'bench.db'}", clients=20, procedures=3,
+                     appointments=200, inactive_days=3, repeat=2, resources=2)
+    finally:
+        availability_cache.clear()
+
+    volumes = report['volumes']
+    assert report['backend'] == 'sqlite'
+    # Замер на день ведется на рабочий день, а не на выходной после запуска
+    assert date.fromisoformat(report['day']).weekday() in WORK_DAYS
+    assert volumes['appointments'] == 200
+    assert volumes['resources'] == 3  # специалист из миграции и два дополнительных
+    assert 0 < volumes['scheduled'] <= 40
+    assert volumes['slot_claims'] >= volumes['scheduled']
+    assert volumes['inactive_slots'] == 6
+    assert {'available_slots_day_cold', 'available_dates_procedure_cold', 'create_appointment',
+            'reminders_restore', 'appointments_page_deep'} <= set(report['results'])
+    assert all(case['repeat'] == 2 for case in report['results'].values())
@@ -11,13 +11,17 @@ from services.booking import (
     cancel_appointment,
     complete_appointment,
     delete_appointment,
-    notify_admins_about_new_appointment,
     set_inactive_slot,
     remove_inactive_slot,
     get_inactive_slots,
-    init_inactive_dates
+    block_period,
+    unblock_period
 )
-from models.database import Appointment, Procedure, Client, InactiveSlot
+from services.availability import availability_cache
+from sqlalchemy import event
+from services.schedule import seed_working_hours
+from models.database import Appointment, Procedure, Client, InactiveSlot, SlotClaim, OutboxMessage
+from services.outbox import PRIORITY_ADMIN
 from aiogram import Bot
 
 
@@ -130,30 +134,21 @@ def test_delete_appointment(db_session, test_client, test_procedure):
     deleted_appointment = db_session.query(Appointment).get(appointment.id)
     assert deleted_appointment is None
 
-@pytest.mark.asyncio
-async def test_notify_admins_about_new_appointment(db_session, test_client, test_procedure, mocker):
-    """Тест отправки уведомления администраторам"""
-    # Создаем тестовую запись
-    test_date = datetime.now() + timedelta(days=1)
-    appointment = create_appointment(
-        db_session,
-        test_client.id,
-        test_procedure.id,
-        test_date
-    )
-    
-    # Мокаем объект Bot и его метод send_message
-    mock_bot = mocker.Mock()
-    mock_bot.send_message = mocker.AsyncMock()
-    
-    # Мокаем конфигурацию ADMIN_IDS
-    mocker.patch('config.ADMIN_IDS', [123456789])
-    
-    # Вызываем тестируемую функцию
-    await notify_admins_about_new_appointment(mock_bot, appointment)
-    
-    # Проверяем, что метод send_message был вызван
-    mock_bot.send_message.assert_called()
+def test_create_appointment_enqueues_admin_notices(db_session, test_client, test_procedure, mocker):
+    """Тест: уведомления администраторам ставятся в очередь вместе с записью"""
+    mocker.patch('services.tenants.ADMIN_IDS', [123456789, 987654321])
+    test_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()) + timedelta(hours=10)
+    appointment = create_appointment(db_session, test_client.id, test_procedure.id, test_date)
+
+    messages = db_session.query(OutboxMessage).order_by(OutboxMessage.chat_id).all()
+    assert [message.chat_id for message in messages] == [123456789, 987654321]
+    assert all(message.priority == PRIORITY_ADMIN for message in messages)
+    assert f"ID: {appointment.id}" in messages[0].text
+
+    # Запись на занятое время не сохраняется, и уведомлений о ней нет
+    with pytest.raises(ValueError):
+        create_appointment(db_session, test_client.id, test_procedure.id, test_date)
+    assert db_session.query(OutboxMessage).count() == 2
 
 def test_set_inactive_slot(db_session):
     """Тест установки неактивного слота"""
@@ -206,37 +201,115 @@ def test_get_inactive_slots(db_session):
     assert isinstance(date_slots, list)
     assert len(date_slots) > 0
 
-@pytest.mark.asyncio
-async def test_init_inactive_dates(db_session):
-    """Тест инициализации неактивных дат"""
-    # Очищаем все существующие неактивные слоты
-    db_session.query(InactiveSlot).delete()
-    db_session.commit()
+def test_block_period_time_range_across_days(db_session):
+    """Тест: часть дня закрывается сразу на несколько дней одним запросом"""
+    start = datetime.now().date() + timedelta(days=5)
+    end = start + timedelta(days=2)
+    untouched = end + timedelta(days=1)
+    before = availability_cache.version(untouched)
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", count_inserts)
+    try:
+        assert block_period(db_session, start, end, ["10:00", "11:00"]) == 6
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", count_inserts)
+    assert len(inserts) == 1
+
+    # Повторное закрытие ничего не добавляет
+    assert block_period(db_session, start, end, ["10:00", "11:00"]) == 0
+    assert "10:00" not in get_available_slots(start + timedelta(days=1), db=db_session)
+    # Кэш сброшен только для затронутых дат
+    assert availability_cache.version(untouched) == before
+
+    assert unblock_period(db_session, start, end, ["11:00"]) == 3
+    assert db_session.query(InactiveSlot).count() == 3
+
+def test_block_period_whole_days(db_session):
+    """Тест: закрытие дней целиком заменяет отдельные слоты, открытие снимает все"""
+    start = datetime.now().date() + timedelta(days=5)
+    end = start + timedelta(days=1)
+    block_period(db_session, start, start, ["10:00"])
+
+    assert block_period(db_session, start, end) == 2
+    assert block_period(db_session, start, end) == 2
+    assert db_session.query(InactiveSlot).count() == 2
+    assert get_available_slots(start, db=db_session) == []
+
+    # Часы внутри закрытого дня не открываются молча
+    with pytest.raises(ValueError):
+        unblock_period(db_session, start, end, ["10:00"])
+    assert db_session.query(InactiveSlot).count() == 2
+
+    assert unblock_period(db_session, start, end) == 2
+    assert get_available_slots(end, db=db_session)
+
+def test_block_period_whole_days_in_chunks(db_session, mocker):
+    """Тест: длинный период закрывается пачками по INSERT_CHUNK строк"""
+    mocker.patch('services.booking.INSERT_CHUNK', 4)
+    start = datetime.now().date() + timedelta(days=5)
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", count_inserts)
+    try:
+        assert block_period(db_session, start, start + timedelta(days=9)) == 10
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", count_inserts)
+    assert len(inserts) == 3
+    assert db_session.query(InactiveSlot).count() == 10
+
+def test_weekends_closed_by_schedule_on_any_horizon(db_session):
+    """Тест: выходные закрыты правилами расписания без строк неактивных слотов"""
+    seed_working_hours(db_session)
+    
+    # Дальше, чем заполнялись выходные при запуске раньше
+    far = datetime.now().date() + timedelta(days=60)
+    saturday = far + timedelta(days=(5 - far.weekday()) % 7)
+    monday = saturday + timedelta(days=2)
     
-    # Выполняем инициализацию, передавая тестовую сессию
-    await init_inactive_dates(db=db_session)
-    
-    # Проверяем, что выходные дни добавлены
-    today = datetime.now().date()
-    weekend_slots_found = False
-    
-    # Проверяем только ближайшие 7 дней, чтобы тест был более стабильным
-    for i in range(7):
-        test_date = today + timedelta(days=i)
-        if test_date.weekday() >= 5:  # 5 - суббота, 6 - воскресенье
-            inactive_slots = db_session.query(InactiveSlot).filter(
-                InactiveSlot.date == test_date,
-                InactiveSlot.is_weekend == True
-            ).all()
-            
-            if inactive_slots:
-                weekend_slots_found = True
-                # Проверяем, что добавлены все базовые слоты
-                base_slots = [
-                    "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", 
-                    "15:00", "16:00", "17:00", "18:00", "19:00", "20:00"
-                ]
-                assert len(inactive_slots) == len(base_slots)
-                break
-    
-    assert weekend_slots_found, "Не найдены неактивные слоты для выходных дней" 
\ No newline at end of file
+    assert get_available_slots(saturday, db=db_session) == []
+    assert get_available_slots(monday, db=db_session)[0] == "09:00"
+    assert db_session.query(InactiveSlot).count() == 0
+
+def test_create_appointment_conflict(db_session, test_client, test_procedure):
+    """Тест: пересекающаяся запись не создается"""
+    test_date = datetime.combine(
+        datetime.now().date() + timedelta(days=2),
+        datetime.strptime("10:00", "%H:%M").time()
+    )
+    first = create_appointment(db_session, test_client.id, test_procedure.id, test_date)
+
+    with pytest.raises(ValueError):
+        create_appointment(
+            db_session, test_client.id, test_procedure.id, test_date + timedelta(minutes=30)
+        )
+
+    # После отмены время снова можно занять
+    cancel_appointment(db_session, first.id)
+    second = create_appointment(db_session, test_client.id, test_procedure.id, test_date)
+    assert second.status == 'scheduled'
+    assert db_session.query(SlotClaim).filter(SlotClaim.appointment_id == second.id).count() == 4
+
+def test_create_appointment_claims_current_duration(db_session, test_client, test_procedure):
+    """Тест: отрезки занимаются по длительности из базы, а не из справочника в памяти"""
+    get_procedures(db_session)
+    # Длительность изменена другим процессом: справочник в памяти ее еще не видит
+    db_session.query(Procedure).filter(Procedure.id == test_procedure.id).update({'duration': 2.0})
+    db_session.commit()
+    test_date = datetime.combine(
+        datetime.now().date() + timedelta(days=2),
+        datetime.strptime("10:00", "%H:%M").time()
+    )
+    appointment = create_appointment(db_session, test_client.id, test_procedure.id, test_date)
+    assert db_session.query(SlotClaim).filter(SlotClaim.appointment_id == appointment.id).count() == 8
+
+    with pytest.raises(ValueError):
+        create_appointment(db_session, test_client.id, 999999, test_date + timedelta(days=1))
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from bootstrap import bootstrap
+from models.database import Procedure, WorkingHours, seed_procedures
+from services.catalog import procedure_catalog
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_import_does_not_touch_database(tmp_path):
+    """Тест: импорт бота и инструментов не обращается к базе данных"""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'missing' / 'bot.db'}", BOT_TOKEN="42:TEST")
+    result = subprocess.run(
+        [sys.executable, "-c", "import main, bootstrap, tools.benchmark_reminders, tools.benchmark_booking, tools.load_test"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / 'missing').exists()
+
+def test_bootstrap_is_idempotent(tmp_path):
+    """Тест: повторная подготовка базы ничего не дублирует"""
+    url = f"sqlite:///{tmp_path / 'bot.db'}"
+    engine = create_engine(url)
+    session_factory = sessionmaker(bind=engine)
+    try:
+        timings = bootstrap(url, session_factory)
+        with session_factory() as db:
+            procedures = db.query(Procedure).count()
+            rules = db.query(WorkingHours).count()
+
+        bootstrap(url, session_factory)
+        with session_factory() as db:
+            assert db.query(Procedure).count() == procedures == 3
+            assert db.query(WorkingHours).count() == rules == 7
+        assert set(timings) == {'migrations', 'tenants', 'procedures', 'working_hours', 'slot_claims', 'catalog', 'total'}
+        assert len(procedure_catalog.all()) == 3
+    finally:
+        engine.dispose()
+
+def test_seed_procedures_keeps_edited_catalog(db_session, test_procedure):
+    """Тест: справочник, в котором уже есть процедуры, не дополняется стандартными"""
+    assert seed_procedures(db_session) == 0
+    assert db_session.query(Procedure).count() == 1
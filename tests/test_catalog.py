@@ -0,0 +1,57 @@
+import pytest
+from models.database import Procedure
+from services.booking import get_procedures, get_procedure_by_id
+from services.catalog import ProcedureCatalog, ProcedureInfo, procedure_catalog
+from tests.test_repository import count_queries
+
+
+def test_catalog_serves_lookups_without_queries(db_session, test_procedure):
+    """Тест: после загрузки справочник не обращается к базе данных"""
+    assert get_procedure_by_id(test_procedure.id, db=db_session).name == test_procedure.name
+
+    with count_queries(db_session) as queries:
+        for _ in range(5):
+            procedure = get_procedure_by_id(test_procedure.id, db=db_session)
+            get_procedures(db=db_session)
+    assert queries == []
+    assert isinstance(procedure, ProcedureInfo)
+    assert procedure_catalog.by_name(test_procedure.name) == procedure
+
+def test_catalog_does_not_reload_on_unknown_id(db_session, test_procedure):
+    """Тест: неизвестный id не обращается к базе, новая процедура видна после сброса справочника"""
+    procedure_catalog.load(db_session)
+    added = Procedure(name="Новая процедура", duration=2.0)
+    db_session.add(added)
+    db_session.commit()
+    added_id = added.id
+
+    with count_queries(db_session) as queries:
+        for _ in range(5):
+            assert get_procedure_by_id(-1, db=db_session) is None
+            assert get_procedure_by_id(added_id, db=db_session) is None
+    assert queries == []
+
+    procedure_catalog.invalidate()
+    assert get_procedure_by_id(added_id, db=db_session).duration == 2.0
+
+def test_catalog_ttl_and_invalidate(db_session, test_procedure):
+    """Тест: устаревший или сброшенный справочник перечитывается"""
+    catalog = ProcedureCatalog(ttl=0)
+    catalog.ensure(db_session)
+    catalog.ensure(db_session)
+    assert catalog.loads == 2
+
+    catalog = ProcedureCatalog(ttl=300)
+    catalog.ensure(db_session)
+    catalog.ensure(db_session)
+    assert catalog.loads == 1
+    catalog.invalidate()
+    assert not catalog.is_fresh()
+    catalog.ensure(db_session)
+    assert catalog.loads == 2
+
+def test_procedure_info_is_immutable():
+    """Тест: элементы справочника нельзя изменить"""
+    procedure = ProcedureInfo(1, "Процедура", 1.0)
+    with pytest.raises(AttributeError):
+        procedure.duration = 2.0
@@ -0,0 +1,73 @@
+import time
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+from aiogram.methods import SendMessage
+from scheduler.dispatcher import ReminderDispatcher, TokenBucket
+from tools.fake_telegram import FakeTelegramSession
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_respects_telegram_limits():
+    """Тест: рассылка по многим чатам без ошибок флуд-контроля"""
+    session = FakeTelegramSession(global_rate=500)
+    bot = Bot(token="42:TEST", session=session)
+    dispatcher = ReminderDispatcher(bot, concurrency=16, global_rate=500)
+    messages = [(i, 1000 + i % 150, f"Напоминание {i}") for i in range(300)]
+
+    delivered, stats = await dispatcher.dispatch(messages)
+
+    assert sorted(delivered) == list(range(300))
+    assert session.flood_errors == 0
+    assert stats.snapshot()['sent'] == 300
+    assert stats.snapshot()['throughput_per_s'] > 0
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_after_flood(mocker):
+    """Тест: после RetryAfter сообщение отправляется повторно"""
+    bot = mocker.Mock()
+    flood = TelegramRetryAfter(method=SendMessage(chat_id=1, text="x"), message="flood", retry_after=0)
+    bot.send_message = mocker.AsyncMock(side_effect=[flood, None])
+
+    delivered, stats = await ReminderDispatcher(bot).dispatch([(7, 1, "Напоминание")])
+
+    assert delivered == [7]
+    assert stats.retries == 1
+    assert stats.errors['retry_after'] == 1
+
+@pytest.mark.asyncio
+async def test_dispatcher_does_not_retry_forbidden(mocker):
+    """Тест: заблокированный бот не вызывает повторов и не отмечается доставленным"""
+    bot = mocker.Mock()
+    forbidden = TelegramForbiddenError(method=SendMessage(chat_id=1, text="x"), message="blocked")
+    bot.send_message = mocker.AsyncMock(side_effect=forbidden)
+
+    delivered, stats = await ReminderDispatcher(bot).dispatch([(7, 1, "Напоминание")])
+
+    assert delivered == []
+    assert bot.send_message.await_count == 1
+    assert stats.failed == 1
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """Тест: ведро выдает токены не чаще заданной частоты"""
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+@pytest.mark.asyncio
+async def test_dispatcher_does_not_wait_longer_than_max_wait(mocker):
+    """Тест: если чат закрыт RetryAfter дольше max_wait, отправка не ждет, а сообщает о паузе"""
+    bot = mocker.Mock()
+    flood = TelegramRetryAfter(method=SendMessage(chat_id=1, text="x"), message="flood", retry_after=600)
+    bot.send_message = mocker.AsyncMock(side_effect=flood)
+    dispatcher = ReminderDispatcher(bot, max_attempts=3, max_wait=1)
+
+    delivered, stats = await dispatcher.dispatch([(7, 1, "Напоминание")])
+
+    assert delivered == []
+    assert bot.send_message.await_count == 1
+    assert stats.retry_after == 600
+    assert stats.errors['retry_after'] == 2
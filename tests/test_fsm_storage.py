@@ -0,0 +1,123 @@
+import pytest
+import pytest_asyncio
+from datetime import date, datetime, timedelta
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Message, Update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from middlewares.fsm import FSMBatchMiddleware, move_state_reads
+from models.database import Base, FSMState
+from services.fsm_storage import SQLStorage, delete_expired_states, dump_data, load_data
+from handlers.client import BookingStates
+from tools.fake_telegram import FakeTelegramSession
+
+KEY = StorageKey(bot_id=42, chat_id=100, user_id=100)
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """Фабрика сессий к отдельной базе, общей для нескольких хранилищ («процессов»)"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    await engine.dispose()
+
+def test_data_serialization_keeps_dates():
+    """Тест: даты и время в данных сценария переживают сериализацию"""
+    data = {
+        'procedure_id': 3,
+        'appointment_date': date(2026, 11, 2),
+        'appointment_datetime': datetime(2026, 11, 2, 14, 30),
+    }
+    assert load_data(dump_data(data)) == data
+    assert dump_data({}) is None
+    assert load_data(None) == {}
+
+@pytest.mark.asyncio
+async def test_state_is_shared_between_storages(session_factory):
+    """Тест: сценарий, начатый в одном процессе, продолжается в другом"""
+    first = SQLStorage(session_factory)
+    await first.set_state(KEY, BookingStates.selecting_time)
+    await first.update_data(KEY, {'appointment_date': date(2026, 11, 2)})
+
+    second = SQLStorage(session_factory)
+    assert await second.get_state(KEY) == BookingStates.selecting_time.state
+    assert await second.get_data(KEY) == {'appointment_date': date(2026, 11, 2)}
+
+@pytest.mark.asyncio
+async def test_batch_coalesces_writes(session_factory):
+    """Тест: изменения за одно обновление — одно чтение и одна запись"""
+    storage = SQLStorage(session_factory)
+    async with storage.batch():
+        await storage.set_state(KEY, BookingStates.selecting_date)
+        await storage.update_data(KEY, {'procedure_id': 1})
+        await storage.update_data(KEY, {'appointment_date': date(2026, 11, 2)})
+        assert await storage.get_data(KEY) == {'procedure_id': 1, 'appointment_date': date(2026, 11, 2)}
+        assert storage.writes == 0
+
+    assert storage.reads == 1
+    assert storage.writes == 1
+    assert await SQLStorage(session_factory).get_state(KEY) == BookingStates.selecting_date.state
+
+@pytest.mark.asyncio
+async def test_finished_scenario_removes_row(session_factory):
+    """Тест: после state.clear() строка состояния удаляется"""
+    storage = SQLStorage(session_factory)
+    await storage.set_state(KEY, BookingStates.confirming)
+    await storage.set_data(KEY, {'procedure_id': 1})
+    async with storage.batch():
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+
+    async with session_factory() as db:
+        assert await db.get(FSMState, "42:100:100::default") is None
+
+def test_delete_expired_states(db_session):
+    """Тест: удаляются только сценарии, брошенные дольше TTL"""
+    now = datetime.utcnow()
+    db_session.add_all([
+        FSMState(key="1:1:1::default", state="BookingStates:selecting_date", updated_at=now - timedelta(days=2)),
+        FSMState(key="1:2:2::default", state="BookingStates:selecting_date", updated_at=now),
+    ])
+    db_session.commit()
+
+    assert delete_expired_states(db_session, ttl=86400) == 1
+    assert [row.key for row in db_session.query(FSMState)] == ["1:2:2::default"]
+
+@pytest.mark.asyncio
+async def test_dispatcher_flushes_state_once_per_update(session_factory):
+    """Тест: обработчик с несколькими изменениями состояния пишет в базу один раз"""
+    storage = SQLStorage(session_factory)
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message, state: FSMContext):
+        await state.set_state(BookingStates.selecting_date)
+        await state.update_data(procedure_id=1)
+        await state.update_data(appointment_date=date(2026, 11, 2))
+
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(FSMBatchMiddleware(storage))
+    move_state_reads(dp)
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    update = Update.model_validate({
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 1700000000,
+            'chat': {'id': 100, 'type': 'private'},
+            'from': {'id': 100, 'is_bot': False, 'first_name': 'Test'},
+            'text': 'Записаться',
+        }
+    }, context={'bot': bot})
+
+    await dp.feed_update(bot, update)
+
+    assert (storage.reads, storage.writes) == (1, 1)
+    other = SQLStorage(session_factory)
+    assert await other.get_state(KEY) == BookingStates.selecting_date.state
+    assert await other.get_data(KEY) == {'procedure_id': 1, 'appointment_date': date(2026, 11, 2)}
@@ -0,0 +1,25 @@
+from services.availability import availability_cache
+from tools.load_test import percentiles, run
+
+
+def test_percentiles():
+    """Тест: перцентили по отсортированным замерам"""
+    result = percentiles([float(ms) for ms in range(100, 0, -1)])
+    assert (result['p50_ms'], result['p95_ms'], result['p99_ms'], result['max_ms']) == (51, 96, 100, 100)
+    assert percentiles([]) == {'count': 0}
+
+async def test_load_run_books_through_dispatcher(tmp_path):
+    """Тест: клиенты проходят сценарий записи через диспетчер бота, администратор листает список"""
+    try:
+        report = await run(f"sqlite:///{tmp_path / 'load.db'}", users=3, admins=1,
+                           latency=0, think=0.3, ramp=0, appointments=50)
+    finally:
+        availability_cache.clear()
+
+    assert report['errors'] == {}
+    assert report['outcomes']['confirm_sent'] == 3
+    assert report['outcomes']['admin_done'] == 1
+    assert 1 <= report['bookings'] <= 3
+    assert report['latency_ms']['confirm']['count'] == 3
+    assert report['queries'] > 0
+    assert report['api_calls']['EditMessageText'] >= 12
@@ -0,0 +1,140 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Message, Update
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+import metrics
+from metrics import Histogram, callback_prefix, create_metrics_app, instrument_engine
+from middlewares.fsm import FSMBatchMiddleware, move_state_reads
+from middlewares.metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware, UpdateMetricsMiddleware
+from models.database import Base
+from services.fsm_storage import SQLStorage
+from tools.fake_telegram import FakeTelegramSession
+
+
+def series(histogram: Histogram, *labels) -> list:
+    return histogram._series.get(labels)
+
+def test_histogram_renders_cumulative_buckets():
+    """Тест: корзины гистограммы накопительные, +Inf равна числу наблюдений"""
+    histogram = Histogram('test_seconds', "Тест", ('handler',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'start')
+    assert histogram.render() == [
+        "# HELP test_seconds Тест",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{handler="start",le="0.1"} 1',
+        'test_seconds_bucket{handler="start",le="1"} 2',
+        'test_seconds_bucket{handler="start",le="+Inf"} 3',
+        'test_seconds_sum{handler="start"} 5.55',
+        'test_seconds_count{handler="start"} 3',
+    ]
+
+def test_callback_prefix():
+    """Тест: метка нажатия кнопки — префикс callback_data без идентификаторов"""
+    assert callback_prefix("proc_12") == "proc_"
+    assert callback_prefix("remove_inactive_2026-11-02_10:00") == "remove_"
+    assert callback_prefix("confirm") == "confirm"
+
+@pytest.mark.asyncio
+async def test_dispatcher_records_handler_and_queries():
+    """Тест: время обработчика по префиксу кнопки и число запросов к базе за обновление"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    router = Router()
+
+    @router.callback_query(F.data.startswith("metrics_"))
+    async def metrics_test_handler(callback: CallbackQuery):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware('callback_query'))
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    update = Update.model_validate({
+        'update_id': 1,
+        'callback_query': {
+            'id': "1",
+            'from': {'id': 100, 'is_bot': False, 'first_name': 'Test'},
+            'chat_instance': "100",
+            'data': "metrics_42",
+        }
+    }, context={'bot': bot})
+    queries_before = list(series(metrics.update_queries) or [0] * 11)
+
+    try:
+        await dp.feed_update(bot, update)
+    finally:
+        await engine.dispose()
+
+    recorded = series(metrics.handler_duration, 'metrics_test_handler', 'callback_query', 'metrics_')
+    assert recorded[-1] == 1
+    queries = series(metrics.update_queries)
+    assert queries[-1] == queries_before[-1] + 1
+    assert queries[-2] - queries_before[-2] == 2
+
+@pytest.mark.asyncio
+async def test_update_queries_include_state_read():
+    """Тест: чтение состояния FSM попадает в счет запросов обновления"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    instrument_engine(engine)
+    storage = SQLStorage(async_sessionmaker(engine, expire_on_commit=False))
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        pass
+
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(FSMBatchMiddleware(storage))
+    move_state_reads(dp)
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    update = Update.model_validate({
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 1700000000,
+            'chat': {'id': 100, 'type': 'private'},
+            'from': {'id': 100, 'is_bot': False, 'first_name': 'Test'},
+            'text': 'Записаться',
+        }
+    }, context={'bot': bot})
+    queries_before = list(series(metrics.update_queries) or [0] * 11)
+
+    try:
+        await dp.feed_update(bot, update)
+    finally:
+        await engine.dispose()
+
+    assert storage.reads == 1
+    assert series(metrics.update_queries)[-2] - queries_before[-2] == 1
+
+@pytest.mark.asyncio
+async def test_telegram_requests_and_endpoint():
+    """Тест: время запросов к Bot API попадает в ответ /metrics"""
+    session = FakeTelegramSession()
+    session.middleware(TelegramMetricsMiddleware())
+    bot = Bot(token="42:TEST", session=session)
+    await bot.send_message(chat_id=100, text="Тест")
+    assert series(metrics.telegram_request_duration, 'SendMessage', 'ok')[-1] >= 1
+
+    client = TestClient(TestServer(create_metrics_app()))
+    await client.start_server()
+    try:
+        response = await client.get("/metrics")
+        body = await response.text()
+    finally:
+        await client.close()
+    assert response.status == 200
+    assert response.content_type == 'text/plain'
+    assert 'bot_telegram_request_duration_seconds_count{method="SendMessage",result="ok"}' in body
+    assert "# TYPE bot_update_db_queries histogram" in body
@@ -0,0 +1,101 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from aiogram.types import CallbackQuery, User
+from middlewares.database import DbSessionMiddleware
+from middlewares.throttling import ThrottlingMiddleware, ThrottlingStats
+from models.database import async_engine, pool_stats
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def dispose_async_engine():
+    """Соединения aiosqlite привязаны к циклу событий теста — закрываем их после теста"""
+    yield
+    await async_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_db_session_middleware_injects_and_releases_session():
+    """Тест: сессия передается обработчику и соединение возвращается в пул"""
+    middleware = DbSessionMiddleware()
+    checkouts = pool_stats.checkouts
+    sessions = []
+
+    async def handler(event, data):
+        sessions.append(data['db'])
+        return (await data['db'].execute(text("SELECT 1"))).scalar()
+
+    assert await middleware(handler, object(), {}) == 1
+    assert isinstance(sessions[0], AsyncSession)
+    assert pool_stats.checkouts == checkouts + 1
+    assert pool_stats.checked_out == 0
+    assert pool_stats.snapshot()['max_wait_ms'] >= 0
+
+@pytest.mark.asyncio
+async def test_db_session_middleware_rolls_back_on_error():
+    """Тест: при ошибке в обработчике сессия откатывается и закрывается"""
+    middleware = DbSessionMiddleware()
+
+    async def handler(event, data):
+        await data['db'].execute(text("SELECT 1"))
+        raise RuntimeError("ошибка обработчика")
+
+    with pytest.raises(RuntimeError):
+        await middleware(handler, object(), {})
+    assert pool_stats.checked_out == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_callback(mocker, data: str):
+    callback = mocker.Mock(spec=CallbackQuery)
+    callback.data = data
+    callback.answer = mocker.AsyncMock()
+    return callback
+
+@pytest.mark.asyncio
+async def test_throttling_drops_duplicate_callbacks(mocker):
+    """Тест: повторное нажатие той же кнопки не доходит до обработчика, но получает ответ"""
+    clock = FakeClock()
+    stats = ThrottlingStats()
+    middleware = ThrottlingMiddleware(rate=10, burst=10, window=2, stats=stats, clock=clock)
+    handler = mocker.AsyncMock(return_value="ok")
+    user = User(id=1, is_bot=False, first_name="Test")
+
+    first = make_callback(mocker, "confirm")
+    assert await middleware(handler, first, {'event_from_user': user}) == "ok"
+    second = make_callback(mocker, "confirm")
+    assert await middleware(handler, second, {'event_from_user': user}) is None
+    # Другая кнопка и то же нажатие после окна обрабатываются
+    await middleware(handler, make_callback(mocker, "date_2026-11-02"), {'event_from_user': user})
+    clock.now += 2
+    await middleware(handler, make_callback(mocker, "confirm"), {'event_from_user': user})
+
+    assert handler.await_count == 3
+    first.answer.assert_not_awaited()
+    second.answer.assert_awaited_once()
+    assert stats.snapshot() == {'passed': 3, 'throttled': 0, 'duplicates': 1}
+
+@pytest.mark.asyncio
+async def test_throttling_limits_rate_per_user(mocker):
+    """Тест: сверх запаса события пользователя отбрасываются, другие пользователи не страдают"""
+    clock = FakeClock()
+    stats = ThrottlingStats()
+    middleware = ThrottlingMiddleware(rate=1, burst=3, window=2, stats=stats, clock=clock)
+    handler = mocker.AsyncMock()
+    impatient = User(id=1, is_bot=False, first_name="Test")
+    other = User(id=2, is_bot=False, first_name="Other")
+
+    for _ in range(5):
+        await middleware(handler, object(), {'event_from_user': impatient})
+    await middleware(handler, object(), {'event_from_user': other})
+    clock.now += 1
+    await middleware(handler, object(), {'event_from_user': impatient})
+
+    assert handler.await_count == 5
+    assert stats.snapshot() == {'passed': 5, 'throttled': 2, 'duplicates': 0}
@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from models.database import run_migrations, Client, Procedure
+from services.booking import get_days_availability, create_appointment, cancel_appointment
+from services.repository import (
+    get_client_appointments, get_client_by_username,
+    get_upcoming_appointments, get_upcoming_appointment_times
+)
+
+
+@pytest.fixture
+def migrated_session(tmp_path):
+    """Сессия к файловой базе данных, созданной миграциями"""
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    run_migrations(url)
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+def capture_statements(session, action):
+    """Выполнение action с записью всех SELECT/DELETE-запросов и их параметров"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE")):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+def query_plan(session, statement, parameters) -> str:
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+def test_migrations_are_idempotent(tmp_path):
+    """Тест: повторный запуск миграций ничего не ломает"""
+    url = f"sqlite:///{tmp_path / 'twice.db'}"
+    run_migrations(url)
+    run_migrations(url)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == "0009"
+    engine.dispose()
+
+@pytest.mark.parametrize("name, call", [
+    ("availability", lambda db, client: get_days_availability(db, datetime.now().date(), 14)),
+    ("client_appointments", lambda db, client: get_client_appointments(db, client.id)),
+    ("client_by_username", lambda db, client: get_client_by_username(db, "explain_user")),
+    ("upcoming_appointments", lambda db, client: get_upcoming_appointments(db)),
+    ("reminder_restore", lambda db, client: get_upcoming_appointment_times(db)),
+])
+def test_hot_queries_use_indexes(migrated_session, name, call):
+    """Тест: частые запросы не сканируют таблицы целиком"""
+    db = migrated_session
+    client = Client(telegram_id=1, username="explain_user", name="Клиент")
+    procedure = Procedure(name="Процедура", duration=1.0)
+    db.add_all([client, procedure])
+    db.commit()
+    start = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    for hour in range(9, 19):
+        create_appointment(db, client.id, procedure.id, start + timedelta(hours=hour))
+
+    statements = capture_statements(db, lambda: call(db, client))
+    assert statements
+    for statement, parameters in statements:
+        plan = query_plan(db, statement, parameters)
+        assert "SCAN" not in plan, f"{name}: запрос не использует индекс\n{statement}\n{plan}"
+
+def test_release_slots_uses_index(migrated_session):
+    """Тест: освобождение времени при отмене ищет отрезки по индексу"""
+    db = migrated_session
+    client = Client(telegram_id=2, username="release_user", name="Клиент")
+    procedure = Procedure(name="Процедура", duration=1.0)
+    db.add_all([client, procedure])
+    db.commit()
+    appointment = create_appointment(
+        db, client.id, procedure.id,
+        datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()) + timedelta(hours=10)
+    )
+
+    statements = capture_statements(db, lambda: cancel_appointment(db, appointment.id))
+    deletes = [(s, p) for s, p in statements if s.lstrip().upper().startswith("DELETE")]
+    assert deletes
+    for statement, parameters in deletes:
+        assert "SCAN" not in query_plan(db, statement, parameters)
@@ -0,0 +1,141 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from models.database import OutboxMessage
+from services import outbox
+from scheduler.outbox import OutboxWorker, OutboxStats
+from tools.fake_telegram import FakeTelegramSession
+
+
+def test_enqueue_is_idempotent(db_session):
+    """Тест: сообщение с тем же ключом не ставится повторно"""
+    assert outbox.enqueue(db_session, 1, "Первое", dedup_key="key") is True
+    assert outbox.enqueue(db_session, 1, "Повтор", dedup_key="key") is False
+    db_session.commit()
+    assert db_session.query(OutboxMessage).count() == 1
+
+def test_claim_orders_by_priority(db_session):
+    """Тест: ответы клиентам забираются раньше уведомлений и напоминаний"""
+    outbox.enqueue(db_session, 1, "Напоминание", outbox.PRIORITY_REMINDER)
+    outbox.enqueue(db_session, 2, "Администратору", outbox.PRIORITY_ADMIN)
+    outbox.enqueue(db_session, 3, "Клиенту", outbox.PRIORITY_REPLY)
+    db_session.commit()
+
+    claimed = outbox.claim(db_session, 2, lease=60)
+    assert [message.text for message in claimed] == ["Клиенту", "Администратору"]
+    assert all(message.status == 'sending' and message.attempts == 1 for message in claimed)
+    assert [message.text for message in outbox.claim(db_session, 2, lease=60)] == ["Напоминание"]
+    assert outbox.claim(db_session, 2, lease=60) == []
+
+def test_failed_delivery_backs_off_then_gives_up(db_session):
+    """Тест: неудачная доставка откладывается, после max_attempts сообщение помечается failed"""
+    outbox.enqueue(db_session, 1, "Текст")
+    db_session.commit()
+
+    message = outbox.claim(db_session, 1, lease=60)[0]
+    assert outbox.mark_failed(
+        db_session, message.id, message.locked_until, "retry_after", max_attempts=2, backoff=60
+    ) == 'pending'
+    assert outbox.claim(db_session, 1, lease=60) == []
+
+    db_session.query(OutboxMessage).update({OutboxMessage.available_at: datetime.utcnow()})
+    db_session.commit()
+    message = outbox.claim(db_session, 1, lease=60)[0]
+    assert outbox.mark_failed(
+        db_session, message.id, message.locked_until, "retry_after", max_attempts=2, backoff=60
+    ) == 'failed'
+    assert outbox.backlog(db_session)['failed'] == 1
+
+def test_expired_lease_returns_message_and_blocks_stale_ack(db_session):
+    """Тест: просроченный захват возвращает сообщение в очередь, старый воркер его не отметит"""
+    outbox.enqueue(db_session, 1, "Текст")
+    db_session.commit()
+    message = outbox.claim(db_session, 1, lease=-1)[0]
+
+    assert outbox.release_expired(db_session) == 1
+    again = outbox.claim(db_session, 1, lease=60)[0]
+    assert again.id == message.id and again.attempts == 2
+
+    # Старый воркер не может ни отметить отправку, ни вернуть сообщение в очередь
+    assert outbox.mark_sent(db_session, message.id, message.locked_until) is False
+    assert outbox.mark_failed(
+        db_session, message.id, message.locked_until, "timeout", max_attempts=5, backoff=60
+    ) == 'sending'
+    row = db_session.get(OutboxMessage, message.id, populate_existing=True)
+    assert (row.status, row.attempts, row.last_error) == ('sending', 2, None)
+
+    assert outbox.mark_sent(db_session, again.id, again.locked_until) is True
+
+@pytest.mark.asyncio
+async def test_worker_delivers_queue(async_db, mocker):
+    """Тест: воркеры доставляют очередь через Bot API и считают задержку доставки"""
+    @asynccontextmanager
+    async def session_scope():
+        yield async_db
+        await async_db.commit()
+
+    mocker.patch('scheduler.outbox.session_scope', session_scope)
+    for i in range(20):
+        await async_db.run_sync(outbox.enqueue, 1000 + i, f"Сообщение {i}", i % 3)
+    await async_db.commit()
+
+    session = FakeTelegramSession(global_rate=1000)
+    stats = OutboxStats()
+    worker = OutboxWorker(Bot(token="42:TEST", session=session), workers=4, poll_interval=0.05, stats=stats)
+    worker.start()
+    for _ in range(100):
+        if stats.sent == 20:
+            break
+        await asyncio.sleep(0.05)
+    await worker.stop()
+
+    assert stats.sent == 20
+    assert len(session.sent) == 20
+    assert (await async_db.run_sync(outbox.backlog))['pending'] == 0
+    assert stats.snapshot()['max_lag_ms'] >= 0
+
+@pytest.mark.asyncio
+async def test_worker_sends_once_per_attempt(async_db, mocker):
+    """Тест: попытка из очереди — одна отправка; недоставляемое сообщение сразу failed, RetryAfter откладывает повтор"""
+    @asynccontextmanager
+    async def session_scope():
+        yield async_db
+        await async_db.commit()
+
+    mocker.patch('scheduler.outbox.session_scope', session_scope)
+    method = SendMessage(chat_id=1, text="x")
+    errors = {
+        1: TelegramForbiddenError(method=method, message="blocked"),
+        2: TelegramRetryAfter(method=method, message="flood", retry_after=600),
+        3: TelegramNetworkError(method=method, message="timeout"),
+    }
+
+    async def send_message(chat_id, text):
+        raise errors[chat_id]
+
+    bot = mocker.Mock()
+    bot.send_message = mocker.AsyncMock(side_effect=send_message)
+    for chat_id in errors:
+        await async_db.run_sync(outbox.enqueue, chat_id, "Текст")
+    await async_db.commit()
+
+    stats = OutboxStats()
+    worker = OutboxWorker(bot, workers=1, poll_interval=0.05, lease=60, backoff=60, stats=stats)
+    worker.start()
+    for _ in range(100):
+        if stats.failed + stats.retried == 3:
+            break
+        await asyncio.sleep(0.05)
+    await worker.stop()
+
+    assert bot.send_message.await_count == 3
+    rows = {row.chat_id: row for row in await async_db.run_sync(lambda db: db.query(OutboxMessage).all())}
+    assert (rows[1].status, rows[1].attempts) == ('failed', 1)
+    assert (rows[2].status, rows[3].status) == ('pending', 'pending')
+    # Повтор не раньше, чем разрешил Telegram, а не через backoff
+    assert rows[2].available_at > datetime.utcnow() + timedelta(seconds=500)
+    assert rows[3].available_at < datetime.utcnow() + timedelta(seconds=100)
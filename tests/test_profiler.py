@@ -0,0 +1,138 @@
+import logging
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from middlewares.fsm import FSMBatchMiddleware, move_state_reads
+from middlewares.profiler import HandlerProfilerMiddleware, UpdateProfilerMiddleware
+from models.database import Base
+from services.fsm_storage import SQLStorage
+from profiler import SQLProfiler, normalize, profile_scope
+from tools.fake_telegram import FakeTelegramSession
+
+
+@pytest.fixture
+def profiled_engine():
+    engine = create_engine("sqlite://")
+    profiler = SQLProfiler(slow_ms=1000, repeat=3, top=5)
+    profiler.attach(engine)
+    yield engine, profiler
+    profiler.detach(engine)
+    engine.dispose()
+
+def test_normalize_hides_values():
+    """Тест: запросы с разными значениями и длиной списков сводятся к одному тексту"""
+    assert normalize("SELECT * FROM appointments\n WHERE id IN (?, ?, ?) AND status = 'scheduled'") == \
+        "SELECT * FROM appointments WHERE id IN (?...) AND status = ?"
+    assert normalize("INSERT INTO slot_claims (date, unit) VALUES (?, ?), (?, ?), (?, ?)") == \
+        normalize("INSERT INTO slot_claims (date, unit) VALUES (%(date_m0)s, %(unit_m0)s)")
+    assert normalize("SELECT anon_1.id FROM t LIMIT 10 OFFSET $1") == "SELECT anon_1.id FROM t LIMIT ? OFFSET ?"
+
+def test_repeated_statement_flagged_once_per_update(profiled_engine, caplog):
+    """Тест: запрос, повторенный за обновление порог раз, помечается как возможный N+1"""
+    engine, profiler = profiled_engine
+    with caplog.at_level(logging.WARNING, logger='profiler'):
+        with engine.connect() as conn:
+            with profile_scope("show_appointments"):
+                for i in range(5):
+                    conn.execute(text("SELECT :value"), {'value': i})
+            # Вне обновления повторы не считаются
+            for i in range(5):
+                conn.execute(text("SELECT :value"), {'value': i})
+
+    [row] = profiler.top()
+    assert row['count'] == 10
+    assert row['repeated'] == 1
+    assert row['handlers'] == {"show_appointments": 5, "-": 5}
+    assert sum("возможен N+1" in record.message for record in caplog.records) == 1
+
+def test_slow_statements_and_report(profiled_engine, caplog):
+    """Тест: запросы дольше порога попадают в лог, отчет упорядочен по суммарному времени"""
+    engine, profiler = profiled_engine
+    profiler.slow_ms = 0
+    with caplog.at_level(logging.WARNING, logger='profiler'):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            for _ in range(3):
+                conn.execute(text("SELECT 2 + 2"))
+
+    assert sorted(row['count'] for row in profiler.top()) == [1, 3]
+    assert all(row['slow'] == row['count'] for row in profiler.top())
+    assert sum("Медленный запрос" in record.message for record in caplog.records) == 4
+    totals = [row['total_ms'] for row in profiler.top()]
+    assert totals == sorted(totals, reverse=True)
+    assert "SELECT ? + ?" in profiler.report()
+
+@pytest.mark.asyncio
+async def test_statements_attributed_to_handler(profiled_engine):
+    """Тест: запросы обработчика приписываются ему, а не обновлению"""
+    engine, profiler = profiled_engine
+    router = Router()
+
+    @router.message()
+    async def list_appointments(message: Message):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 'handler'"))
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(UpdateProfilerMiddleware())
+    dp.message.middleware(HandlerProfilerMiddleware())
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    update = Update.model_validate({
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 1700000000,
+            'chat': {'id': 100, 'type': 'private'},
+            'from': {'id': 100, 'is_bot': False, 'first_name': 'Test'},
+            'text': "Записи",
+        }
+    }, context={'bot': bot})
+
+    await dp.feed_update(bot, update)
+
+    assert profiler.top()[0]['handlers'] == {"list_appointments": 1}
+
+@pytest.mark.asyncio
+async def test_state_read_attributed_to_update():
+    """Тест: чтение состояния FSM приписывается обновлению"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    profiler = SQLProfiler(slow_ms=1000, repeat=3, top=5)
+    profiler.attach(engine)
+    storage = SQLStorage(async_sessionmaker(engine, expire_on_commit=False))
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        pass
+
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateProfilerMiddleware())
+    dp.update.outer_middleware(FSMBatchMiddleware(storage))
+    move_state_reads(dp)
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    update = Update.model_validate({
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 1700000000,
+            'chat': {'id': 100, 'type': 'private'},
+            'from': {'id': 100, 'is_bot': False, 'first_name': 'Test'},
+            'text': "Записи",
+        }
+    }, context={'bot': bot})
+
+    try:
+        await dp.feed_update(bot, update)
+    finally:
+        profiler.detach(engine)
+        await engine.dispose()
+
+    [state_read] = [row for row in profiler.top() if "fsm_states" in row['sql']]
+    assert state_read['handlers'] == {"update:message": 1}
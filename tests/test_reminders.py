@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from config import TIMEZONE, REMINDER_BEFORE_DAY, REMINDER_DAY_OF
+from services.booking import create_appointment, mark_reminders_sent
+from tenancy import DEFAULT_TENANT
+from services.reminders import (
+    reminder_times, reminder_job_id, schedule_reminders, cancel_reminders, restore_reminders
+)
+
+
+def make_scheduler(url):
+    scheduler = BackgroundScheduler(
+        jobstores={'default': SQLAlchemyJobStore(url=url)}, timezone=TIMEZONE
+    )
+    scheduler.start(paused=True)
+    return scheduler
+
+def future_appointment_date(hour=15):
+    return datetime.combine(datetime.now().date() + timedelta(days=3), datetime.min.time()) + timedelta(hours=hour)
+
+def test_reminder_times_use_config_and_timezone():
+    """Тест: напоминания накануне и в день процедуры в часовом поясе TIMEZONE"""
+    zone = ZoneInfo(TIMEZONE)
+    appointment_date = datetime(2030, 5, 10, 15, 0)
+    times = reminder_times(appointment_date, now=datetime(2030, 5, 1, tzinfo=zone))
+
+    assert times['day_before'] == datetime.combine(
+        datetime(2030, 5, 9).date(), datetime.strptime(REMINDER_BEFORE_DAY, "%H:%M").time(), tzinfo=zone
+    )
+    assert times['day_of'] == datetime.combine(
+        datetime(2030, 5, 10).date(), datetime.strptime(REMINDER_DAY_OF, "%H:%M").time(), tzinfo=zone
+    )
+
+def test_reminder_times_skip_past_and_late():
+    """Тест: прошедшие напоминания и напоминания позже начала процедуры не ставятся"""
+    zone = ZoneInfo(TIMEZONE)
+    appointment_date = datetime(2030, 5, 10, 7, 0)
+    times = reminder_times(appointment_date, now=datetime(2030, 5, 9, 23, 0, tzinfo=zone))
+    assert times == {}
+
+def test_jobs_survive_restart_and_are_removed(tmp_path):
+    """Тест: задачи хранятся в базе данных и снимаются при отмене записи"""
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    scheduler = make_scheduler(url)
+    job_ids = schedule_reminders(42, future_appointment_date(), scheduler=scheduler)
+    assert job_ids == [reminder_job_id(42, 'day_before'), reminder_job_id(42, 'day_of')]
+    scheduler.shutdown()
+
+    restarted = make_scheduler(url)
+    try:
+        jobs = {job.id: job for job in restarted.get_jobs()}
+        assert set(jobs) == set(job_ids)
+        assert jobs[reminder_job_id(42, 'day_of')].args == (42, 'day_of', DEFAULT_TENANT)
+
+        cancel_reminders(42, scheduler=restarted)
+        cancel_reminders(42, scheduler=restarted)
+        assert restarted.get_jobs() == []
+    finally:
+        restarted.shutdown()
+
+def test_restore_adds_only_missing_jobs(tmp_path):
+    """Тест: восстановление досоздает только отсутствующие задачи"""
+    scheduler = make_scheduler(f"sqlite:///{tmp_path / 'jobs.db'}")
+    try:
+        schedule_reminders(1, future_appointment_date(), scheduler=scheduler)
+        added = restore_reminders(
+            [(1, future_appointment_date()), (2, future_appointment_date(16))], scheduler=scheduler
+        )
+        assert added == 2
+        assert len(scheduler.get_jobs()) == 4
+    finally:
+        scheduler.shutdown()
+
+def test_mark_reminders_sent_per_kind(db_session, test_client, test_procedure):
+    """Тест: отметка ставится только для отправленного вида напоминания"""
+    appointment = create_appointment(
+        db_session, test_client.id, test_procedure.id, future_appointment_date()
+    )
+    mark_reminders_sent(db_session, [appointment.id], 'day_before')
+    db_session.refresh(appointment)
+    assert appointment.day_before_reminder_sent is True
+    assert not appointment.day_of_reminder_sent
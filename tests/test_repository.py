@@ -0,0 +1,130 @@
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from models.database import Client
+from services.booking import create_appointment
+from services.repository import (
+    get_appointment, get_client_appointments,
+    get_upcoming_appointments, get_upcoming_appointment_times,
+    get_appointments_page
+)
+
+
+@contextmanager
+def count_queries(session):
+    """Подсчет SQL-запросов, выполненных внутри блока"""
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def create_appointments(db_session, procedure, count):
+    """Создание записей разных клиентов на завтра, возвращает их ID"""
+    tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    appointment_ids = []
+    for i in range(count):
+        client = Client(telegram_id=1000 + i, username=f"user_{i}", name=f"Клиент {i}")
+        db_session.add(client)
+        db_session.commit()
+        appointment = create_appointment(
+            db_session, client.id, procedure.id, tomorrow + timedelta(hours=i)
+        )
+        appointment_ids.append(appointment.id)
+    db_session.expunge_all()
+    return appointment_ids
+
+def render(appointments) -> list:
+    """Обращение ко всем полям, которые показывают экраны списков"""
+    return [
+        (app.id, app.date, app.client.name, app.client.username, app.procedure.name)
+        for app in appointments
+    ]
+
+@pytest.mark.parametrize("count", [2, 10])
+def test_upcoming_appointments_single_query(db_session, test_procedure, count):
+    """Тест: список записей администратора — один запрос при любом числе записей"""
+    create_appointments(db_session, test_procedure, count)
+    with count_queries(db_session) as queries:
+        rows = render(get_upcoming_appointments(db_session))
+    assert len(rows) == count
+    assert len(queries) == 1
+
+def test_upcoming_appointment_times_single_query(db_session, test_procedure):
+    """Тест: выборка для восстановления напоминаний — один запрос без загрузки объектов"""
+    appointment_ids = create_appointments(db_session, test_procedure, 3)
+    with count_queries(db_session) as queries:
+        rows = get_upcoming_appointment_times(db_session)
+    assert sorted(appointment_id for appointment_id, _ in rows) == sorted(appointment_ids)
+    assert len(queries) == 1
+
+def test_client_appointments_single_query(db_session, test_client, test_procedure):
+    """Тест: «Мои записи» — один запрос"""
+    tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    for hour in (9, 11, 13):
+        create_appointment(db_session, test_client.id, test_procedure.id, tomorrow + timedelta(hours=hour))
+    client_id = test_client.id
+    db_session.expunge_all()
+    with count_queries(db_session) as queries:
+        appointments = get_client_appointments(db_session, client_id)
+        names = [app.procedure.name for app in appointments]
+    assert len(names) == 3
+    assert len(queries) == 1
+
+def test_get_appointment_single_query(db_session, test_procedure):
+    """Тест: запись вместе с клиентом и процедурой — один запрос"""
+    appointment_id = create_appointments(db_session, test_procedure, 1)[0]
+    with count_queries(db_session) as queries:
+        render([get_appointment(db_session, appointment_id)])
+    assert len(queries) == 1
+
+def test_appointments_keyset_pages(db_session, test_procedure):
+    """Тест: постраничный список по (date, id) вперед, назад и с текущей страницы"""
+    appointment_ids = create_appointments(db_session, test_procedure, 12)
+    today = datetime.now().date()
+
+    page, has_prev, has_next = get_appointments_page(db_session, today, limit=5)
+    assert [app.id for app in page] == appointment_ids[:5]
+    assert (has_prev, has_next) == (False, True)
+
+    cursor = (page[-1].date, page[-1].id)
+    with count_queries(db_session) as queries:
+        page, has_prev, has_next = get_appointments_page(db_session, today, cursor=cursor, limit=5)
+        render(page)
+    assert [app.id for app in page] == appointment_ids[5:10]
+    assert (has_prev, has_next) == (True, True)
+    assert len(queries) == 2
+
+    last, has_prev, has_next = get_appointments_page(
+        db_session, today, cursor=(page[-1].date, page[-1].id), limit=5
+    )
+    assert [app.id for app in last] == appointment_ids[10:]
+    assert (has_prev, has_next) == (True, False)
+
+    back, has_prev, has_next = get_appointments_page(
+        db_session, today, cursor=(last[0].date, last[0].id), direction='prev', limit=5
+    )
+    assert [app.id for app in back] == appointment_ids[5:10]
+    assert (has_prev, has_next) == (True, True)
+
+    same, _, _ = get_appointments_page(
+        db_session, today, cursor=(page[0].date, page[0].id), direction='at', limit=5
+    )
+    assert [app.id for app in same] == appointment_ids[5:10]
+
+def test_appointments_page_date_range(db_session, test_procedure):
+    """Тест: фильтр по периоду включает последний день периода"""
+    create_appointments(db_session, test_procedure, 3)
+    tomorrow = datetime.now().date() + timedelta(days=1)
+
+    page, _, _ = get_appointments_page(db_session, tomorrow, tomorrow)
+    assert len(page) == 3
+    page, _, _ = get_appointments_page(db_session, tomorrow + timedelta(days=1))
+    assert page == []
@@ -0,0 +1,131 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from models.database import Procedure, ProcedureResource, SlotClaim
+from services.availability import DayAvailability, DayGrid, blocked_starts, interval_mask, minutes_to_time
+from services.booking import (
+    create_appointment, cancel_appointment, format_new_appointment_notice, get_available_slots
+)
+from services.resources import SHARED_CALENDAR, add_resource, set_resource_active, set_resource_procedures
+from tenancy import tenant_scope
+
+
+def at(day, time: str) -> datetime:
+    return datetime.combine(day, datetime.strptime(time, "%H:%M").time())
+
+def test_blocked_starts_matches_naive_check():
+    """Тест: растянутая маска совпадает с проверкой каждого начала"""
+    rng = random.Random(7)
+    for _ in range(50):
+        busy = 0
+        for _ in range(rng.randint(0, 4)):
+            busy |= interval_mask(rng.randrange(200), rng.randint(1, 40))
+        length = rng.randint(1, 90)
+        expected = sum(1 << s for s in range(240) if busy & interval_mask(s, length))
+        assert blocked_starts(busy, length) & interval_mask(0, 240) == expected
+
+def test_free_starts_unions_resource_calendars():
+    """Тест: время свободно, если свободен хотя бы один из допущенных ресурсов"""
+    grid = DayGrid([(9 * 60, 13 * 60)], 60)
+    day = DayAvailability(date(2026, 11, 2))
+    day.occupy(9 * 60, 120, resource=1)
+    day.occupy(10 * 60, 60, resource=2)
+    day.occupy(12 * 60, 60)  # закрыто для всех
+
+    def starts(resource_ids):
+        return [minutes_to_time(m) for m in day.free_starts(60, grid, resource_ids)]
+
+    assert starts((1,)) == ["11:00"]
+    assert starts((2,)) == ["09:00", "11:00"]
+    assert starts((1, 2)) == ["09:00", "11:00"]
+    assert starts(()) == []
+    # Без ресурсов студия — один календарь
+    assert starts(None) == ["11:00"]
+    assert day.free_resources(9 * 60, 60, (1, 2)) == [2]
+    assert day.load(1) == 120
+
+def test_same_time_booked_at_two_specialists(db_session, test_client, test_procedure):
+    """Тест: одно время занимается у каждого специалиста, потом становится недоступным"""
+    anna = add_resource(db_session, "Анна")
+    olga = add_resource(db_session, "Ольга")
+    day = datetime.now().date() + timedelta(days=2)
+
+    first = create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:00"))
+    assert "10:00" in get_available_slots(day, 1.0, db=db_session, procedure_id=test_procedure.id)
+    second = create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:00"))
+
+    assert {first.resource_id, second.resource_id} == {anna.id, olga.id}
+    assert "10:00" not in get_available_slots(day, 1.0, db=db_session, procedure_id=test_procedure.id)
+    with pytest.raises(ValueError):
+        create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:30"))
+    assert "Специалист: " in format_new_appointment_notice(first)
+
+def test_booking_goes_to_least_loaded_specialist(db_session, test_client, test_procedure):
+    """Тест: без выбора специалиста запись достается наименее загруженному за день"""
+    anna = add_resource(db_session, "Анна")
+    olga = add_resource(db_session, "Ольга")
+    day = datetime.now().date() + timedelta(days=2)
+
+    create_appointment(db_session, test_client.id, test_procedure.id, at(day, "09:00"), anna.id)
+    create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:00"), anna.id)
+    routed = create_appointment(db_session, test_client.id, test_procedure.id, at(day, "12:00"))
+    assert routed.resource_id == olga.id
+    claims = db_session.query(SlotClaim.resource_id).filter(SlotClaim.appointment_id == routed.id)
+    assert {resource_id for resource_id, in claims} == {olga.id}
+
+    # Выключенный специалист не получает новых записей
+    set_resource_active(db_session, olga.id, False)
+    assert create_appointment(
+        db_session, test_client.id, test_procedure.id, at(day, "14:00")
+    ).resource_id == anna.id
+
+def test_procedure_limited_to_its_specialists(db_session, test_client, test_procedure):
+    """Тест: процедура предлагается только во время ее специалистов"""
+    other = Procedure(name="Другая процедура", duration=1.0)
+    db_session.add(other)
+    db_session.commit()
+    anna = add_resource(db_session, "Анна")
+    olga = add_resource(db_session, "Ольга")
+    set_resource_procedures(db_session, olga.id, [other.id])
+    set_resource_procedures(db_session, anna.id, [test_procedure.id])
+    day = datetime.now().date() + timedelta(days=2)
+
+    create_appointment(db_session, test_client.id, test_procedure.id, at(day, "11:00"))
+    assert "11:00" not in get_available_slots(day, 1.0, db=db_session, procedure_id=test_procedure.id)
+    assert "11:00" in get_available_slots(day, 1.0, db=db_session, procedure_id=other.id)
+    booked = create_appointment(db_session, test_client.id, other.id, at(day, "11:00"))
+    assert booked.resource_id == olga.id
+
+    # Процедуру некому делать — свободного времени нет
+    set_resource_active(db_session, olga.id, False)
+    assert get_available_slots(day, 1.0, db=db_session, procedure_id=other.id) == []
+
+def test_shared_calendar_without_resources(db_session, test_client, test_procedure):
+    """Тест: пока ресурсы не заведены, записи ведутся в одном общем календаре"""
+    day = datetime.now().date() + timedelta(days=2)
+    appointment = create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:00"))
+    assert appointment.resource_id is None
+    assert {
+        resource_id for resource_id, in
+        db_session.query(SlotClaim.resource_id).filter(SlotClaim.appointment_id == appointment.id)
+    } == {SHARED_CALENDAR}
+    with pytest.raises(ValueError):
+        create_appointment(db_session, test_client.id, test_procedure.id, at(day, "10:00"))
+    cancel_appointment(db_session, appointment.id)
+    assert "10:00" in get_available_slots(day, 1.0, db=db_session, procedure_id=test_procedure.id)
+
+def test_resource_procedures_must_exist(db_session, test_procedure):
+    """Тест: ресурсу можно назначить только существующие процедуры своей студии"""
+    anna = add_resource(db_session, "Анна")
+    with tenant_scope(2):
+        foreign = Procedure(name="Процедура другой студии", duration=1.0)
+        db_session.add(foreign)
+        db_session.commit()
+    for procedure_ids in ([test_procedure.id, 999999], [foreign.id]):
+        with pytest.raises(ValueError):
+            set_resource_procedures(db_session, anna.id, procedure_ids)
+    assert db_session.query(ProcedureResource).count() == 0
+    assert set_resource_procedures(db_session, anna.id, [test_procedure.id, test_procedure.id]) is True
+    assert [row.procedure_id for row in db_session.query(ProcedureResource)] == [test_procedure.id]
+    with tenant_scope(2):
+        assert db_session.query(ProcedureResource).count() == 0
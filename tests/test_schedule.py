@@ -0,0 +1,87 @@
+import pytest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy.orm import Query
+from services.availability import DayGrid, DayAvailability, minutes_to_time
+from services.booking import get_available_slots, get_available_dates
+from services.schedule import (
+    ScheduleRules, parse_hours, format_hours, set_working_hours,
+    set_exception, remove_exception, get_weekly_hours, seed_working_hours
+)
+from config import WORK_DAYS, WORK_START, WORK_END
+
+
+def next_weekday(weekday: int, after: int = 1) -> date:
+    """Ближайший день недели weekday не раньше чем через after дней"""
+    start = datetime.now().date() + timedelta(days=after)
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+def test_parse_hours():
+    """Тест разбора часов работы из команды администратора"""
+    assert parse_hours("09:00-13:00, 14:30-20:00") == [("09:00", "13:00"), ("14:30", "20:00")]
+    assert parse_hours("Выходной") == []
+    assert format_hours([("09:00", "13:00")]) == "09:00-13:00"
+    for wrong in ("", "09:00", "13:00-09:00", "09:00-25:00"):
+        with pytest.raises(ValueError):
+            parse_hours(wrong)
+
+def test_grid_with_break_and_sub_hour_step():
+    """Тест: процедура не пересекает перерыв, начала идут с шагом меньше часа"""
+    grid = DayGrid([(9 * 60, 13 * 60), (14 * 60, 16 * 60)], 30)
+    starts = [minutes_to_time(m) for m in DayAvailability(date(2026, 11, 2)).free_starts(90, grid)]
+    assert starts == ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30", "14:00", "14:30"]
+
+def test_rules_exception_overrides_week():
+    """Тест: исключение на дату заменяет недельное правило"""
+    monday = date(2026, 11, 2)
+    rules = ScheduleRules(
+        weekly={0: [(9 * 60, 18 * 60)], 5: []},
+        exceptions={monday: [(10 * 60, 12 * 60)], monday + timedelta(days=1): []}
+    )
+    assert rules.hours(monday) == [(600, 720)]
+    assert rules.hours(monday + timedelta(days=1)) == []
+    assert rules.hours(monday + timedelta(days=5)) == []
+    assert rules.hours(monday + timedelta(days=7)) == [(540, 1080)]
+
+def test_weekly_hours_change_availability(db_session):
+    """Тест: изменение недельного расписания сразу меняет свободное время"""
+    seed_working_hours(db_session)
+    monday = next_weekday(0)
+    assert get_available_slots(monday, db=db_session)[0] == "09:00"
+
+    set_working_hours(db_session, 0, [("12:00", "15:00")])
+    assert get_available_slots(monday, db=db_session) == ["12:00", "13:00", "14:00"]
+
+    set_working_hours(db_session, 0, [])
+    assert get_available_slots(monday, db=db_session) == []
+    assert get_weekly_hours(db_session)[0] == []
+
+def test_concurrent_seed_does_not_repeat_hours(db_session):
+    """Тест: второй процесс, не увидевший расписание первого, не повторяет рабочие часы"""
+    assert seed_working_hours(db_session) == 7
+    # Проверка «расписание уже есть» прошла до того, как первый процесс его записал
+    with patch.object(Query, 'first', return_value=None):
+        assert seed_working_hours(db_session) == 7 - len(WORK_DAYS)
+    weekly = get_weekly_hours(db_session)
+    assert all(weekly[weekday] == [(WORK_START, WORK_END)] for weekday in WORK_DAYS)
+
+def test_all_days_off_does_not_open_week(db_session):
+    """Тест: неделя из одних выходных не превращается в расписание по умолчанию"""
+    for weekday in range(7):
+        set_working_hours(db_session, weekday, [])
+    assert get_available_dates(db=db_session) == []
+
+def test_exception_for_date(db_session):
+    """Тест: особые часы и выходной на дату, затем возврат к обычному расписанию"""
+    seed_working_hours(db_session)
+    saturday = next_weekday(5)
+    assert get_available_slots(saturday, db=db_session) == []
+
+    set_exception(db_session, saturday, [("10:00", "12:00")])
+    assert get_available_slots(saturday, db=db_session) == ["10:00", "11:00"]
+
+    set_exception(db_session, saturday, [])
+    assert get_available_slots(saturday, db=db_session) == []
+
+    assert remove_exception(db_session, saturday)
+    assert not remove_exception(db_session, saturday)
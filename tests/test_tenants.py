@@ -0,0 +1,153 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import pytest
+from aiogram import Bot
+from models.database import Appointment, Client, Procedure, Tenant
+from services import outbox
+from services.booking import create_appointment, get_available_slots, get_or_create_client
+from services.catalog import procedure_catalog
+from services.templates import check_template, get_template, reset_template, set_template
+from services.tenants import add_tenant, admin_ids, tenant_registry
+from scheduler.notifier import format_reminder
+from scheduler.outbox import OutboxWorker, OutboxStats
+from middlewares.tenant import TenantMiddleware
+from tenancy import DEFAULT_TENANT, all_tenants, current_tenant, tenant_scope
+from tools.fake_telegram import FakeTelegramSession
+
+
+@pytest.fixture
+def second_tenant(db_session):
+    """Студия по умолчанию и вторая студия со своими процедурами и расписанием"""
+    db_session.add(Tenant(id=DEFAULT_TENANT, slug='default', name="Студия", admin_ids=''))
+    db_session.commit()
+    tenant = add_tenant(db_session, 'second', "Вторая студия", "77:SECOND", (555,))
+    tenant_registry.load(db_session)
+    yield tenant.id
+    tenant_registry.clear()
+
+def next_day_at(hour: int) -> datetime:
+    return datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()) + timedelta(hours=hour)
+
+def test_data_is_isolated_between_tenants(db_session, second_tenant, test_client, test_procedure):
+    """Тест: студия видит только свои процедуры и записи, время у студий не пересекается"""
+    when = next_day_at(12)
+    create_appointment(db_session, test_client.id, test_procedure.id, when)
+
+    with tenant_scope(second_tenant):
+        names = [procedure.name for procedure in db_session.query(Procedure)]
+        assert len(names) == 3 and test_procedure.name not in names
+        assert db_session.query(Appointment).count() == 0
+        client = Client(name="Клиент второй студии")
+        db_session.add(client)
+        db_session.commit()
+        procedure = db_session.query(Procedure).first()
+        # То же время свободно: слоты первой студии не занимают календарь второй
+        appointment = create_appointment(db_session, client.id, procedure.id, when)
+        assert appointment.tenant_id == second_tenant
+        assert db_session.query(Appointment).count() == 1
+
+    assert db_session.query(Procedure).count() == 1
+    assert db_session.query(Appointment).count() == 1
+    with all_tenants():
+        assert db_session.query(Appointment).count() == 2
+
+def test_same_telegram_user_is_a_client_of_each_tenant(db_session, second_tenant):
+    """Тест: один пользователь Telegram — отдельный клиент в каждой студии"""
+    first = get_or_create_client(db_session, 42, "user", "Клиент")
+    with tenant_scope(second_tenant):
+        second = get_or_create_client(db_session, 42, "user", "Клиент")
+        assert get_or_create_client(db_session, 42, "user", "Клиент").id == second.id
+    assert first.id != second.id
+    assert (first.tenant_id, second.tenant_id) == (DEFAULT_TENANT, second_tenant)
+
+def test_caches_are_per_tenant(db_session, second_tenant, test_procedure, test_client):
+    """Тест: справочник и кэш свободного времени у каждой студии свои"""
+    procedure_catalog.load(db_session)
+    day = next_day_at(0).date()
+    before = get_available_slots(day, db=db_session)
+    with tenant_scope(second_tenant):
+        procedure_catalog.load(db_session)
+        assert len(procedure_catalog.all()) == 3
+        second_before = get_available_slots(day, db=db_session)
+    assert [p.id for p in procedure_catalog.all()] == [test_procedure.id]
+
+    create_appointment(db_session, test_client.id, test_procedure.id, next_day_at(12))
+    assert get_available_slots(day, db=db_session) != before
+    with tenant_scope(second_tenant):
+        assert get_available_slots(day, db=db_session) == second_before
+
+def test_admins_are_per_tenant(second_tenant, mocker):
+    """Тест: ADMIN_IDS управляют студией по умолчанию, у других студий свои администраторы"""
+    mocker.patch('services.tenants.ADMIN_IDS', [111])
+    assert admin_ids() == [111]
+    with tenant_scope(second_tenant):
+        assert admin_ids() == [555]
+
+def test_template_validation():
+    """Тест: в шаблоне допустимы только известные подстановки без атрибутов и форматирования"""
+    check_template('reminder', "{procedure} {date} в {time}")
+    for text in ["{address}", "{procedure.__class__}", "{date!r}", "{time:>10}", "  ", "{"]:
+        with pytest.raises(ValueError):
+            check_template('reminder', text)
+    with pytest.raises(ValueError):
+        check_template('unknown', "Текст")
+
+def test_templates_are_per_tenant(db_session, second_tenant, test_client, test_procedure):
+    """Тест: шаблон напоминания студии заменяет текст по умолчанию только в ней"""
+    appointment = create_appointment(db_session, test_client.id, test_procedure.id, next_day_at(12))
+    default_text = format_reminder(appointment, get_template(db_session, 'reminder'))
+    set_template(db_session, 'reminder', "{studio}: {procedure} {date} в {time}")
+    assert format_reminder(appointment, get_template(db_session, 'reminder')) == (
+        f"Студия: {test_procedure.name} {appointment.date.strftime('%d.%m.%Y')} в 12:00"
+    )
+    with tenant_scope(second_tenant):
+        assert "Вторая студия" in format_reminder(appointment, get_template(db_session, 'reminder'))
+    assert reset_template(db_session, 'reminder') is True
+    assert format_reminder(appointment, get_template(db_session, 'reminder')) == default_text
+
+@pytest.mark.asyncio
+async def test_outbox_sends_with_tenant_bot(async_db, mocker):
+    """Тест: сообщение из общей очереди отправляется ботом своей студии"""
+    @asynccontextmanager
+    async def session_scope():
+        yield async_db
+        await async_db.commit()
+
+    mocker.patch('scheduler.outbox.session_scope', session_scope)
+    await async_db.run_sync(outbox.enqueue, 1, "Первой студии")
+    with tenant_scope(2):
+        await async_db.run_sync(outbox.enqueue, 2, "Второй студии")
+    await async_db.commit()
+
+    sessions = {DEFAULT_TENANT: FakeTelegramSession(global_rate=1000), 2: FakeTelegramSession(global_rate=1000)}
+    stats = OutboxStats()
+    worker = OutboxWorker(
+        {tenant_id: Bot(token=f"{tenant_id}:TEST", session=session) for tenant_id, session in sessions.items()},
+        workers=2, poll_interval=0.05, stats=stats
+    )
+    worker.start()
+    for _ in range(100):
+        if stats.sent == 2:
+            break
+        await asyncio.sleep(0.05)
+    await worker.stop()
+
+    assert sessions[DEFAULT_TENANT].sent == [(1, "Первой студии")]
+    assert sessions[2].sent == [(2, "Второй студии")]
+
+@pytest.mark.asyncio
+async def test_tenant_middleware_resolves_tenant_by_bot():
+    """Тест: обновление обрабатывается в рамках студии бота, который его получил"""
+    tenant_registry.register_bot(77, 2)
+    seen = []
+
+    async def handler(event, data):
+        seen.append((data['tenant_id'], current_tenant()))
+
+    try:
+        await TenantMiddleware()(handler, object(), {'bot': Bot(token="77:SECOND")})
+        await TenantMiddleware()(handler, object(), {'bot': Bot(token="1:DEFAULT")})
+    finally:
+        tenant_registry.clear()
+    assert seen == [(2, 2), (DEFAULT_TENANT, DEFAULT_TENANT)]
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from tools.fake_telegram import FakeTelegramSession
+from webhook import WEBHOOK_HANDLER, check_webhook_config, create_webhook_app
+
+SECRET = "test-secret"
+
+
+def make_update(update_id: int, text: str = "/start") -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1700000000,
+            'chat': {'id': 1000 + update_id, 'type': 'private'},
+            'from': {'id': 1000 + update_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+        }
+    }
+
+
+def make_app(handle, max_in_flight: int = 4):
+    router = Router()
+    router.message()(handle)
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="42:TEST", session=FakeTelegramSession())
+    return create_webhook_app(dp, bot, secret_token=SECRET, path="/webhook", max_in_flight=max_in_flight)
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret():
+    """Тест: запрос без верного секретного токена отклоняется"""
+    handled = []
+
+    async def handle(message: Message):
+        handled.append(message.message_id)
+
+    async with TestClient(TestServer(make_app(handle))) as client:
+        response = await client.post(
+            "/webhook", json=make_update(1),
+            headers={'X-Telegram-Bot-Api-Secret-Token': "wrong"}
+        )
+        assert response.status == 401
+        response = await client.post("/webhook", json=make_update(2))
+        assert response.status == 401
+
+    assert handled == []
+
+
+@pytest.mark.asyncio
+async def test_webhook_handles_updates_concurrently_within_limit():
+    """Тест: обновления обрабатываются параллельно, но не больше max_in_flight сразу"""
+    handled = []
+    running = 0
+    peak = 0
+
+    async def handle(message: Message):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        handled.append(message.message_id)
+
+    app = make_app(handle, max_in_flight=4)
+    async with TestClient(TestServer(app)) as client:
+        responses = await asyncio.gather(*(
+            client.post(
+                "/webhook", json=make_update(i),
+                headers={'X-Telegram-Bot-Api-Secret-Token': SECRET}
+            )
+            for i in range(1, 21)
+        ))
+        assert all(response.status == 200 for response in responses)
+    # Остановка сервера дожидается всех принятых обновлений
+
+    handler = app[WEBHOOK_HANDLER]
+    assert sorted(handled) == list(range(1, 21))
+    assert 1 < peak <= 4
+    assert handler.peak_in_flight <= 4
+    assert handler.handled == 20
+    assert handler.in_flight == 0
+
+def test_webhook_requires_secret(mocker):
+    """Тест: webhook без секрета или с недопустимым секретом не запускается"""
+    mocker.patch('webhook.WEBHOOK_URL', "https://bot.example.com")
+    for secret in [None, "", "с пробелом и кириллицей"]:
+        with pytest.raises(RuntimeError):
+            check_webhook_config(secret)
+    check_webhook_config(SECRET)
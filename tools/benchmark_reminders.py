@@ -0,0 +1,44 @@
+"""
+Замер рассылки напоминаний на локальной имитации Bot API.
+
+Пример:
+    python -m tools.benchmark_reminders --count 3000 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+from aiogram import Bot
+from scheduler.dispatcher import ReminderDispatcher
+from tools.fake_telegram import FakeTelegramSession
+
+
+async def run(count: int, chats: int, latency: float, concurrency: int, rate: float) -> dict:
+    session = FakeTelegramSession(latency=latency, global_rate=rate)
+    bot = Bot(token="42:BENCHMARK", session=session)
+    dispatcher = ReminderDispatcher(bot, concurrency=concurrency, global_rate=rate)
+    messages = [(i, 100000 + i % chats, f"Напоминание {i}") for i in range(count)]
+    delivered, stats = await dispatcher.dispatch(messages)
+    result = stats.snapshot()
+    result.update({
+        'requested': count,
+        'delivered': len(delivered),
+        'flood_errors': session.flood_errors,
+        'requests': session.requests,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=3000, help="количество напоминаний")
+    parser.add_argument('--chats', type=int, default=3000, help="количество разных чатов")
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа API, с")
+    parser.add_argument('--concurrency', type=int, default=8, help="размер пула отправки")
+    parser.add_argument('--rate', type=float, default=30, help="лимит сообщений в секунду")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.count, args.chats, args.latency, args.concurrency, args.rate))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
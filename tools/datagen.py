@@ -0,0 +1,174 @@
+"""
+Генератор синтетических данных для замеров производительности.
+
+Заполняет базу клиентами, процедурами, записями (до сотен тысяч) и
+неактивными слотами. Записи не пересекаются: для будущих записей
+занимается время в slot_claims, как при обычной записи, поэтому на
+сгенерированной базе работают все сервисы бота. Записи распределяются
+по кругу между специалистами (заведенными миграцией и дополнительными
+resources). Генерация детерминирована при одинаковом seed.
+
+Пример:
+    python -m tools.datagen --url sqlite:///bench.db --appointments 100000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from models.database import (
+    Appointment, Client, InactiveSlot, Procedure, Resource, SlotClaim, insert_ignore, run_migrations
+)
+from services.availability import claim_units, duration_to_minutes, time_to_minutes
+from services.catalog import procedure_catalog
+from services.resources import SHARED_CALENDAR, resource_catalog
+from services.schedule import seed_working_hours
+from config import WORK_START
+
+# Записей в день: остальное время дня остается свободным для расчета доступности
+APPOINTMENTS_PER_DAY = 8
+
+# Строк в одном запросе вставки
+CHUNK = 5000
+
+PROCEDURE_DURATIONS = [1.0, 0.5, 1.0, 0.5, 1.0]
+
+
+def _insert_rows(db, model, rows: list):
+    for i in range(0, len(rows), CHUNK):
+        db.execute(insert(model), rows[i:i + CHUNK])
+
+
+def generate(db, clients: int = 1000, procedures: int = 5, appointments: int = 10000,
+             inactive_days: int = 30, future_share: float = 0.2, seed: int = 42,
+             resources: int = 0) -> dict:
+    """
+    Заполнение пустой базы синтетическими данными
+
+    Доля future_share записей приходится на будущие дни (в основном
+    запланированные), остальные — на прошедшие (завершенные и отмененные).
+    Возвращает объемы созданных данных.
+    """
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    seed_working_hours(db)
+
+    _insert_rows(db, Procedure, [
+        {
+            'name': f"Процедура {i + 1}",
+            'duration': PROCEDURE_DURATIONS[i % len(PROCEDURE_DURATIONS)],
+            'description': "Синтетическая процедура",
+        }
+        for i in range(procedures)
+    ])
+    procedure_rows = db.query(Procedure.id, Procedure.duration).order_by(Procedure.id).all()
+
+    _insert_rows(db, Client, [
+        {
+            'telegram_id': 10_000_000 + i,
+            'username': f"user{i}",
+            'name': f"Клиент {i}",
+            'phone': f"+7900{i:07d}",
+        }
+        for i in range(clients)
+    ])
+    client_ids = [client_id for client_id, in db.query(Client.id).order_by(Client.id)]
+
+    _insert_rows(db, Resource, [
+        {'name': f"Специалист {i + 1}", 'kind': 'specialist', 'is_active': True}
+        for i in range(resources)
+    ])
+    resource_ids = [resource_id for resource_id, in db.query(Resource.id).order_by(Resource.id)]
+
+    # Записи идут подряд по часам с начала рабочего дня, без пересечений
+    first_hour = time_to_minutes(WORK_START) // 60
+    future_days = -(-int(appointments * future_share) // APPOINTMENTS_PER_DAY)
+    total_days = -(-appointments // APPOINTMENTS_PER_DAY)
+    start_day = today - timedelta(days=total_days - future_days)
+    rows = []
+    for k in range(appointments):
+        day = start_day + timedelta(days=k // APPOINTMENTS_PER_DAY)
+        start = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=first_hour + k % APPOINTMENTS_PER_DAY
+        )
+        if day >= today:
+            status = 'scheduled' if rng.random() < 0.9 else 'cancelled'
+        else:
+            status = 'completed' if rng.random() < 0.8 else 'cancelled'
+        rows.append({
+            'client_id': rng.choice(client_ids),
+            'procedure_id': rng.choice(procedure_rows)[0],
+            'resource_id': resource_ids[k % len(resource_ids)] if resource_ids else None,
+            'date': start,
+            'status': status,
+            'created_at': start - timedelta(days=rng.randint(1, 30)),
+            'day_before_reminder_sent': False,
+            'day_of_reminder_sent': False,
+        })
+    _insert_rows(db, Appointment, rows)
+
+    durations = dict(procedure_rows)
+    claims = []
+    scheduled = db.query(
+        Appointment.id, Appointment.date, Appointment.procedure_id, Appointment.resource_id
+    ).filter(
+        Appointment.date >= today,
+        Appointment.status == 'scheduled'
+    )
+    for appointment_id, start, procedure_id, resource_id in scheduled:
+        length = duration_to_minutes(durations[procedure_id])
+        claims.extend(
+            {'resource_id': resource_id or SHARED_CALENDAR, 'date': start.date(), 'unit': unit,
+             'appointment_id': appointment_id}
+            for unit in claim_units(time_to_minutes(start), length)
+        )
+    _insert_rows(db, SlotClaim, claims)
+
+    # Вечерние слоты закрыты на каждый третий день впереди
+    inactive = insert_ignore(db, InactiveSlot, [
+        {'date': today + timedelta(days=3 * i), 'time': time, 'is_weekend': False}
+        for i in range(inactive_days) for time in ("18:00", "19:00")
+    ], ['tenant_id', 'date', 'time'])
+    db.commit()
+    procedure_catalog.load(db)
+    resource_catalog.load(db)
+
+    return {
+        'clients': clients,
+        'procedures': procedures,
+        'resources': len(resource_ids),
+        'appointments': appointments,
+        'scheduled': len({claim['appointment_id'] for claim in claims}),
+        'slot_claims': len(claims),
+        'inactive_slots': inactive,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', required=True, help="URL пустой базы данных")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--procedures', type=int, default=5)
+    parser.add_argument('--appointments', type=int, default=10000)
+    parser.add_argument('--inactive-days', type=int, default=30)
+    parser.add_argument('--resources', type=int, default=0, help="дополнительных специалистов")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    run_migrations(args.url)
+    engine = create_engine(args.url)
+    started = time.perf_counter()
+    with sessionmaker(bind=engine)() as db:
+        volumes = generate(
+            db, args.clients, args.procedures, args.appointments, args.inactive_days,
+            seed=args.seed, resources=args.resources
+        )
+    volumes['elapsed_s'] = time.perf_counter() - started
+    engine.dispose()
+    print(json.dumps(volumes, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
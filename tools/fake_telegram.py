@@ -0,0 +1,90 @@
+"""
+Локальная имитация Bot API для тестов и замеров без обращения к Telegram.
+
+FakeTelegramSession подставляется в Bot(session=...): запросы не уходят в
+сеть, а отвечают с заданной задержкой. Сессия сама следит за лимитами
+Telegram и, как настоящий сервер, отвечает RetryAfter при их превышении,
+поэтому на ней видно, соблюдает ли отправитель ограничения.
+"""
+import asyncio
+import time
+from collections import Counter, deque
+from datetime import datetime
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, EditMessageText
+from aiogram.types import Chat, InlineKeyboardMarkup, Message
+
+# Запас на неточность таймеров цикла событий
+TOLERANCE = 0.05
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия Bot API, которая отвечает локально и имитирует флуд-контроль"""
+
+    def __init__(self, latency: float = 0.0, global_rate: float = 30, chat_rate: float = 1,
+                 retry_after: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.flood_errors = 0
+        self.sent = []
+        # Число вызовов по методам и последняя инлайн-клавиатура в каждом чате
+        self.calls = Counter()
+        self.markups = {}
+        self._recent = deque()
+        self._last_by_chat = {}
+
+    def _check_limits(self, chat_id):
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1:
+            self._recent.popleft()
+        # Ведро с запасом в один токен допускает rate + 1 сообщение в любом окне в секунду
+        if len(self._recent) >= self.global_rate + 1:
+            raise_flood = True
+        else:
+            last = self._last_by_chat.get(chat_id)
+            raise_flood = last is not None and now - last < (1 - TOLERANCE) / self.chat_rate
+        if raise_flood:
+            self.flood_errors += 1
+            return False
+        self._recent.append(now)
+        self._last_by_chat[chat_id] = now
+        return True
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, 'chat_id', None)
+        if isinstance(method, SendMessage):
+            if not self._check_limits(chat_id):
+                raise TelegramRetryAfter(
+                    method=method,
+                    message=f"Too Many Requests: retry after {self.retry_after}",
+                    retry_after=self.retry_after
+                )
+            self.sent.append((chat_id, method.text))
+        if isinstance(method, (SendMessage, EditMessageText)) and chat_id is not None:
+            if isinstance(method.reply_markup, InlineKeyboardMarkup):
+                self.markups[chat_id] = method.reply_markup
+            else:
+                self.markups.pop(chat_id, None)
+            return Message(
+                message_id=self.requests,
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type='private'),
+                text=method.text
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536,
+                             raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
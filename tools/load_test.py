@@ -0,0 +1,274 @@
+"""
+Нагрузочный прогон бота на потоке обновлений без обращения к Telegram.
+
+Клиенты проходят сценарий записи (/start, «Записаться», процедура, дата,
+время, подтверждение), администраторы открывают список записей и листают
+его. Обновления подаются в тот же диспетчер, что и у бота (main.create_dispatcher:
+хранилище состояний, сессия базы, ограничение частоты, оба роутера), через
+Dispatcher.feed_update, а ответы принимает FakeTelegramSession с заданной
+задержкой. Пользователи нажимают кнопки из клавиатур, которые им прислал бот,
+поэтому за одно время соревнуются так же, как в жизни.
+
+База по --url должна быть пустой (по умолчанию — временная SQLite): она
+заполняется tools.datagen. Результат — JSON с p50/p95/p99 времени обработки
+обновлений по шагам сценария, пропускной способностью и числом запросов к базе.
+
+Пример:
+    python -m tools.load_test --users 2000 --admins 10 --latency 0.05 --think 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from aiogram import Bot
+from aiogram.types import Update
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from config import ADMIN_IDS
+from main import create_dispatcher
+from middlewares.throttling import throttling_stats
+from models.database import Appointment, AsyncSessionLocal, make_async_url, run_migrations
+from services.availability import availability_cache
+from tools.benchmark_booking import git_commit
+from tools.datagen import generate
+from tools.fake_telegram import FakeTelegramSession
+
+CLIENT_ID_BASE = 100_000_000
+ADMIN_ID_BASE = 900_000_000
+
+# Шаги сценария записи: название и префикс кнопки, которую нажимает клиент
+BOOKING_STEPS = [
+    ('procedure', "proc_"),
+    ('date', "date_"),
+    ('time', "time_"),
+    ('confirm', "confirm"),
+]
+
+
+def percentiles(timings: list) -> dict:
+    """p50/p95/p99 и максимум в миллисекундах"""
+    if not timings:
+        return {'count': 0}
+    timings = sorted(timings)
+
+    def pick(q):
+        return round(timings[min(len(timings) - 1, int(len(timings) * q))], 3)
+
+    return {
+        'count': len(timings),
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+class LoadRun:
+    """Поток обновлений от имитируемых пользователей в диспетчер бота"""
+
+    def __init__(self, dp, bot, session: FakeTelegramSession, think: float, seed: int = 42):
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.think = think
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id}", 'username': f"load{user_id}"}
+
+    def _message(self, user_id: int, text: str = None) -> dict:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text,
+        }
+
+    def message(self, user_id: int, text: str) -> Update:
+        return Update.model_validate({
+            'update_id': next(self._update_ids),
+            'message': self._message(user_id, text),
+        }, context={'bot': self.bot})
+
+    def callback(self, user_id: int, data: str) -> Update:
+        update_id = next(self._update_ids)
+        return Update.model_validate({
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'message': self._message(user_id),
+                'data': data,
+            },
+        }, context={'bot': self.bot})
+
+    def button(self, user_id: int, prefix: str):
+        """callback_data случайной кнопки с префиксом из последней клавиатуры пользователя"""
+        markup = self.session.markups.get(user_id)
+        if markup is None:
+            return None
+        buttons = [
+            button.callback_data for row in markup.inline_keyboard for button in row
+            if button.callback_data and button.callback_data.startswith(prefix)
+        ]
+        return self.rng.choice(buttons) if buttons else None
+
+    async def feed(self, step: str, update: Update) -> bool:
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+            return False
+        finally:
+            self.latencies[step].append((time.perf_counter() - started) * 1000)
+        return True
+
+    async def pause(self):
+        if self.think:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+
+    async def client(self, user_id: int, delay: float):
+        """Сценарий записи клиента; без нужной кнопки клиент бросает запись"""
+        await asyncio.sleep(delay)
+        await self.feed('start', self.message(user_id, "/start"))
+        await self.pause()
+        if not await self.feed('booking', self.message(user_id, "📝 Записаться")):
+            self.outcomes['failed'] += 1
+            return
+        for step, prefix in BOOKING_STEPS:
+            await self.pause()
+            data = self.button(user_id, prefix)
+            if data is None:
+                self.outcomes[f'abandoned_at_{step}'] += 1
+                return
+            if not await self.feed(step, self.callback(user_id, data)):
+                self.outcomes['failed'] += 1
+                return
+        self.outcomes['confirm_sent'] += 1
+
+    async def admin(self, user_id: int, delay: float, pages: int = 3):
+        """Просмотр списка записей администратором"""
+        await asyncio.sleep(delay)
+        await self.feed('admin_list', self.message(user_id, "📊 Список записей"))
+        for _ in range(pages):
+            await self.pause()
+            data = self.button(user_id, "apl_n")
+            if data is None:
+                break
+            await self.feed('admin_page', self.callback(user_id, data))
+        self.outcomes['admin_done'] += 1
+
+
+async def run(url: str, users: int, admins: int, latency: float, think: float, ramp: float,
+              appointments: int = 1000, seed: int = 42) -> dict:
+    """Заполнение пустой базы по url и прогон пользователей через диспетчер"""
+    run_migrations(url)
+    engine = create_engine(url)
+    with sessionmaker(bind=engine)() as db:
+        volumes = generate(db, clients=max(users // 10, 1), appointments=appointments, seed=seed)
+        appointments_before = db.query(Appointment.id).count()
+    availability_cache.clear()
+
+    async_engine = create_async_engine(make_async_url(url))
+    queries = Counter()
+
+    def count_query(*args):
+        queries['total'] += 1
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count_query)
+    previous_bind = AsyncSessionLocal.kw.get('bind')
+    AsyncSessionLocal.configure(bind=async_engine)
+    admin_ids = [ADMIN_ID_BASE + i for i in range(admins)]
+    ADMIN_IDS.extend(admin_ids)
+    session = FakeTelegramSession(latency=latency, global_rate=float('inf'), chat_rate=float('inf'))
+    bot = Bot(token="42:LOADTEST", session=session)
+    load = LoadRun(create_dispatcher(), bot, session, think, seed)
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(load.client(CLIENT_ID_BASE + i, load.rng.uniform(0, ramp)) for i in range(users)),
+            *(load.admin(admin_id, load.rng.uniform(0, ramp)) for admin_id in admin_ids)
+        )
+        duration = time.perf_counter() - started
+    finally:
+        for admin_id in admin_ids:
+            ADMIN_IDS.remove(admin_id)
+        AsyncSessionLocal.configure(bind=previous_bind)
+        await async_engine.dispose()
+
+    with sessionmaker(bind=engine)() as db:
+        bookings = db.query(Appointment.id).count() - appointments_before
+    engine.dispose()
+
+    updates = sum(len(timings) for timings in load.latencies.values())
+    latency_ms = {'all': percentiles([ms for timings in load.latencies.values() for ms in timings])}
+    latency_ms.update({step: percentiles(timings) for step, timings in load.latencies.items()})
+    return {
+        'backend': make_url(url).get_backend_name(),
+        'volumes': volumes,
+        'users': users,
+        'admins': admins,
+        'api_latency_s': latency,
+        'think_s': think,
+        'duration_s': round(duration, 3),
+        'updates': updates,
+        'updates_per_s': round(updates / duration, 1),
+        'bookings': bookings,
+        'bookings_per_s': round(bookings / duration, 2),
+        'queries': queries['total'],
+        'queries_per_update': round(queries['total'] / updates, 2) if updates else 0.0,
+        'latency_ms': latency_ms,
+        'outcomes': dict(load.outcomes),
+        'errors': dict(load.errors),
+        'api_calls': dict(session.calls),
+        'throttling': throttling_stats.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="URL пустой базы данных (по умолчанию временная SQLite)")
+    parser.add_argument('--users', type=int, default=500, help="количество клиентов")
+    parser.add_argument('--admins', type=int, default=5, help="количество администраторов")
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа API, с")
+    parser.add_argument('--think', type=float, default=0.5, help="средняя пауза пользователя между шагами, с")
+    parser.add_argument('--ramp', type=float, default=5, help="за сколько секунд приходят все пользователи")
+    parser.add_argument('--appointments', type=int, default=1000, help="записей в базе до прогона")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="файл для сохранения результата")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{Path(tmp) / 'load.db'}"
+        result = asyncio.run(run(
+            url, args.users, args.admins, args.latency, args.think, args.ramp, args.appointments, args.seed
+        ))
+    result = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        **result,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding='utf-8')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Управление студиями, которые обслуживает бот.
+
+Новая студия получает справочник процедур и расписание по умолчанию;
+ее бот начинает принимать обновления после перезапуска основного процесса.
+
+Пример:
+    python -m tools.tenants add nails "Студия маникюра" --token 123:ABC --admins 111,222
+    python -m tools.tenants list
+"""
+import argparse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models.database import Tenant, run_migrations
+from services.tenants import add_tenant, parse_admin_ids
+from config import DATABASE_URL
+
+
+def list_tenants(db) -> list:
+    """Строки списка студий"""
+    lines = []
+    for tenant in db.query(Tenant).order_by(Tenant.id):
+        bot = tenant.bot_token.split(":")[0] if tenant.bot_token else "BOT_TOKEN"
+        status = "" if tenant.is_active else " (выключена)"
+        lines.append(
+            f"{tenant.id}. {tenant.slug} — {tenant.name}{status}, бот {bot}, "
+            f"администраторы: {tenant.admin_ids or '-'}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=DATABASE_URL, help="URL базы данных (по умолчанию DATABASE_URL)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="список студий")
+    add = commands.add_parser('add', help="новая студия")
+    add.add_argument('slug', help="короткое имя латиницей, часть пути webhook")
+    add.add_argument('name', help="название студии")
+    add.add_argument('--token', help="токен бота студии")
+    add.add_argument('--admins', default='', help="Telegram ID администраторов через запятую")
+    args = parser.parse_args()
+
+    run_migrations(args.url)
+    engine = create_engine(args.url)
+    try:
+        with sessionmaker(bind=engine)() as db:
+            if args.command == 'add':
+                try:
+                    tenant = add_tenant(db, args.slug, args.name, args.token, parse_admin_ids(args.admins))
+                except ValueError as e:
+                    parser.error(str(e))
+                print(f"Добавлена студия {tenant.id}: {tenant.slug}")
+            else:
+                print("\n".join(list_tenants(db)))
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
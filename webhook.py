@@ -0,0 +1,172 @@
+"""
+Режим webhook: прием обновлений встроенным aiohttp-сервером.
+
+Telegram сам присылает обновления POST-запросами, поэтому нет задержки на
+цикл long polling, а обновления обрабатываются параллельно. Число
+одновременно обрабатываемых обновлений ограничено WEBHOOK_MAX_IN_FLIGHT:
+когда лимит исчерпан, ответ Telegram задерживается, и он сам снижает
+скорость отправки. При остановке сервер перестает принимать запросы и
+дожидается обработки уже принятых обновлений.
+
+Боты всех студий принимают обновления одним сервером: бот студии по
+умолчанию — по пути WEBHOOK_PATH, остальные — по WEBHOOK_PATH/<slug>.
+"""
+import asyncio
+import logging
+import re
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_IN_FLIGHT, WEBHOOK_DRAIN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Допустимый секрет webhook по правилам Bot API
+SECRET_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением числа обновлений в работе
+
+    Ответ Telegram отправляется сразу после постановки обновления
+    в обработку, а сама обработка идет фоновой задачей.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str = None,
+                 max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT,
+                 drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT, **data):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_in_flight = max_in_flight
+        self.drain_timeout = drain_timeout
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.handled = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        # Боты, принимающие обновления по другим путям; лимит у всех общий
+        self.bots = {}
+
+    def register_bot(self, app: web.Application, path: str, bot: Bot):
+        """Прием обновлений еще одного бота по пути path"""
+        self.bots[path] = bot
+        app.router.add_route("POST", path, self.handle)
+
+    async def resolve_bot(self, request: web.Request) -> Bot:
+        return self.bots.get(request.path, self.bot)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._release)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _release(self, task: asyncio.Task):
+        self._background_feed_update_tasks.discard(task)
+        self.in_flight -= 1
+        self.handled += 1
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка при обработке обновления: {task.exception()}")
+
+    async def close(self):
+        """
+        Ожидание обновлений, принятых до остановки
+
+        Сессию бота закрывает main после остановки планировщика и очереди.
+        """
+        tasks = list(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logger.info(f"Дожидаемся обработки обновлений: {len(tasks)}")
+        done, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Не дождались обработки обновлений: {len(pending)}")
+
+
+# Обработчик webhook в приложении: по нему видна нагрузка и ход остановки
+WEBHOOK_HANDLER = web.AppKey("webhook_handler", LimitedRequestHandler)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token: str = WEBHOOK_SECRET,
+                       path: str = WEBHOOK_PATH, max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT,
+                       bots: dict = None, **data) -> web.Application:
+    """
+    aiohttp-приложение, принимающее обновления по пути path
+
+    bots — другие боты по путям, на которых они принимают обновления.
+    """
+    app = web.Application()
+    handler = LimitedRequestHandler(dp, bot, secret_token=secret_token, max_in_flight=max_in_flight, **data)
+    handler.register(app, path=path)
+    for bot_path, other_bot in (bots or {}).items():
+        handler.register_bot(app, bot_path, other_bot)
+    setup_application(app, dp, bot=bot)
+    app[WEBHOOK_HANDLER] = handler
+    return app
+
+
+def check_webhook_config(secret_token: str = WEBHOOK_SECRET):
+    """
+    Проверка настроек webhook до запуска
+
+    Без секрета любой, кто знает адрес, может прислать боту поддельные
+    обновления, поэтому webhook без WEBHOOK_SECRET не запускается.
+    """
+    if not WEBHOOK_URL:
+        raise RuntimeError("Для режима webhook задайте WEBHOOK_URL")
+    if not secret_token:
+        raise RuntimeError("Для режима webhook задайте WEBHOOK_SECRET: без него бот примет поддельные обновления")
+    if not SECRET_TOKEN_PATTERN.fullmatch(secret_token):
+        raise RuntimeError("WEBHOOK_SECRET: от 1 до 256 символов A-Z, a-z, 0-9, _ и -")
+
+
+def tenant_webhook_path(slug: str) -> str:
+    """Путь webhook бота студии"""
+    return f"{WEBHOOK_PATH.rstrip('/')}/{slug}"
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, bots: dict = None):
+    """
+    Регистрация webhook в Telegram и работа сервера до сигнала остановки
+
+    bot принимает обновления по WEBHOOK_PATH, bots — по своим путям.
+    """
+    check_webhook_config()
+    app = create_webhook_app(dp, bot, bots=bots)
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+
+    for path, path_bot in {WEBHOOK_PATH: bot, **(bots or {})}.items():
+        await path_bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + path,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_IN_FLIGHT,
+        )
+        logger.info(f"Бот запущен в режиме webhook на {WEBHOOK_HOST}:{WEBHOOK_PORT}{path}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Остановка webhook-сервера")
+        # Закрывает прием запросов и дожидается уже принятых обновлений
+        await runner.cleanup()